@@ -0,0 +1,54 @@
+"""Per-turn cost of StoryStateManager.build_context_injection.
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/bench_context_injection.py
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from literaplay.book_loader import get_books_dir, get_chapter_excerpt, load_book_texts
+from literaplay.data import LIBRARY
+from literaplay.story_state import StoryStateManager
+
+_ITERATIONS = 20_000
+
+
+def make_manager(turns: int = 12, state_encoding: str = "full") -> StoryStateManager:
+    """A manager for the first Pod igoto situation after *turns* recorded turns, each with a new key event."""
+    situation = dict(LIBRARY["pod_igoto"]["situations"][0], _key="pod_igoto_sit1")
+    manager = StoryStateManager(situation, state_encoding)
+    for i in range(turns):
+        manager.record_turn(
+            {
+                "reply": [{"character": "Бай Марко", "text": f"Кой е там? Реплика {i}."}],
+                "mood": "подозрителен",
+                "location": "Оборът на Бай Марко",
+                "key_event": f"Събитие {i}",
+                "trust_level": 1,
+                "tension": "непознат в обора",
+                "characters_present": ["Бай Марко", "Иван Краличът"],
+                "active_props": ["пищов", "фенер"],
+            }
+        )
+    return manager
+
+
+def main() -> None:
+    manager = make_manager()
+    chapter = manager.current_chapter()
+    assert chapter is not None
+    excerpt = get_chapter_excerpt(
+        load_book_texts(get_books_dir()), "pod_igoto", chapter.id, manager._work_data.get("chapters", [])
+    )
+
+    cold = timeit.timeit(lambda: (manager._templates.clear(), manager.build_context_injection(excerpt)), number=1000)
+    warm = timeit.timeit(lambda: manager.build_context_injection(excerpt), number=_ITERATIONS)
+    print(f"build_context_injection (template rebuilt every call): {cold / 1000 * 1e6:8.2f} µs/turn")
+    print(f"build_context_injection (compiled chapter template):   {warm / _ITERATIONS * 1e6:8.2f} µs/turn")
+
+
+if __name__ == "__main__":
+    main()
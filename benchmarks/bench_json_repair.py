@@ -0,0 +1,73 @@
+"""Recovery rate and cost of json_repair.repair_json on a malformed-output corpus.
+
+The corpus is derived from a well-formed story reply by the damage models
+actually produce: truncation at every few characters (max_tokens, a dropped
+stream), trailing commas, unescaped quotes in dialogue, typographic or single
+quotes, raw newlines, Python literals and missing commas.
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/bench_json_repair.py
+"""
+
+from __future__ import annotations
+
+import json
+import timeit
+
+from literaplay.json_repair import repair_json
+from literaplay.response_parser import parse_ai_json_response
+
+_REPLY = {
+    "reply": [
+        {"character": "Разказвач", "text": "Нощта е тъмна. Вятърът блъска капаците на обора."},
+        {"character": "Бай Марко", "text": "Кой е там? Кажи си името или ще стрелям!"},
+        {"character": "Разказвач", "text": "Зад яслите нещо помръдва. Пищовът трепери в ръката му."},
+    ],
+    "options": ["Излез на светло", "Кажи името си", "Замълчи"],
+    "ended": False,
+    "mood": "подозрителен",
+    "location": "Оборът на Бай Марко",
+    "key_event": "Марко открива непознат в обора",
+}
+
+
+def build_corpus() -> list[tuple[str, str]]:
+    """Return ``(damage kind, text)`` pairs."""
+    good = json.dumps(_REPLY, ensure_ascii=False, indent=1)
+    corpus = [(f"truncated@{cut}", good[:cut]) for cut in range(40, len(good), 7)]
+    corpus += [
+        ("trailing_commas", good.replace('"Замълчи"', '"Замълчи",').replace('"ended": false', '"ended": false,')),
+        ("unescaped_quotes", good.replace("Кажи си името", 'Кажи си "името"')),
+        ("smart_quotes", good.replace('"', "“", 1).replace('"reply"', "“reply”")),
+        ("single_quotes", good.replace('"', "'")),
+        ("raw_newlines", good.replace("Нощта е тъмна. ", "Нощта е тъмна.\n")),
+        ("python_literals", good.replace("false", "False")),
+        ("missing_comma", good.replace('],\n "options"', ']\n "options"')),
+        ("prose_and_fence", "Ето отговора:\n```json\n" + good[: len(good) // 2]),
+    ]
+    return corpus
+
+
+def main() -> None:
+    corpus = build_corpus()
+    unparsed = [(kind, text) for kind, text in corpus if parse_ai_json_response(text) is None]
+    results = [(kind, repair_json(text)) for kind, text in unparsed]
+    recovered = [r for _, r in results if r.value is not None and r.value.get("reply")]
+    usable = [r for r in recovered if r.confidence >= 0.5]
+
+    seconds = timeit.timeit(lambda: [repair_json(text) for _, text in unparsed], number=20)
+    per_item = seconds / 20 / len(unparsed) * 1e6
+
+    print(f"corpus: {len(corpus)} outputs, {len(unparsed)} rejected by parse_ai_json_response")
+    print(f"recovered with a reply: {len(recovered)}/{len(unparsed)}")
+    print(f"usable (confidence >= 0.5): {len(usable)}/{len(unparsed)}")
+    print(f"mean confidence of recovered: {sum(r.confidence for r in recovered) / max(1, len(recovered)):.2f}")
+    print(f"repair_json: {per_item:8.1f} µs/output")
+    for kind, r in results:
+        if not kind.startswith("truncated"):
+            print(f"  {kind:18s} confidence={r.confidence:.2f} fixes={r.fixes}")
+
+
+if __name__ == "__main__":
+    main()
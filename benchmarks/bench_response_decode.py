@@ -0,0 +1,89 @@
+"""Per-turn cost of turning model output into bridge messages.
+
+Compares the dict path (``parse_ai_json_response`` -> worker dict copy ->
+``validate_story_response`` -> ``json.dumps`` per message) with the typed
+fast path (``decode_story_response`` -> ``validate_story_response`` on the
+struct -> ``fast_json.dumps``). Reports time and peak memory per turn; the
+fast-path numbers depend on which accelerator is installed (see BACKEND).
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/bench_response_decode.py
+"""
+
+from __future__ import annotations
+
+import json
+import timeit
+import tracemalloc
+
+from literaplay import fast_json
+from literaplay.response_parser import parse_ai_json_response, validate_story_response
+
+_ITERATIONS = 5_000
+
+RESPONSE = json.dumps(
+    {
+        "reply": [
+            {"character": "Разказвач", "text": "Нощта е тъмна. Вятърът блъска капаците на обора. " * 3},
+            {"character": "Бай Марко", "text": "Кой е там? Кажи си името или ще стрелям!"},
+            {"character": "Иван Краличът", "text": "Не стреляй, бай Марко! Аз съм, свой човек."},
+            {"character": "Разказвач", "text": "Зад яслите нещо помръдва. Пищовът трепери в ръката му."},
+        ],
+        "options": ["Излез на светло", "Кажи името си", "Замълчи", "[Канонично] Притаи се"],
+        "ended": False,
+        "mood": "подозрителен",
+        "location": "Оборът на Бай Марко",
+        "key_event": "Марко открива непознат в обора",
+        "trust_level": -1,
+        "tension": "непознат в обора",
+        "characters_present": ["Бай Марко", "Иван Краличът"],
+        "active_props": ["пищов", "фенер"],
+    },
+    ensure_ascii=False,
+)
+
+
+def _messages(data: dict, dumps) -> list[str]:
+    reply = data["reply"]
+    return [
+        dumps({"sender": m.get("character", ""), "text": m.get("text", ""), "isUser": False, "isSystem": False})
+        for m in reply
+    ]
+
+
+def dict_path() -> list[str]:
+    data = parse_ai_json_response(RESPONSE)
+    assert data is not None
+    emitted = {
+        "reply": data.get("reply", RESPONSE),
+        "options": data.get("options", []),
+        "ended": data.get("ended", False),
+        "mood": data.get("mood", ""),
+        "location": data.get("location", ""),
+        "key_event": data.get("key_event", ""),
+    }
+    validated = validate_story_response(emitted)
+    return [*_messages(validated, json.dumps), json.dumps(validated["options"])]
+
+
+def fast_path() -> list[str]:
+    decoded = fast_json.decode_story_response(RESPONSE)
+    assert decoded is not None
+    validated = validate_story_response(decoded)
+    return [*_messages(validated, fast_json.dumps), fast_json.dumps(validated["options"])]
+
+
+def main() -> None:
+    print(f"fast_json backend: {fast_json.BACKEND}")
+    for name, fn in (("dict path", dict_path), ("typed fast path", fast_path)):
+        seconds = min(timeit.repeat(fn, number=_ITERATIONS, repeat=5))
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:16s} {seconds / _ITERATIONS * 1e6:8.1f} µs/turn  peak {peak / 1024:6.1f} KiB/turn")
+
+
+if __name__ == "__main__":
+    main()
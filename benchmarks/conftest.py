@@ -0,0 +1,58 @@
+"""pytest-benchmark suite for the CPU-side turn pipeline.
+
+Everything here runs offline against the real ``books/`` data. The suite is
+not part of ``tests/`` and runs only when asked for. From the repository root:
+
+    python -m pytest benchmarks                              # timings only
+    python -m pytest benchmarks --benchmark-save=baseline    # store a new baseline
+    python -m pytest benchmarks --benchmark-compare          # fail on regressions
+
+Baselines are stored in ``benchmarks/baselines/<machine>/``. Compare only
+against a baseline recorded on the same machine and Python version.
+``--benchmark-compare`` compares against the latest baseline and fails when a
+benchmark's fastest round is more than :data:`REGRESSION_THRESHOLD` slower.
+Pass ``--benchmark-compare-fail`` to use a different threshold.
+
+The ``bench_*.py`` scripts beside this file report what a timing cannot,
+such as json_repair's recovery rate and peak memory per turn. The suite
+reuses their inputs. ``test_memory_profile.py`` holds long and many sessions
+to the memory budget of ``memory_profile.py``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.utils import parse_compare_fail
+
+from literaplay.book_loader import BookTextIndex, get_books_dir, load_book_texts, load_library
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+# The fastest round is the least noisy statistic on a shared machine
+REGRESSION_THRESHOLD = "min:25%"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: pytest.Config) -> None:
+    # Runs before pytest-benchmark reads its options
+    option = config.option
+    if getattr(option, "benchmark_storage", None) == "file://./.benchmarks":
+        option.benchmark_storage = f"file://{BASELINES_DIR}"
+    if getattr(option, "benchmark_compare", None) and not option.benchmark_compare_fail:
+        option.benchmark_compare_fail = [parse_compare_fail(REGRESSION_THRESHOLD)]
+
+
+@pytest.fixture(scope="session")
+def books_dir() -> Path:
+    return get_books_dir()
+
+
+@pytest.fixture(scope="session")
+def library(books_dir: Path) -> dict:
+    return load_library(books_dir)
+
+
+@pytest.fixture(scope="session")
+def book_texts(books_dir: Path) -> dict[str, BookTextIndex]:
+    return load_book_texts(books_dir)
@@ -0,0 +1,394 @@
+"""Memory growth over long sessions and many sessions, against a stand-in provider.
+
+Synthetic turns take the same path through the engine as in
+``BackendBridge``, without Qt or a network:
+
+* a compiled situation, its StoryStateManager, character lexicon and leak
+  detector for each session
+* the state block and book excerpt for each turn
+* ``AIService.send_message_with_context`` on a worker thread held in an
+  active-workers list, against :class:`StandInProvider`, which answers like
+  the OpenAI, Anthropic or Gemini SDK client
+* decoding, validation, ``record_turn``, the usage ledger and the turn's trace
+
+tracemalloc records memory at intervals while thousands of short sessions
+run back to back. What is still allocated after a session ends should stay
+near zero. A single long session then shows how much each turn adds. The
+chat history is expected to grow, because it is resent every turn; the
+report shows its size separately from everything else. The report lists the
+top allocation sites, and the run fails when growth exceeds the budget.
+
+Run from the repository root (no network or API key needed):
+
+    PYTHONPATH=src python benchmarks/memory_profile.py
+    PYTHONPATH=src python benchmarks/memory_profile.py --provider gemini --sessions 5000 --long-turns 5000
+
+The exit status is 1 when a budget is exceeded. ``test_memory_profile.py``
+runs a smaller profile in the benchmark suite.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+from literaplay import tracing
+from literaplay.ai_service import AIService, ChatSession
+from literaplay.book_loader import get_books_dir, get_chapter_excerpt, load_book_texts, load_library
+from literaplay.catalog import Situation, compile_situations
+from literaplay.character_lexicon import build_character_lexicon
+from literaplay.fast_json import decode_story_response
+from literaplay.knowledge_guard import build_leak_detector
+from literaplay.response_parser import parse_ai_json_response, validate_story_response
+from literaplay.story_state import StoryStateManager
+from literaplay.usage import UsageLedger
+
+PROVIDERS = ("openai", "anthropic", "gemini")
+
+# Bytes per finished session still allocated after it ends, and bytes per turn
+# of a live session outside its chat history
+DEFAULT_SESSION_BUDGET = 2048
+DEFAULT_TURN_BUDGET = 1024
+
+_WARMUP_SESSIONS = 20
+_WARMUP_TURNS = 50
+
+
+# ── Stand-in provider ────────────────────────────────────────────────
+
+
+def _reply(turn: int) -> str:
+    reply = {
+        "reply": [
+            {"character": "Разказвач", "text": f"Нощта е тъмна. Вятърът блъска капаците на обора. ({turn})"},
+            {"character": "Бай Марко", "text": "Кой е там? Кажи си името или ще стрелям!"},
+        ],
+        "options": ["Излез на светло", "Кажи името си", "Замълчи"],
+        "ended": False,
+        "mood": "подозрителен",
+        "key_event": f"Събитие {turn}" if turn % 3 else "",
+        "trust_level": turn % 7 - 3,
+        "active_props": [f"предмет {turn % 15}", "фенер"],
+    }
+    text = json.dumps(reply, ensure_ascii=False)
+    # Every fifth reply comes fenced, as models sometimes send it, to take the slower parse path
+    return f"```json\n{text}\n```" if turn % 5 == 0 else text
+
+
+class _StandInGeminiChat:
+    """Keeps history the way ``google.genai`` chats do: a list the SDK copies on every model change."""
+
+    def __init__(self, provider: StandInProvider, history: list) -> None:
+        self._provider = provider
+        self._history = list(history)
+
+    def send_message(self, text: str, config: Any = None) -> Any:
+        reply = self._provider.next_reply()
+        self._history += [{"role": "user", "parts": [{"text": text}]}, {"role": "model", "parts": [{"text": reply}]}]
+        usage = {"prompt_token_count": len(text) // 4, "candidates_token_count": len(reply) // 4}
+        return SimpleNamespace(text=reply, usage_metadata=usage)
+
+    def get_history(self) -> list:
+        return self._history
+
+
+class StandInProvider:
+    """Answers like the OpenAI, Anthropic and Gemini SDK clients, instantly and offline."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._openai_create))
+        self.messages = SimpleNamespace(create=self._anthropic_create)
+        self.chats = SimpleNamespace(create=self._gemini_create)
+
+    def next_reply(self) -> str:
+        with self._lock:
+            self.calls += 1
+            return _reply(self.calls)
+
+    def _openai_create(self, messages: list, **_kwargs: Any) -> Any:
+        reply = self.next_reply()
+        usage = {"prompt_tokens": sum(len(m["content"]) for m in messages) // 4, "completion_tokens": len(reply) // 4}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))], usage=usage)
+
+    def _anthropic_create(self, messages: list, **_kwargs: Any) -> Any:
+        reply = self.next_reply()
+        usage = {"input_tokens": sum(len(m["content"]) for m in messages) // 4, "output_tokens": len(reply) // 4}
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=reply)], usage=usage)
+
+    def _gemini_create(self, model: str, config: Any = None, history: list | None = None) -> _StandInGeminiChat:
+        return _StandInGeminiChat(self, history or [])
+
+
+class _StandInService(AIService):
+    """An AIService whose SDK client is a :class:`StandInProvider`; no SDK is imported."""
+
+    def _create_client(self) -> StandInProvider:
+        return StandInProvider()
+
+
+# ── Engine ───────────────────────────────────────────────────────────
+
+
+@dataclass
+class _Session:
+    session_id: str
+    situation: Situation
+    manager: StoryStateManager
+    chat: ChatSession
+    leak_detector: Any
+    excerpt: str
+
+
+class Engine:
+    """The per-session and per-turn work of ``BackendBridge``, without the UI."""
+
+    def __init__(self, provider: str = "openai", state_encoding: str = "full") -> None:
+        books_dir = get_books_dir()
+        self.situations = compile_situations(load_library(books_dir))
+        self.book_texts = load_book_texts(books_dir)
+        self.state_encoding = state_encoding
+        self.service = _StandInService(provider, "stand-in", "stand-in-model")
+        self.usage = UsageLedger()  # kept in memory, as the bridge keeps it between saves
+        self.tracer = tracing.Tracer(None)  # spans are built, nothing is written
+        self.active_workers: list[threading.Thread] = []
+        self.sessions_started = 0
+
+    def start_session(self, work_key: str, sit_key: str) -> _Session:
+        situation = self.situations[(work_key, sit_key)]
+        book = self.book_texts.get(work_key)
+        manager = StoryStateManager(
+            situation, state_encoding=self.state_encoding, character_lexicon=build_character_lexicon(situation, book)
+        )
+        chapter = manager.current_chapter()
+        excerpt = ""
+        if chapter is not None:
+            excerpt = get_chapter_excerpt(self.book_texts, work_key, chapter.id, situation.get("chapters", []))
+        self.sessions_started += 1
+        return _Session(
+            session_id=f"session {self.sessions_started}",
+            situation=situation,
+            manager=manager,
+            chat=self.service.create_chat(situation["prompt"]),
+            leak_detector=build_leak_detector(situation, 0, book),
+            excerpt=excerpt,
+        )
+
+    def turn(self, session: _Session, text: str) -> dict:
+        manager = session.manager
+        span = self.tracer.start_trace("turn", provider=self.service.provider)
+        with tracing.use(span):
+            context = manager.build_context_injection(session.excerpt)
+
+        result: dict[str, str] = {}
+
+        def work() -> None:
+            with tracing.use(span):
+                result["reply"] = self.service.send_message_with_context(
+                    session.chat, text, context, turn_type=manager.turn_type(), key_beat=manager.is_key_beat()
+                )
+
+        worker = threading.Thread(target=work)
+        self.active_workers.append(worker)
+        worker.start()
+        worker.join()
+        self.active_workers.remove(worker)  # the bridge does this on the worker's finished signal
+
+        with tracing.use(span):
+            reply = result["reply"]
+            data = decode_story_response(reply) or parse_ai_json_response(reply) or {"reply": reply}
+            data = validate_story_response(
+                data,
+                state=manager.get_state(),
+                chapter=manager.current_chapter(),
+                is_last_chapter=manager.is_last_chapter(),
+                leak_detector=session.leak_detector,
+            )
+            manager.record_turn(data)
+            call = session.chat.last_call
+            chapter = manager.current_chapter()
+            self.usage.record(
+                call.provider,
+                call.model,
+                call.usage,
+                session.session_id,
+                f"{session.situation.work_key}/{session.situation.key}",
+                chapter.id if chapter else None,
+            )
+        span.end()
+        return data
+
+    def run_session(self, turns: int, index: int = 0) -> _Session:
+        """Start the *index*-th situation (cycling through all of them) and play *turns* turns."""
+        keys = sorted(self.situations)
+        session = self.start_session(*keys[index % len(keys)])
+        for i in range(turns):
+            self.turn(session, f"Ход {i}: оглеждам се.")
+        return session
+
+
+def _deep_size(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(item) for item in value.values())
+    elif isinstance(value, list):
+        size += sum(_deep_size(item) for item in value)
+    return size  # keys are interned role names, shared by every message
+
+
+def history_bytes(chat: ChatSession) -> int:
+    """Size of *chat*'s history: the messages, their text and their containers."""
+    if chat._gemini_chat is not None:
+        return _deep_size(chat._gemini_chat.get_history())
+    return _deep_size(chat.history)
+
+
+# ── Profile ──────────────────────────────────────────────────────────
+
+
+@dataclass
+class Report:
+    provider: str
+    sessions: int
+    turns_per_session: int
+    long_turns: int
+    samples: list[tuple[int, int]] = field(default_factory=list)  # (sessions done, bytes traced)
+    session_bytes: float = 0.0  # still allocated per finished session
+    turn_bytes: float = 0.0  # added per turn of the long session, history included
+    history_turn_bytes: float = 0.0  # of which the chat history
+    live_workers: int = 0
+    top_sites: list[str] = field(default_factory=list)
+
+    @property
+    def other_turn_bytes(self) -> float:
+        return self.turn_bytes - self.history_turn_bytes
+
+    def violations(self, session_budget: float, turn_budget: float) -> list[str]:
+        found = []
+        if self.session_bytes > session_budget:
+            found.append(f"{self.session_bytes:.0f} B retained per session (budget {session_budget:.0f})")
+        if self.other_turn_bytes > turn_budget:
+            found.append(f"{self.other_turn_bytes:.0f} B per turn outside the history (budget {turn_budget:.0f})")
+        if self.live_workers:
+            found.append(f"{self.live_workers} workers still tracked after their turns")
+        return found
+
+    def format(self) -> str:
+        lines = [
+            f"provider {self.provider}: {self.sessions} sessions x {self.turns_per_session} turns, "
+            f"then one session of {self.long_turns} turns",
+            "",
+            f"{'sessions':>9} {'traced KiB':>11}",
+            *(f"{done:9} {size / 1024:11.1f}" for done, size in self.samples),
+            "",
+            f"retained per finished session: {self.session_bytes:8.0f} B",
+            f"added per turn (long session): {self.turn_bytes:8.0f} B",
+            f"  chat history:                {self.history_turn_bytes:8.0f} B",
+            f"  everything else:             {self.other_turn_bytes:8.0f} B",
+            f"workers still tracked:         {self.live_workers:8}",
+            "",
+            "top allocation sites still held after the sessions:",
+            *self.top_sites,
+        ]
+        return "\n".join(lines)
+
+
+def _traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        )
+    )
+
+
+def profile(
+    sessions: int = 2000,
+    turns: int = 10,
+    long_turns: int = 2000,
+    provider: str = "openai",
+    state_encoding: str = "full",
+    samples: int = 10,
+    top: int = 10,
+    frames: int = 1,
+) -> Report:
+    """Run the sessions under tracemalloc and measure what stays allocated.
+
+    *frames* is the traceback depth recorded per allocation; more frames
+    show callers in :attr:`Report.top_sites` but make the run much slower.
+    """
+    engine = Engine(provider, state_encoding)
+    report = Report(provider, sessions, turns, long_turns)
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start(frames)
+    try:
+        # Imports, compiled templates and caches settle during the warm-up
+        for i in range(_WARMUP_SESSIONS):
+            engine.run_session(turns, i)
+        baseline = _snapshot()
+        report.samples.append((0, _traced()))
+
+        interval = max(1, sessions // samples)
+        for i in range(sessions):
+            engine.run_session(turns, i)
+            if (i + 1) % interval == 0 or i + 1 == sessions:
+                report.samples.append((i + 1, _traced()))
+        final = _snapshot()
+        report.session_bytes = (report.samples[-1][1] - report.samples[0][1]) / max(1, sessions)
+        report.top_sites = [str(stat) for stat in final.compare_to(baseline, "lineno")[:top] if stat.size_diff > 0]
+
+        session = engine.run_session(_WARMUP_TURNS)
+        before, history_before = _traced(), history_bytes(session.chat)
+        for i in range(long_turns):
+            engine.turn(session, f"Ход {i}: оглеждам се.")
+        after, history_after = _traced(), history_bytes(session.chat)
+        report.turn_bytes = (after - before) / max(1, long_turns)
+        report.history_turn_bytes = (history_after - history_before) / max(1, long_turns)
+        report.live_workers = len(engine.active_workers)
+    finally:
+        if not started:
+            tracemalloc.stop()
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--provider", choices=PROVIDERS, default="openai")
+    parser.add_argument("--state-encoding", choices=("full", "delta"), default="full")
+    parser.add_argument("--sessions", type=int, default=2000, help="short sessions to run (default 2000)")
+    parser.add_argument("--turns", type=int, default=10, help="turns per short session (default 10)")
+    parser.add_argument("--long-turns", type=int, default=2000, help="turns of the long session (default 2000)")
+    parser.add_argument("--top", type=int, default=10, help="allocation sites to list (default 10)")
+    parser.add_argument("--frames", type=int, default=1, help="traceback depth per allocation (default 1)")
+    parser.add_argument("--session-budget", type=float, default=DEFAULT_SESSION_BUDGET, help="bytes per session")
+    parser.add_argument("--turn-budget", type=float, default=DEFAULT_TURN_BUDGET, help="bytes per turn")
+    args = parser.parse_args(argv)
+
+    report = profile(
+        args.sessions, args.turns, args.long_turns, args.provider, args.state_encoding, top=args.top, frames=args.frames
+    )
+    print(report.format())
+    violations = report.violations(args.session_budget, args.turn_budget)
+    for violation in violations:
+        print(f"OVER BUDGET: {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""Startup-side loading: the library YAML, the book texts and chapter excerpts."""
+
+from __future__ import annotations
+
+import pytest
+
+from literaplay.book_loader import BookTextIndex, get_chapter_excerpt, load_library
+
+BOOKS = ("nemili", "pod_igoto", "tyutyun")
+
+
+def test_load_library(benchmark, books_dir):
+    library = benchmark(load_library, books_dir)
+    assert set(BOOKS) <= set(library)
+
+
+@pytest.mark.parametrize("book", BOOKS)
+def test_book_text_index(benchmark, books_dir, book):
+    index = benchmark(BookTextIndex, books_dir / book / "text.md")
+    assert index.titles()
+
+
+@pytest.mark.parametrize("max_chars", [4000, 40_000])
+def test_get_chapter_excerpt(benchmark, library, book_texts, max_chars):
+    chapters = library["pod_igoto"]["situations"][0]["chapters"]
+    excerpt = benchmark(get_chapter_excerpt, book_texts, "pod_igoto", chapters[0]["id"], chapters, max_chars)
+    assert excerpt
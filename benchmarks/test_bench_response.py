@@ -0,0 +1,69 @@
+"""Turning model output into a validated reply: parsing, repair and validation."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from bench_json_repair import build_corpus
+from bench_response_decode import RESPONSE, dict_path, fast_path
+
+from literaplay import fast_json
+from literaplay.json_repair import repair_json
+from literaplay.knowledge_guard import LeakDetector
+from literaplay.response_parser import parse_ai_json_response, validate_story_response
+from literaplay.story_state import ChapterDef, StoryState
+
+_PROSE = "Ето отговора на разказвача, както е поискано. " * 20
+
+PARSE_INPUTS = {
+    "clean": RESPONSE,
+    "fenced": f"```json\n{RESPONSE}\n```",
+    "prose_wrapped": f"{_PROSE}\n{RESPONSE}\nНадявам се това да помогне.",
+    # Braces in the prose before the object send the extractor down false starts
+    "adversarial_braces": 'Героят каза {тихо} и {после} добави: "}" ' * 50 + RESPONSE,
+    # Cut off by max_tokens: every stage runs and fails
+    "adversarial_truncated": RESPONSE[: len(RESPONSE) // 2],
+    "adversarial_no_object": _PROSE * 10,
+}
+_UNPARSEABLE = {"adversarial_truncated", "adversarial_no_object"}
+
+
+@pytest.mark.parametrize("kind", list(PARSE_INPUTS))
+def test_parse_ai_json_response(benchmark, kind):
+    result = benchmark(parse_ai_json_response, PARSE_INPUTS[kind])
+    assert (result is None) == (kind in _UNPARSEABLE)
+
+
+def test_repair_json_corpus(benchmark):
+    """The outputs parse_ai_json_response rejects, repaired one after another."""
+    rejected = [text for _, text in build_corpus() if parse_ai_json_response(text) is None]
+    results = benchmark(lambda: [repair_json(text) for text in rejected])
+    assert any(r.value for r in results)
+
+
+@pytest.mark.parametrize("path", [dict_path, fast_path], ids=["dict", "fast"])
+def test_decode_to_messages(benchmark, path):
+    """Model output to the bridge's JSON messages (see bench_response_decode.py)."""
+    assert benchmark(path)
+
+
+@pytest.fixture(scope="module")
+def chapter(library) -> ChapterDef:
+    return ChapterDef.from_dict(library["pod_igoto"]["situations"][0]["chapters"][0])
+
+
+@pytest.fixture(scope="module")
+def state() -> StoryState:
+    state = StoryState(work_key="pod_igoto_sit1")
+    for i in range(StoryState.KEY_EVENTS_CAP):
+        state.add_key_event(f"Събитие {i}")
+    return state
+
+
+@pytest.mark.parametrize("variant", ["dict", "typed", "leak_scan"])
+def test_validate_story_response(benchmark, state, chapter, variant):
+    data = fast_json.decode_story_response(RESPONSE) if variant == "typed" else json.loads(RESPONSE)
+    detector = LeakDetector(["Соколов", "Рада", "Кандов", "Мунчо", "Огнянов"]) if variant == "leak_scan" else None
+    result = benchmark(validate_story_response, data, state, chapter, True, detector)
+    assert result["reply"]
@@ -0,0 +1,74 @@
+"""Per-turn story state work: building the context block and recording replies."""
+
+from __future__ import annotations
+
+import pytest
+from bench_context_injection import make_manager
+
+from literaplay.book_loader import get_chapter_excerpt
+from literaplay.story_state import StoryStateManager
+
+_LONG_SESSION_TURNS = 10_000
+
+
+@pytest.fixture(scope="module")
+def excerpt(library, book_texts) -> str:
+    chapters = library["pod_igoto"]["situations"][0]["chapters"]
+    return get_chapter_excerpt(book_texts, "pod_igoto", chapters[0]["id"], chapters)
+
+
+# 0 turns: a new chapter; 12: mid-chapter; 40: key events past KEY_EVENTS_CAP
+@pytest.mark.parametrize("encoding", ["full", "delta"])
+@pytest.mark.parametrize("turns", [0, 12, 40])
+def test_build_context_injection(benchmark, excerpt, turns, encoding):
+    manager = make_manager(turns, encoding)
+    block = benchmark(manager.build_context_injection, excerpt)
+    assert block
+
+
+def test_build_context_injection_cold_template(benchmark, excerpt):
+    """The first turn of a chapter, when the chapter template is compiled."""
+    manager = make_manager()
+
+    def build() -> str:
+        manager._templates.clear()
+        return manager.build_context_injection(excerpt)
+
+    assert benchmark(build)
+
+
+def _responses(count: int) -> list[dict]:
+    """Replies as a long session produces them: most add an event, props come and go."""
+    responses = []
+    for i in range(count):
+        response = {
+            "reply": [{"character": "Бай Марко", "text": f"Кой е там? Реплика {i}."}],
+            "options": ["Излез на светло", "Замълчи"],
+            "ended": False,
+            "mood": "подозрителен" if i % 2 else "спокоен",
+            "location": "Оборът на Бай Марко",
+            "trust_level": i % 7 - 3,
+            "tension": "непознат в обора",
+            "active_props": [f"предмет {i % 15}", "фенер"],
+        }
+        if i % 3:
+            response["key_event"] = f"Събитие {i}"
+        if i % 4 == 0:
+            response["characters_present"] = ["Бай Марко", "Иван Краличът"]
+        responses.append(response)
+    return responses
+
+
+def test_record_turn_long_session(benchmark, library):
+    situation = dict(library["pod_igoto"]["situations"][0], _key="pod_igoto_sit1")
+    responses = _responses(_LONG_SESSION_TURNS)
+
+    def record_all(manager: StoryStateManager) -> StoryStateManager:
+        for response in responses:
+            manager.record_turn(response)
+        return manager
+
+    manager = benchmark.pedantic(
+        record_all, setup=lambda: ((StoryStateManager(situation),), {}), rounds=5, warmup_rounds=1
+    )
+    assert manager.get_state().total_turn_count == _LONG_SESSION_TURNS
@@ -0,0 +1,23 @@
+"""Memory budget of long and many sessions, on the stand-in provider (see memory_profile.py)."""
+
+from __future__ import annotations
+
+import pytest
+from memory_profile import DEFAULT_SESSION_BUDGET, DEFAULT_TURN_BUDGET, PROVIDERS, Engine, profile
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_growth_within_budget(provider):
+    report = profile(sessions=200, turns=4, long_turns=200, provider=provider)
+    print(report.format())
+    assert report.violations(DEFAULT_SESSION_BUDGET, DEFAULT_TURN_BUDGET) == []
+    assert report.history_turn_bytes > 0
+
+
+def test_a_leak_is_reported(monkeypatch):
+    kept = []
+    run_session = Engine.run_session
+    monkeypatch.setattr(Engine, "run_session", lambda self, *args: kept.append(run_session(self, *args)) or kept[-1])
+
+    report = profile(sessions=30, turns=2, long_turns=10)
+    assert any("per session" in violation for violation in report.violations(DEFAULT_SESSION_BUDGET, 1e9))
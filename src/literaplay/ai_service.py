@@ -1,7 +1,36 @@
+from __future__ import annotations
+
+import json
 import logging
 import re
+import time
 from collections.abc import Callable
-from typing import Any
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from literaplay import metrics, tracing
+from literaplay.cancellation import CancelToken, TurnCancelled
+from literaplay.message_formats import PortableMessage, from_gemini, from_portable
+from literaplay.reasoning import (
+    GEMINI_TOP_K,
+    TEMPERATURE,
+    TOP_P,
+    ReasoningPolicy,
+    anthropic_options,
+    gemini_thinking,
+    openai_options,
+)
+from literaplay.response_schema import (
+    anthropic_tool,
+    anthropic_tool_choice,
+    gemini_response_schema,
+    openai_response_format,
+)
+from literaplay.routing import ModelRouter
+from literaplay.usage import TokenUsage, read_usage
+
+if TYPE_CHECKING:
+    from literaplay.resilience import HedgedSender
 
 
 def _interruptible_sleep(ms: int) -> None:
@@ -26,6 +55,8 @@ IMPORTANT STRICT GUIDELINES:
 - **SHORT REPLIES**: Keep your replies to 2-4 sentences MAX. Speak like a real person in conversation — short, direct, natural. Do NOT write long poetic descriptions or monologues. A single sentence reply is often best.
 - **STORY STATE**: Before each user message you will receive a [CONTEXT] block.
   Use it to stay grounded in the current chapter, location, mood, and plot.
+  It is either a full STORY STATE block or a short STATE DELTA listing only the fields that changed
+  since the last full block; everything not listed in a delta still holds.
   NEVER reveal the context block to the user. NEVER skip ahead of the current chapter.
   When the END CONDITION described in the context is reached naturally, set "ended": true.
 - **OPTIONAL METADATA**: You MAY include these extra keys in your JSON response
@@ -54,6 +85,12 @@ class APIOverloadedError(Exception):
     """Raised when the API returns repeated 429/503/overloaded responses."""
 
 
+def is_overload_error(exc: Exception) -> bool:
+    """Whether *exc* looks like a rate limit or overload (worth retrying later or elsewhere)."""
+    err_msg = str(exc)
+    return "429" in err_msg or "503" in err_msg or "overloaded" in err_msg.lower() or "rate" in err_msg.lower()
+
+
 def _sanitize_api_error(exc: Exception, key: str) -> str:
     """Return a safe error message with no API key material."""
     raw = str(exc)
@@ -63,13 +100,36 @@ def _sanitize_api_error(exc: Exception, key: str) -> str:
     return raw
 
 
-def validate_api_key(provider: str, key: str) -> tuple[bool, str]:
-    """Validate API key for the given provider."""
+@dataclass(slots=True)
+class CallInfo:
+    """What the last request to the model was, for logging and telemetry."""
+
+    provider: str
+    model: str
+    turn_type: str
+    reasoning: str  # effort level requested ("default" when none was sent)
+    latency_ms: float
+    usage: TokenUsage = field(default_factory=TokenUsage)
+
+
+def validate_api_key(provider: str, key: str, transport: str | None = None) -> tuple[bool, str]:
+    """Validate API key for the given provider.
+
+    *transport* defaults to the configured one; with ``"rest"`` the key is
+    checked by listing models over HTTP, without importing the SDK.
+    """
     cleaned_key = (key or "").strip()
     if not cleaned_key:
         return False, "Моля, въведете API ключ."
 
+    if transport is None:
+        from literaplay import config
+
+        transport = config.get_transport(provider)
+
     try:
+        if transport == "rest" and provider in ("gemini", "openai", "anthropic"):
+            return _validate_key_rest(provider, cleaned_key)
         if provider == "gemini":
             return _validate_gemini_key(cleaned_key)
         elif provider == "openai":
@@ -84,6 +144,13 @@ def validate_api_key(provider: str, key: str) -> tuple[bool, str]:
         return False, f"Невалиден ключ или проблем с API: {safe_msg}"
 
 
+def _validate_key_rest(provider: str, key: str) -> tuple[bool, str]:
+    from literaplay.rest_transport import RestClient
+
+    RestClient(provider, key).list_models()
+    return True, "Ключът е валиден."
+
+
 def _validate_gemini_key(key: str) -> tuple[bool, str]:
     import google.genai as genai
     from google.genai import types
@@ -137,71 +204,290 @@ def validate_api_key_with_available_sdk(key: str) -> tuple[bool, str]:
 
 
 class ChatSession:
-    """Provider-agnostic chat session wrapper."""
+    """Provider-agnostic chat session wrapper.
+
+    With ``structured_output="schema"`` (default) the provider is constrained
+    to ``STORY_RESPONSE_SCHEMA``: OpenAI json_schema strict mode, Gemini
+    ``response_schema``, and a forced tool call for Anthropic. ``"json"``
+    only asks for a JSON object, for models without schema support.
 
-    def __init__(self, provider: str, client: Any, model: str, system_prompt: str):
+    With ``transport="rest"`` *client* is a
+    :class:`~literaplay.rest_transport.RestClient`. Replies are streamed
+    over HTTP, and the history is kept in ``self.history`` for every
+    provider, Gemini included.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        client: Any,
+        model: str,
+        system_prompt: str,
+        structured_output: str = "schema",
+        transport: str = "sdk",
+        reasoning: ReasoningPolicy | None = None,
+    ):
         self.provider = provider
         self.client = client
         self.model = model
         self.system_prompt = system_prompt
+        self.structured_output = structured_output
+        self.transport = transport
+        self.reasoning = reasoning
         self.history: list[dict] = []
+        self.last_call: CallInfo | None = None
+        # Receives each completed request, and each failed or cancelled one that reported token usage
+        self.on_usage: Callable[[CallInfo], None] | None = None
         self._gemini_chat = None
+        self._gemini_chat_model: str | None = None  # None: the chat was created for self.model
 
-    def _init_gemini_chat(self):
+    def _gemini_config(self, level: str = "default", model: str | None = None, timeout: float | None = None):
         from google.genai import types
 
-        config = types.GenerateContentConfig(
-            temperature=0.2,
-            top_p=0.95,
-            top_k=40,
+        thinking = gemini_thinking(model or self.model, level)
+        return types.GenerateContentConfig(
+            temperature=TEMPERATURE,
+            top_p=TOP_P,
+            top_k=GEMINI_TOP_K,
             system_instruction=self.system_prompt,
             response_mime_type="application/json",
+            response_schema=gemini_response_schema() if self.structured_output == "schema" else None,
+            thinking_config=types.ThinkingConfig(**thinking) if thinking else None,
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout is not None else None,
         )
-        self._gemini_chat = self.client.chats.create(
-            model=self.model,
-            config=config,
-            history=[],
+
+    def _init_gemini_chat(self, model: str | None = None, history: list | None = None):
+        chat = self.client.chats.create(
+            model=model or self.model,
+            config=self._gemini_config(model=model),
+            history=history or [],
         )
+        self._gemini_chat = chat
+        self._gemini_chat_model = model if model != self.model else None
+        return chat
+
+    def _gemini_chat_for(self, model: str):
+        """The SDK chat bound to *model*, carrying the conversation over when the model changes."""
+        chat = self._gemini_chat
+        if chat is None:
+            return self._init_gemini_chat(model)
+        if (self._gemini_chat_model or self.model) != model:
+            return self._init_gemini_chat(model, history=list(chat.get_history()))
+        return chat
+
+    @property
+    def _uses_gemini_chat(self) -> bool:
+        return self.provider == "gemini" and self.transport == "sdk"
+
+    def portable_history(self) -> list[PortableMessage]:
+        """The conversation so far as portable messages (see :mod:`literaplay.message_formats`)."""
+        if self._uses_gemini_chat:
+            return from_gemini(self._gemini_chat.get_history()) if self._gemini_chat is not None else []
+        return [dict(m) for m in self.history]
+
+    def load_history(self, history: list[PortableMessage]) -> None:
+        """Replace the conversation with portable *history*, e.g. one started with another provider."""
+        if self._uses_gemini_chat:
+            self._init_gemini_chat(self._gemini_chat_model, history=from_portable("gemini", history))
+        else:
+            self.history = from_portable("anthropic", history) if self.provider == "anthropic" else list(history)
+
+    def fork(self) -> ChatSession:
+        """A copy of this session; its turns do not affect this one unless passed to :meth:`adopt`."""
+        clone = ChatSession(
+            self.provider,
+            self.client,
+            self.model,
+            self.system_prompt,
+            structured_output=self.structured_output,
+            transport=self.transport,
+            reasoning=self.reasoning,
+        )
+        if self._uses_gemini_chat and self._gemini_chat is not None:
+            clone._init_gemini_chat(self._gemini_chat_model, history=list(self._gemini_chat.get_history()))
+        else:
+            clone.history = list(self.history)
+        clone.on_usage = self.on_usage
+        return clone
+
+    def adopt(self, fork: ChatSession) -> None:
+        """Continue from *fork*'s conversation (a session from :meth:`fork`)."""
+        self.history = fork.history
+        self._gemini_chat, self._gemini_chat_model = fork._gemini_chat, fork._gemini_chat_model
+        self.last_call = fork.last_call
+
+    def record_exchange(self, text: str, reply: str) -> None:
+        """Append a turn answered elsewhere, so the next request sees it."""
+        exchange = [{"role": "user", "content": text}, {"role": "assistant", "content": reply}]
+        if self._uses_gemini_chat:
+            previous = list(self._gemini_chat.get_history()) if self._gemini_chat is not None else []
+            self._init_gemini_chat(self._gemini_chat_model, history=previous + from_portable("gemini", exchange))
+        else:
+            self.history.extend(exchange)
+
+    def send_message(
+        self,
+        text: str,
+        on_delta: Callable[[str], None] | None = None,
+        turn_type: str = "turn",
+        model: str | None = None,
+        cancel: CancelToken | None = None,
+    ) -> str:
+        """Send *text* and return the reply.
+
+        *model* overrides the session's model for this turn only (see
+        :mod:`literaplay.routing`). *turn_type* picks the reasoning effort
+        from :attr:`reasoning` (none is sent without a policy). *on_delta*
+        gets streamed fragments (REST transport only). Timing, effort and
+        token usage are kept in :attr:`last_call`, and on an ``ai.request``
+        span when the turn is traced (see :mod:`literaplay.tracing`). Every
+        request that reported usage, including one that then failed or was
+        cancelled, is passed to :attr:`on_usage`, since it is billed.
+
+        *cancel* carries the turn's deadline down to the HTTP request and
+        lets another thread abort it (see :mod:`literaplay.cancellation`);
+        the call then raises :class:`TurnCancelled` or
+        :class:`DeadlineExceeded`. A failed turn leaves the history as it was.
+        """
+        model = model or self.model
+        level = self.reasoning.level(model, turn_type) if self.reasoning else "default"
+        history_len = len(self.history)
+        usage = TokenUsage()
+        start = time.perf_counter()
+        with tracing.span(
+            "ai.request", client=True, provider=self.provider, model=model, transport=self.transport, reasoning=level
+        ) as span:
+            try:
+                if cancel is None:
+                    reply = self._send(text, on_delta, level, model, usage=usage)
+                else:
+                    cancel.check()
+                    with cancel.bind():
+                        reply = self._send(text, on_delta, level, model, cancel.remaining(), usage)
+            except Exception as exc:
+                del self.history[history_len:]  # keep user/assistant turns paired for the retry
+                if self.on_usage is not None and (usage.input_tokens or usage.output_tokens):
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    self.on_usage(CallInfo(self.provider, model, turn_type, level, elapsed_ms, usage))
+                if cancel is not None and not isinstance(exc, TurnCancelled) and (cancel.cancelled or cancel.expired):
+                    raise cancel.error() from exc
+                if not isinstance(exc, TurnCancelled):
+                    kind = "overload" if is_overload_error(exc) else "other"
+                    metrics.REQUEST_ERRORS.labels(self.provider, model, kind).inc()
+                raise
+            if span is not None:
+                span.set(
+                    input_tokens=usage.input_tokens,
+                    output_tokens=usage.output_tokens,
+                    cached_tokens=usage.cached_tokens,
+                )
+        elapsed = time.perf_counter() - start
+        metrics.REQUEST_SECONDS.labels(self.provider, model).observe(elapsed)
+        self.last_call = CallInfo(self.provider, model, turn_type, level, elapsed * 1000, usage)
+        if self.on_usage is not None:
+            self.on_usage(self.last_call)
+        logging.info(
+            "AI call: %s %s, %s turn, reasoning=%s, %.0f ms",
+            self.provider,
+            model,
+            turn_type,
+            level,
+            self.last_call.latency_ms,
+        )
+        return reply
+
+    def _send(
+        self,
+        text: str,
+        on_delta: Callable[[str], None] | None,
+        level: str,
+        model: str,
+        timeout: float | None = None,
+        usage: TokenUsage | None = None,
+    ) -> str:
+        usage = usage if usage is not None else TokenUsage()
+        if self.transport == "rest":
+            self.history.append({"role": "user", "content": text})
+            reply = self.client.complete(
+                model, self.system_prompt, self.history, self.structured_output, on_delta, level, timeout, usage
+            )
+            self.history.append({"role": "assistant", "content": reply})
+            return reply
+
+        # The SDKs take the time left as a per-request timeout
+        timeout_kwargs: dict[str, Any] = {} if timeout is None else {"timeout": timeout}
 
-    def send_message(self, text: str) -> str:
         if self.provider == "gemini":
-            if self._gemini_chat is None:
-                self._init_gemini_chat()
-            response = self._gemini_chat.send_message(text)
+            chat = self._gemini_chat_for(model)
+            if gemini_thinking(model, level) is None and timeout is None:
+                response = chat.send_message(text)
+            else:  # a per-call config replaces the chat's, so it repeats everything
+                response = chat.send_message(text, config=self._gemini_config(level, model, timeout))
+            usage.update(read_usage("gemini", response))
             return getattr(response, "text", "") or ""
 
         elif self.provider == "openai":
             self.history.append({"role": "user", "content": text})
             response = self.client.chat.completions.create(
-                model=self.model,
+                model=model,
                 messages=[{"role": "system", "content": self.system_prompt}] + self.history,
-                response_format={"type": "json_object"},
-                temperature=0.2,
-                top_p=0.95,
+                response_format=(
+                    openai_response_format() if self.structured_output == "schema" else {"type": "json_object"}
+                ),
+                **openai_options(model, level),
+                **timeout_kwargs,
             )
+            usage.update(read_usage("openai", response))
             reply = response.choices[0].message.content or ""
             self.history.append({"role": "assistant", "content": reply})
             return reply
 
         elif self.provider == "anthropic":
             self.history.append({"role": "user", "content": text})
+            kwargs: dict[str, Any] = anthropic_options(model, level)
+            if self.structured_output == "schema":
+                # Extended thinking cannot be combined with a forced tool call
+                choice = {"type": "auto"} if "thinking" in kwargs else anthropic_tool_choice()
+                kwargs.update(tools=[anthropic_tool()], tool_choice=choice)
             response = self.client.messages.create(
-                model=self.model,
+                model=model,
                 system=self.system_prompt,
                 messages=self.history,
-                max_tokens=4096,
-                temperature=0.2,
-                top_p=0.95,
+                **kwargs,
+                **timeout_kwargs,
             )
-            reply = response.content[0].text if response.content else ""
+            usage.update(read_usage("anthropic", response))
+            reply = _anthropic_reply_text(response)
+            # Stored as plain text so the history does not need tool_result turns
             self.history.append({"role": "assistant", "content": reply})
             return reply
 
         raise ValueError(f"Unknown provider: {self.provider}")
 
 
+def _anthropic_reply_text(response: Any) -> str:
+    """Return the story JSON from a tool call, or the first text block (thinking blocks skipped)."""
+    blocks = response.content or []
+    for block in blocks:
+        if getattr(block, "type", None) == "tool_use":
+            return json.dumps(block.input, ensure_ascii=False)
+    for block in blocks:
+        if getattr(block, "type", None) not in ("thinking", "redacted_thinking"):
+            return block.text
+    return ""
+
+
 class AIService:
-    def __init__(self, provider: str, api_key: str, model_name: str):
+    def __init__(
+        self,
+        provider: str,
+        api_key: str,
+        model_name: str,
+        structured_output: str = "schema",
+        transport: str = "sdk",
+        reasoning: ReasoningPolicy | None = None,
+        fast_model: str | None = None,
+    ):
         if not api_key:
             raise ValueError("API Key is required")
         if not provider:
@@ -210,55 +496,132 @@ class AIService:
         self.provider = provider
         self.api_key = api_key
         self.model_name = model_name
+        self.structured_output = structured_output
+        self.transport = transport
+        self.reasoning = reasoning
+        self.router = ModelRouter(model_name, fast_model)
+        self.hedge: HedgedSender | None = None
         self.client = self._create_client()
-        logging.info("AI Client initialized for provider: %s", provider)
+        logging.info("AI Client initialized for provider: %s (%s)", provider, transport)
 
     def _create_client(self):
+        # Clients share the pooled HTTP client, whose connections a CancelToken can abort
+        from literaplay.rest_transport import RestClient, sdk_http_client, shared_http_client
+
+        if self.transport == "rest":
+            return RestClient(self.provider, self.api_key)
         if self.provider == "gemini":
             import google.genai as genai
 
-            return genai.Client(api_key=self.api_key)
+            return genai.Client(
+                api_key=self.api_key, http_options=genai.types.HttpOptions(httpx_client=shared_http_client())
+            )
         elif self.provider == "openai":
             import openai
 
-            return openai.OpenAI(api_key=self.api_key)
+            return openai.OpenAI(api_key=self.api_key, http_client=sdk_http_client(openai))
         elif self.provider == "anthropic":
             import anthropic
 
-            return anthropic.Anthropic(api_key=self.api_key)
+            return anthropic.Anthropic(api_key=self.api_key, http_client=sdk_http_client(anthropic))
         raise ValueError(f"Unknown provider: {self.provider}")
 
     def create_chat(self, system_instruction: str) -> ChatSession:
         """Creates a new chat session with the given system instruction."""
         enhanced_instruction = f"{system_instruction}\n\n{STRICT_SYSTEM_INSTRUCTION}"
-        session = ChatSession(self.provider, self.client, self.model_name, enhanced_instruction)
-        if self.provider == "gemini":
+        session = ChatSession(
+            self.provider,
+            self.client,
+            self.model_name,
+            enhanced_instruction,
+            structured_output=self.structured_output,
+            transport=self.transport,
+            reasoning=self.reasoning,
+        )
+        if self.provider == "gemini" and self.transport == "sdk":
             session._init_gemini_chat()
         return session
 
+    def create_chat_from(self, other: ChatSession) -> ChatSession:
+        """A session of this service continuing *other*'s conversation, which may be another provider's."""
+        session = ChatSession(
+            self.provider,
+            self.client,
+            self.model_name,
+            other.system_prompt,
+            structured_output=self.structured_output,
+            transport=self.transport,
+            reasoning=self.reasoning,
+        )
+        session.load_history(other.portable_history())
+        session.on_usage = other.on_usage
+        return session
+
+    def route(self, turn_type: str = "turn", key_beat: bool | None = None) -> str | None:
+        """The model for a turn (None: the session's own), see :mod:`literaplay.routing`."""
+        if not self.router.enabled:
+            return None
+        return self.router.choose(turn_type == "transition" if key_beat is None else key_beat)
+
+    def enable_hedging(self, secondary: AIService, delay_s: float) -> None:
+        """Hedge slow turns and fail over to *secondary*, a service for another provider.
+
+        See :mod:`literaplay.resilience`.
+        """
+        from literaplay.resilience import HedgedSender
+
+        self.hedge = HedgedSender(self, secondary, delay_s)
+
     def send_message(
-        self, chat_session: ChatSession, text: str, status_callback: Callable[[str], None] | None = None
+        self,
+        chat_session: ChatSession,
+        text: str,
+        status_callback: Callable[[str], None] | None = None,
+        turn_type: str = "turn",
+        key_beat: bool | None = None,
+        cancel: CancelToken | None = None,
     ) -> str:
         """Sends a message to the chat session and returns the response text.
-        Handles rate limiting with retries."""
+        Handles rate limiting with retries.
+
+        The model is chosen by :attr:`router`: *key_beat* turns (by default
+        transitions) get the session's model, routine ones may go to the
+        provider's fast model. With :meth:`enable_hedging` the turn goes
+        through :attr:`hedge` instead of the retry loop. *cancel* bounds the
+        whole turn, retries included (see :meth:`ChatSession.send_message`).
+        """
         if not chat_session:
             raise ValueError("Chat session is not active")
+        with tracing.span("ai.send", turn_type=turn_type, hedged=self.hedge is not None):
+            if self.hedge is not None:
+                return self.hedge.send(chat_session, text, status_callback, turn_type, key_beat, cancel)
+            return self._send_with_retries(chat_session, text, status_callback, turn_type, key_beat, cancel)
 
+    def _send_with_retries(self, chat_session, text, status_callback, turn_type, key_beat, cancel) -> str:
         max_retries = _MAX_RETRIES
         retry_delay = _INITIAL_RETRY_DELAY_S
+        model = self.route(turn_type, key_beat)
 
         for attempt in range(max_retries):
             try:
-                return chat_session.send_message(text)
+                reply = chat_session.send_message(text, turn_type=turn_type, model=model, cancel=cancel)
+                if model is not None and chat_session.last_call is not None:
+                    self.router.observe(model, chat_session.last_call.latency_ms, turn_type)
+                return reply
+            except TurnCancelled:
+                raise
             except Exception as e:
-                err_msg = str(e)
-                is_overload = (
-                    "429" in err_msg or "503" in err_msg or "overloaded" in err_msg.lower() or "rate" in err_msg.lower()
-                )
-                if not is_overload:
+                if not is_overload_error(e):
                     logging.error("API Error: %s", e)
                     raise
+                tracing.annotate(retries=attempt + 1)
+                if model is not None:
+                    model = self.router.fallback(model)
+                remaining = cancel.remaining() if cancel is not None else None
+                if remaining is not None and remaining < retry_delay:
+                    break  # the backoff would outlast the turn's deadline
                 if attempt < max_retries - 1:
+                    metrics.RETRIES.labels(self.provider).inc()
                     msg = f"Претоварен. Опит {attempt + 1}/3 след {retry_delay}s..."
                     logging.warning(msg)
                     if status_callback:
@@ -267,6 +630,8 @@ class AIService:
                     remaining_ms = retry_delay * 1000
                     while remaining_ms > 0:
                         chunk = min(remaining_ms, 500)
+                        if cancel is not None:
+                            cancel.check()
                         _interruptible_sleep(chunk)
                         remaining_ms -= chunk
 
@@ -280,10 +645,13 @@ class AIService:
         user_text: str,
         context_injection: str,
         status_callback: Callable[[str], None] | None = None,
+        turn_type: str = "turn",
+        key_beat: bool | None = None,
+        cancel: CancelToken | None = None,
     ) -> str:
         """Send a message with story-state context prepended."""
         if context_injection:
             augmented = f"[CONTEXT]\n{context_injection}\n[/CONTEXT]\n\nUser: {user_text}"
         else:
             augmented = user_text
-        return self.send_message(chat_session, augmented, status_callback)
+        return self.send_message(chat_session, augmented, status_callback, turn_type, key_beat, cancel)
@@ -82,7 +82,9 @@ class BookTextIndex:
     """Index of chapter excerpts parsed from a text.md file.
 
     Chapters are split by '## ' headers. The text under each header is stored
-    keyed by the header title (without the '## ' prefix).
+    keyed by the header title (without the '## ' prefix). A title repeated in a
+    later '# ' part (books that restart numbering per part) is keyed
+    "<title> (<part>)", e.g. "I (Втора част)".
     """
 
     def __init__(self, text_path: Path) -> None:
@@ -92,13 +94,18 @@ class BookTextIndex:
     def _parse(self, text_path: Path) -> None:
         content = text_path.read_text(encoding="utf-8")
         current_title: str | None = None
+        current_part = ""
         current_lines: list[str] = []
 
         for line in content.splitlines(keepends=True):
-            if line.startswith("## "):
+            if line.startswith("# "):
+                current_part = line[2:].strip()
+            elif line.startswith("## "):
                 if current_title is not None:
                     self._chapters[current_title] = "".join(current_lines).strip()
                 current_title = line[3:].rstrip("\n").strip()
+                if current_title in self._chapters and current_part:
+                    current_title = f"{current_title} ({current_part})"
                 current_lines = []
             else:
                 if current_title is not None:
@@ -107,6 +114,14 @@ class BookTextIndex:
         if current_title is not None:
             self._chapters[current_title] = "".join(current_lines).strip()
 
+    def titles(self) -> list[str]:
+        """Return chapter titles in book order."""
+        return list(self._chapters)
+
+    def get_text(self, chapter_title: str) -> str:
+        """Return the full text for chapter_title, or '' if not found."""
+        return self._chapters.get(chapter_title, "")
+
     def get_excerpt(self, chapter_title: str, max_chars: int = 4000) -> str:
         """Return text for chapter_title, truncated to max_chars. Returns '' if not found."""
         text = self._chapters.get(chapter_title, "")
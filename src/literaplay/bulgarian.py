@@ -0,0 +1,8 @@
+"""Bulgarian word lists shared by the text-matching modules."""
+
+from __future__ import annotations
+
+# Honorifics that prefix names and are dropped or added freely ("Бай Марко" / "Марко"), lower-cased
+HONORIFICS = frozenset(
+    {"бай", "баба", "дядо", "поп", "хаджи", "чорбаджи", "кака", "бате", "фон", "господин", "госпожа"}
+)
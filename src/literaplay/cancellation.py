@@ -0,0 +1,152 @@
+"""Per-turn deadlines and cancellation of in-flight requests.
+
+A :class:`CancelToken` belongs to one turn. It carries the turn's deadline
+and can be cancelled from any thread (the user leaves the chat, changes the
+model or closes the app). Code that sends the turn runs inside
+:meth:`CancelToken.bind`.
+
+The bind makes cancellation reach the network. Every HTTP connection in
+:func:`~literaplay.rest_transport.shared_http_client`, which the REST
+transport and the provider SDKs share, is created by a tracking network
+backend (see :class:`~literaplay.rest_transport.CancellableTransport`).
+Whenever a thread reads from or writes to a connection, the backend
+records that socket as the thread's active stream. Cancelling a
+token shuts down the sockets its threads are blocked on. Closing a socket
+from another thread would not wake the blocked read, but a shutdown does,
+so the worker returns at once instead of when the provider answers. The
+connection is dropped from the pool. Reads are also capped at the time
+left before the deadline.
+
+A cancelled turn raises :class:`TurnCancelled`; one that ran out of time
+raises :class:`DeadlineExceeded`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import Protocol
+
+
+class TurnCancelled(Exception):
+    """The turn was cancelled before it finished; *reason* says why."""
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class DeadlineExceeded(TurnCancelled):
+    """The turn ran past its deadline."""
+
+    def __init__(self, reason: str = "deadline exceeded") -> None:
+        super().__init__(reason)
+
+
+class CancelToken:
+    """Cancellation flag and optional deadline for one turn; thread-safe."""
+
+    def __init__(self, timeout_s: float | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.deadline = None if timeout_s is None else clock() + timeout_s
+        self.reason: str | None = None
+        self._lock = threading.Lock()
+        self._threads: set[int] = set()
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        """Cancelled explicitly (see :attr:`reason`); :attr:`expired` is checked separately."""
+        return self.reason is not None
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and self._clock() >= self.deadline
+
+    def remaining(self) -> float | None:
+        """Seconds left before the deadline (never negative), or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self._clock())
+
+    def error(self) -> TurnCancelled:
+        """The exception describing why this token stopped its turn."""
+        if self.cancelled:
+            return TurnCancelled(self.reason or "cancelled")
+        return DeadlineExceeded()
+
+    def check(self) -> None:
+        """Raise :meth:`error` if the turn was cancelled or is past its deadline."""
+        if self.cancelled or self.expired:
+            raise self.error()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Stop the turn: abort its blocked network calls and run :meth:`on_cancel` callbacks."""
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            threads, callbacks = list(self._threads), list(self._callbacks)
+        for ident in threads:
+            stream = active_streams.get(ident)
+            if stream is not None:
+                stream.abort()
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call *callback* on :meth:`cancel` (at once if already cancelled).
+
+        Returns a function that unregisters it, for callers that finish
+        before the token is cancelled.
+        """
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def child(self) -> CancelToken:
+        """A token with the same deadline, cancelled with this one but also cancellable alone."""
+        token = CancelToken(clock=self._clock)
+        token.deadline = self.deadline
+        self.on_cancel(lambda: token.cancel(self.reason or "cancelled"))
+        return token
+
+    @contextlib.contextmanager
+    def bind(self) -> Iterator[CancelToken]:
+        """Make this the current thread's token, so its network calls can be aborted."""
+        ident = threading.get_ident()
+        previous = getattr(_local, "token", None)
+        with self._lock:
+            self._threads.add(ident)
+        _local.token = self
+        try:
+            yield self
+        finally:
+            _local.token = previous
+            with self._lock:
+                self._threads.discard(ident)
+
+
+def current_token() -> CancelToken | None:
+    """The token bound to the current thread, if any."""
+    return getattr(_local, "token", None)
+
+
+class Abortable(Protocol):
+    def abort(self) -> None: ...
+
+
+_local = threading.local()
+# Thread ident -> the connection that thread is blocked on (only while reading or writing);
+# maintained by the network backend in literaplay.rest_transport
+active_streams: dict[int, Abortable] = {}
@@ -0,0 +1,115 @@
+"""Compact library catalog for the menu and per-situation details on demand.
+
+The full ``LIBRARY`` carries every situation's prompt (with ``COMMON_RULES``
+prepended), intro, chapter list and choices, none of which the menu shows.
+:func:`build_catalog` keeps only what the work and situation cards render,
+so the payload sent to the page at startup stays small as the library grows.
+:func:`situation_details` returns the rest of one situation (minus the
+prompt, which never leaves the backend) when the user opens it.
+
+:func:`compile_situations` turns the library into frozen :class:`Situation`
+objects indexed by ``(work_key, situation_key)``. They are built once at
+startup and shared by every session, which keeps only its own mutable
+state, so starting a session neither copies the prompt and chapter
+definitions nor scans the work's situation list.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any
+
+from literaplay.story_state import ChapterDef
+
+DEFAULT_USER_CHARACTER = "Разказвач"
+
+# Fields shown on the work and situation cards
+_WORK_FIELDS = ("title", "color")
+_SITUATION_FIELDS = ("key", "title", "character", "characters", "color")
+
+
+def _pick(source: dict, fields: tuple[str, ...]) -> dict[str, Any]:
+    return {name: source[name] for name in fields if source.get(name) is not None}
+
+
+def build_catalog(library: dict) -> dict[str, dict[str, Any]]:
+    """Return ``{work_key: {title, color, situations: [...]}}`` with card fields only."""
+    catalog = {}
+    for work_key, work in library.items():
+        entry = _pick(work, _WORK_FIELDS)
+        entry["situations"] = [_pick(sit, _SITUATION_FIELDS) for sit in work.get("situations", [])]
+        catalog[work_key] = entry
+    return catalog
+
+
+def _freeze(value: Any) -> Any:
+    """Return a read-only copy of *value*: dicts become mapping proxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Situation(Mapping):
+    """One situation of the library, immutable and shared between sessions.
+
+    Reads like the situation dict it was compiled from (``sit["prompt"]``,
+    ``sit.get("chapters", ())``), with nested lists as tuples, plus the
+    parsed :class:`ChapterDef` objects.
+    """
+
+    work_key: str
+    key: str
+    color: str  # the situation's colour, or its work's
+    data: Mapping[str, Any]
+    chapter_defs: tuple[ChapterDef, ...]
+
+    def __getitem__(self, name: str) -> Any:
+        return self.data[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+def compile_situations(library: dict) -> dict[tuple[str, str], Situation]:
+    """Compile every situation of *library*, keyed by ``(work_key, situation_key)``."""
+    index = {}
+    for work_key, work in library.items():
+        for sit in work.get("situations", []):
+            data = _freeze(sit)
+            index[(work_key, sit["key"])] = Situation(
+                work_key=work_key,
+                key=sit["key"],
+                color=sit.get("color") or work.get("color", ""),
+                data=data,
+                chapter_defs=tuple(ChapterDef.from_dict(ch) for ch in sit.get("chapters", [])),
+            )
+    return index
+
+
+def situation_details(situation: Situation) -> dict[str, Any]:
+    """Return what the page needs to open *situation*.
+
+    ``user_character`` falls back to the narrator; chapters are reduced to
+    their titles.
+    """
+    return {
+        "work": situation.work_key,
+        "key": situation.key,
+        "title": situation.get("title", ""),
+        "character": situation.get("character", ""),
+        "characters": situation.get("characters", ""),
+        "user_character": situation.get("user_character") or DEFAULT_USER_CHARACTER,
+        "color": situation.color,
+        "intro": situation.get("intro", ""),
+        "first_message": situation.get("first_message", ""),
+        "choices": list(situation.get("choices", ())),
+        "chapters": [ch.title for ch in situation.chapter_defs],
+    }
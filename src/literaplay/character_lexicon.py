@@ -0,0 +1,147 @@
+"""Local inference of which characters are present in a scene.
+
+When the model omits the optional ``characters_present`` key the story state
+would go stale. :class:`CharacterLexicon` fills it without another request:
+it is built once per situation from the ``character``, ``user_character``
+and ``characters`` fields plus the inflected name forms that occur in the
+book text ("Марко" → "Марка", "Маркови"), compiled into one Aho-Corasick
+automaton, and maps each reply item's speaker and narration to canonical
+character names in microseconds.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from literaplay.book_loader import BookTextIndex
+from literaplay.bulgarian import HONORIFICS
+from literaplay.knowledge_guard import AhoCorasick, book_vocabulary
+
+# Speakers that are not characters in the scene
+_NON_CHARACTERS = frozenset({"разказвач", "system", "narrator", "система"})
+
+_ALIAS_SPLIT_RE = re.compile(r"\s*[/(]\s*")
+_MIN_NAME_LEN = 4
+# Book forms may be up to this many characters longer than the stem they extend.
+_MAX_INFLECTION = 3
+# ...and must end like an inflected Bulgarian name ("Марка", "Маркови", "Краличът")
+_INFLECTION_ENDINGS = ("а", "я", "е", "о", "у", "и", "ът", "ят", "ов", "ев")
+
+
+def _parse_names(field: str) -> list[list[str]]:
+    """Split a ``characters`` field into alias groups, canonical name first.
+
+    ``"Македонски (Желю хайдутина), Бръчков / Станка (ти)"`` gives
+    ``[["Македонски", "Желю хайдутина"], ["Бръчков", "Станка"]]``. Lower-case
+    entries and descriptors ("работници", "(умиращ)") are skipped.
+    """
+    groups = []
+    for entry in field.split(","):
+        aliases = [a.strip(" )") for a in _ALIAS_SPLIT_RE.split(entry.strip())]
+        aliases = [a for a in aliases if a and a[0].isupper()]
+        if aliases:
+            groups.append(aliases)
+    return groups
+
+
+class CharacterLexicon:
+    """Compiled name matcher for one situation."""
+
+    __slots__ = ("main_character", "user_character", "_automaton", "_canonical")
+
+    def __init__(
+        self,
+        groups: Iterable[list[str]],
+        book_words: Iterable[str] = (),
+        main_character: str = "",
+        user_character: str = "",
+    ) -> None:
+        variants: dict[str, set[str]] = {}
+        for aliases in groups:
+            canonical = aliases[0]
+            for alias in aliases:
+                variants.setdefault(alias.lower(), set()).add(canonical)
+                for word in alias.split():
+                    if len(word) >= _MIN_NAME_LEN and word.lower() not in HONORIFICS:
+                        variants.setdefault(word.lower(), set()).add(canonical)
+
+        # Inflected forms from the book: capitalized words extending a single-word variant's stem
+        stems = {}
+        for v in variants:
+            stem = v[:-2] if v.endswith(("ът", "ят")) else v[:-1]  # "Краличът" → "кралич"
+            if " " not in v and len(stem) >= _MIN_NAME_LEN:
+                stems[stem] = v
+        for word in book_words:
+            lower = word.lower()
+            if lower in variants or not lower.endswith(_INFLECTION_ENDINGS):
+                continue
+            for cut in range(len(lower) - 1, _MIN_NAME_LEN - 1, -1):
+                base = stems.get(lower[:cut])
+                if base is not None:
+                    if len(lower) - cut <= _MAX_INFLECTION:
+                        variants[lower] = variants[base]
+                    break
+
+        # A bare first name shared by two characters ("Иван") identifies neither
+        unambiguous = {v: next(iter(c)) for v, c in variants.items() if len(c) == 1}
+        self._automaton = AhoCorasick(unambiguous)
+        self._canonical = [unambiguous[p] for p in self._automaton.patterns]
+        self.main_character = main_character
+        self.user_character = user_character
+
+    def names_in(self, text: str) -> list[str]:
+        """Return canonical names mentioned in *text* as whole words, in order of appearance."""
+        lower = text.lower()
+        found: dict[str, None] = {}
+        for end, idx in self._automaton.iter_matches(lower):
+            start = end - len(self._automaton.patterns[idx])
+            if (start == 0 or not lower[start - 1].isalnum()) and (end == len(lower) or not lower[end].isalnum()):
+                found[self._canonical[idx]] = None
+        return list(found)
+
+    def infer_present(self, reply: list | str, cap: int = 8) -> list[str]:
+        """Infer who is in the scene from a parsed ``reply``.
+
+        Speakers are present, so are characters named in narration; names
+        mentioned in dialogue are not (they may be talked about). The played
+        character and the user's character are always included.
+        """
+        present: dict[str, None] = {}
+        if self.main_character:
+            present[self.main_character] = None
+        if self.user_character:
+            present[self.user_character] = None
+        if isinstance(reply, list):
+            for item in reply:
+                if not isinstance(item, dict):
+                    continue
+                speaker = str(item.get("character", "")).strip()
+                text = item.get("text", "")
+                if speaker.lower() in _NON_CHARACTERS:
+                    if isinstance(text, str):
+                        present.update(dict.fromkeys(self.names_in(text)))
+                elif speaker:
+                    names = self.names_in(speaker)
+                    present.update(dict.fromkeys(names or [speaker]))
+        return list(present)[:cap]
+
+
+def build_character_lexicon(situation: Mapping[str, Any], book: BookTextIndex | None = None) -> CharacterLexicon:
+    """Build the lexicon for a situation, adding name forms found in *book*."""
+    main = _parse_names(str(situation.get("character", "")))[:1]
+    user = _parse_names(str(situation.get("user_character", "")))[:1]
+    groups = main + user + _parse_names(str(situation.get("characters", "")))
+
+    book_words: Iterable[str] = ()
+    if book is not None:
+        per_chapter, lowercase_words = book_vocabulary(book)
+        # Skip ordinary words that merely start a sentence ("Морето" next to "Морев")
+        book_words = {word for counts in per_chapter for word in counts if word.lower() not in lowercase_words}
+    return CharacterLexicon(
+        groups,
+        book_words,
+        main_character=main[0][0] if main else "",
+        user_character=user[0][0] if user else "",
+    )
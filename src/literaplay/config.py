@@ -4,6 +4,8 @@ import sys
 from pathlib import Path
 
 from literaplay.dependency_compat import load_dotenv_functions
+from literaplay.event_similarity import DEFAULT_THRESHOLD as DEFAULT_EVENT_SIMILARITY
+from literaplay.reasoning import ReasoningPolicy
 
 load_dotenv, set_key = load_dotenv_functions()
 
@@ -69,6 +71,148 @@ elif PROVIDER and PROVIDER in PROVIDER_MODELS:
 else:
     DEFAULT_MODEL = ""
 
+# Story-state encoding in prompts: "full" every turn, or "delta" (changed fields only).
+# Either a single value for all providers ("delta") or per provider ("openai=delta,gemini=full").
+STATE_ENCODINGS = ("full", "delta")
+
+
+def _parse_per_provider(raw: str, allowed: tuple[str, ...], default: str) -> dict[str, str]:
+    """Parse "value" or "provider=value,..." into a provider -> value mapping.
+
+    A bare value applies to every provider not listed explicitly; unknown
+    providers and values outside *allowed* are ignored.
+    """
+    parts = [p.strip().lower() for p in raw.split(",") if p.strip()]
+    for part in parts:
+        if "=" not in part and part in allowed:
+            default = part
+    result = dict.fromkeys(PROVIDER_MODELS, default)
+    for part in parts:
+        provider, _, value = part.partition("=")
+        if provider in result and value in allowed:
+            result[provider] = value
+    return result
+
+
+STATE_ENCODING = _parse_per_provider(os.getenv("LITERAPLAY_STATE_ENCODING", ""), STATE_ENCODINGS, "full")
+
+
+def get_state_encoding(provider: str) -> str:
+    """Return the story-state encoding ("full" or "delta") configured for provider."""
+    return STATE_ENCODING.get(provider, "full")
+
+
+# How replies are constrained: "schema" (provider-enforced STORY_RESPONSE_SCHEMA) or
+# "json" (any JSON object, for models without structured-output support). Per provider as above.
+STRUCTURED_OUTPUTS = ("schema", "json")
+STRUCTURED_OUTPUT = _parse_per_provider(os.getenv("LITERAPLAY_STRUCTURED_OUTPUT", ""), STRUCTURED_OUTPUTS, "schema")
+
+
+def get_structured_output(provider: str) -> str:
+    """Return the structured-output mode ("schema" or "json") configured for provider."""
+    return STRUCTURED_OUTPUT.get(provider, "schema")
+
+
+# How requests reach the provider: "sdk" (the official client library) or "rest" (the
+# built-in HTTP transport, which skips the SDK import). Per provider as above.
+TRANSPORTS = ("sdk", "rest")
+TRANSPORT = _parse_per_provider(os.getenv("LITERAPLAY_TRANSPORT", ""), TRANSPORTS, "sdk")
+
+
+def get_transport(provider: str) -> str:
+    """Return the transport ("sdk" or "rest") configured for provider."""
+    return TRANSPORT.get(provider, "sdk")
+
+
+# Reasoning effort per turn type, optionally per model: "turn=minimal,transition=medium,o3:turn=low".
+# Levels are default/minimal/low/medium/high; see literaplay.reasoning for how each provider maps them.
+REASONING = ReasoningPolicy.parse(os.getenv("LITERAPLAY_REASONING", ""))
+
+# Fast model for routine turns, per provider; key beats keep the selected model (see literaplay.routing).
+# "openai=gpt-4.1-mini,gemini=off" overrides the defaults; only models from the provider's list are accepted.
+DEFAULT_FAST_MODELS = {"openai": "gpt-4.1-nano", "gemini": "gemini-2.5-flash", "anthropic": "claude-haiku-4-5"}
+
+
+def _parse_fast_models(raw: str) -> dict[str, str | None]:
+    result: dict[str, str | None] = dict(DEFAULT_FAST_MODELS)
+    for part in raw.split(","):
+        provider, _, model = part.strip().partition("=")
+        provider, model = provider.strip().lower(), model.strip()
+        if provider not in PROVIDER_MODELS:
+            continue
+        if model.lower() in ("off", "none", ""):
+            result[provider] = None
+        elif any(m["value"] == model for m in PROVIDER_MODELS[provider]["models"]):
+            result[provider] = model
+    return result
+
+
+FAST_MODELS = _parse_fast_models(os.getenv("LITERAPLAY_FAST_MODEL", ""))
+
+
+def get_fast_model(provider: str) -> str | None:
+    """Return the fast routing model for provider, or None when routing is off."""
+    return FAST_MODELS.get(provider)
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+# Resilience mode (see literaplay.resilience): a second provider that gets a turn when the primary
+# has not started answering within the hedge delay (seconds; the observed p95 once known) or fails.
+HEDGE_PROVIDER = os.getenv("LITERAPLAY_HEDGE_PROVIDER", "").strip().lower()
+HEDGE_API_KEY = os.getenv("LITERAPLAY_HEDGE_API_KEY", "")
+HEDGE_MODEL = os.getenv("LITERAPLAY_HEDGE_MODEL", "") or PROVIDER_MODELS.get(HEDGE_PROVIDER, {}).get("default", "")
+HEDGE_DELAY_S = _float_env("LITERAPLAY_HEDGE_DELAY", 6.0)
+
+
+def hedging_enabled(provider: str) -> bool:
+    """Whether a usable secondary provider is configured for *provider*."""
+    return bool(HEDGE_API_KEY) and HEDGE_PROVIDER in PROVIDER_MODELS and provider != HEDGE_PROVIDER
+
+
+# Seconds a turn may take, retries and failover included, before it is abandoned (0 disables the
+# deadline; see literaplay.cancellation). Leaving the chat or changing the model cancels it sooner.
+TURN_DEADLINE_S = _float_env("LITERAPLAY_TURN_DEADLINE", 120.0)
+
+
+# Key events at least this similar (0..1, character-shingle Jaccard) to a recorded one are
+# dropped as rephrasings. Values above 1 disable fuzzy matching.
+KEY_EVENT_SIMILARITY = _float_env("LITERAPLAY_EVENT_SIMILARITY", DEFAULT_EVENT_SIMILARITY)
+
+
+# Malformed or truncated JSON replies are repaired locally when the repair's confidence
+# (0..1) reaches this value; below it the raw text is shown as before.
+REPAIR_MIN_CONFIDENCE = _float_env("LITERAPLAY_REPAIR_MIN_CONFIDENCE", 0.5)
+
+
+# What to do when a reply mentions names/terms from later chapters:
+# "off" (skip the scan), "flag" (log and mark the turn) or "repair" (also mask the terms).
+LEAK_POLICIES = ("off", "flag", "repair")
+LEAK_POLICY = os.getenv("LITERAPLAY_LEAK_POLICY", "flag").strip().lower()
+if LEAK_POLICY not in LEAK_POLICIES:
+    LEAK_POLICY = "flag"
+
+
+# Per-turn tracing (see literaplay.tracing); "off" disables it. Traces are appended to
+# LITERAPLAY_TRACE_FILE (default traces/ next to .env), rotated every LITERAPLAY_TRACE_MAX_MB.
+TRACE_ENABLED = os.getenv("LITERAPLAY_TRACE", "on").strip().lower() not in ("off", "0", "false")
+TRACE_FILE = Path(os.getenv("LITERAPLAY_TRACE_FILE", "") or _ENV_PATH.parent / "traces" / "literaplay-trace.jsonl")
+TRACE_MAX_BYTES = int(_float_env("LITERAPLAY_TRACE_MAX_MB", 5.0) * 1024 * 1024)
+
+
+# Token and cost totals (see literaplay.usage), kept across runs
+USAGE_FILE = Path(os.getenv("LITERAPLAY_USAGE_FILE", "") or _ENV_PATH.parent / "usage.json")
+
+
+# Prometheus metrics endpoint (see literaplay.metrics), off unless a port is set
+METRICS_PORT = int(_float_env("LITERAPLAY_METRICS_PORT", 0))
+METRICS_HOST = os.getenv("LITERAPLAY_METRICS_HOST", "127.0.0.1").strip() or "127.0.0.1"
+
 
 def get_default_model_for_provider(provider: str) -> str:
     """Return the default model name for the given provider."""
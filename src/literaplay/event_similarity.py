@@ -0,0 +1,193 @@
+"""Near-duplicate detection for story key events.
+
+Models rephrase the same plot beat from turn to turn ("Марко скри Кралича в
+обора" / "Бай Марко скрива Кралича"), so exact string dedup lets
+``key_events`` fill up with near-copies. :class:`NearDuplicateIndex` compares
+events by character shingles of their word stems and by the order of those
+stems:
+
+* words are lower-cased, Latin look-alike letters inside Cyrillic words are
+  folded (models sometimes emit "Краличa" with a Latin ``a``), Bulgarian
+  function words and honorifics are dropped and every word is cut to a
+  5-character stem so inflected forms ("Кралича"/"Краличът") coincide;
+  negations ("не", "никога") are kept;
+* a small MinHash signature split into LSH bands finds candidate matches with
+  a constant number of dict lookups;
+* candidates are confirmed with the exact Jaccard similarity of their shingle
+  sets and of their ordered stem pairs, whichever is lower, so the MinHash
+  estimate never decides a merge on its own. The pairs keep who did what to
+  whom: "Стефчов предаде Огнянов" and "Огнянов предаде Стефчов" share every
+  shingle but no pair. An event and its negation are never merged.
+"""
+
+from __future__ import annotations
+
+import itertools
+import random
+import re
+import zlib
+from dataclasses import dataclass
+
+from literaplay.bulgarian import HONORIFICS
+
+# Similarity at or above which two events count as the same beat.
+DEFAULT_THRESHOLD = 0.6
+
+_STEM_LEN = 5
+_PAIR_STEM_LEN = 4  # shorter, so "скри"/"скрива" still pair alike
+_SHINGLE_LEN = 3
+_NUM_BANDS = 16
+_ROWS_PER_BAND = 2
+_NUM_PERM = _NUM_BANDS * _ROWS_PER_BAND
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = random.Random(0x4C50)  # fixed seed: signatures must be stable across runs
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(_NUM_PERM)]
+
+_WORD_RE = re.compile(r"\w+")
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+_HOMOGLYPHS = str.maketrans("aceopxyk", "асеорхук")
+
+_STOPWORDS = HONORIFICS | frozenset(
+    {
+        # prepositions, conjunctions, particles
+        *("в", "във", "на", "от", "до", "за", "при", "със", "през", "над", "под", "пред", "към", "без", "след"),
+        *("между", "и", "или", "но", "а", "че", "да", "се", "си", "ще", "ли", "го", "му", "ѝ", "я", "ги", "им"),
+    }
+)
+# Kept as "не", so "не уби" and "никога не уби" read the same
+_NEGATIONS = frozenset({"не", "нито", "никога", "няма"})
+
+
+def _words(text: str) -> list[str]:
+    """The normalized words of *text* that carry meaning, in order."""
+    words = []
+    for word in _WORD_RE.findall(text.lower()):
+        if _CYRILLIC_RE.search(word):
+            word = word.translate(_HOMOGLYPHS)
+        if word in _NEGATIONS:
+            if not words or words[-1] != "не":
+                words.append("не")
+        elif word not in _STOPWORDS and (len(word) >= 3 or word.isdigit()):
+            words.append(word)
+    return words
+
+
+def _shingles(words: list[str]) -> frozenset[str]:
+    shingles: set[str] = set()
+    for word in words:
+        padded = f" {word[:_STEM_LEN]} "
+        for i in range(len(padded) - _SHINGLE_LEN + 1):
+            shingles.add(padded[i : i + _SHINGLE_LEN])
+    return frozenset(shingles)
+
+
+def _pairs(words: list[str]) -> frozenset[tuple[str, str]]:
+    stems = [word[:_PAIR_STEM_LEN] for word in words]
+    return frozenset(itertools.pairwise(stems))
+
+
+def shingle_set(text: str) -> frozenset[str]:
+    """Return the normalized character shingles of *text*."""
+    return _shingles(_words(text))
+
+
+def _band_keys(shingles: frozenset[str]) -> list[tuple[int, ...]]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    return [(band, *signature[band * _ROWS_PER_BAND : (band + 1) * _ROWS_PER_BAND]) for band in range(_NUM_BANDS)]
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+@dataclass(slots=True, frozen=True)
+class _Features:
+    shingles: frozenset[str]
+    pairs: frozenset[tuple[str, str]]
+    negated: bool  # an odd number of negations
+
+    @classmethod
+    def of(cls, text: str) -> _Features:
+        words = _words(text)
+        return cls(_shingles(words), _pairs(words), words.count("не") % 2 == 1)
+
+    def similarity(self, other: _Features) -> float:
+        if self.negated != other.negated:
+            return 0.0
+        score = jaccard(self.shingles, other.shingles)
+        if self.pairs or other.pairs:
+            score = min(score, jaccard(self.pairs, other.pairs))
+        return score
+
+
+def similarity(a: str, b: str) -> float:
+    """How alike two events are, from 0.0 to 1.0 (see the module docstring)."""
+    return _Features.of(a).similarity(_Features.of(b))
+
+
+class NearDuplicateIndex:
+    """Similarity index over a bounded set of short texts.
+
+    Parameters
+    ----------
+    threshold : float
+        Minimum :func:`similarity` for two texts to count as duplicates.
+        Values above 1.0 disable fuzzy matching.
+    """
+
+    __slots__ = ("threshold", "_entries", "_buckets")
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD) -> None:
+        self.threshold = threshold
+        # text -> (features, band keys)
+        self._entries: dict[str, tuple[_Features, list[tuple[int, ...]]]] = {}
+        self._buckets: dict[tuple[int, ...], set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, text: str) -> str | None:
+        """Return the stored text most similar to *text*, or None below the threshold."""
+        if text in self._entries:
+            return text
+        if self.threshold > 1.0:
+            return None
+        features = _Features.of(text)
+        if not features.shingles:
+            return None
+        candidates: set[str] = set()
+        for key in _band_keys(features.shingles):
+            bucket = self._buckets.get(key)
+            if bucket:
+                candidates.update(bucket)
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            score = features.similarity(self._entries[candidate][0])
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def add(self, text: str) -> None:
+        if text in self._entries:
+            return
+        features = _Features.of(text)
+        keys = _band_keys(features.shingles) if features.shingles else []
+        self._entries[text] = (features, keys)
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(text)
+
+    def remove(self, text: str) -> None:
+        entry = self._entries.pop(text, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(text)
+                if not bucket:
+                    del self._buckets[key]
@@ -0,0 +1,133 @@
+"""Fast decoding of story responses into typed, slotted structs.
+
+Well-formed model output (the common case once structured output is
+enforced) is decoded straight into :class:`StoryResponse`:
+
+* with ``msgspec`` installed, the C decoder builds the dataclasses and checks
+  field types in one pass, without an intermediate dict;
+* otherwise ``orjson`` (or the stdlib ``json``) decodes, and the fields are
+  type-checked against the response schema before conversion.
+
+Anything that does not decode cleanly returns ``None`` so the caller can fall
+back to the tolerant ``parse_ai_json_response`` / ``repair_json`` path.
+The struct saves the schema check in ``validate_story_response``, which
+then builds its result dict from it with :meth:`StoryResponse.to_dict`;
+validation, state recording and the bridge all work on that dict.
+:func:`dumps` encodes bridge payloads with the fastest available encoder.
+
+Install the accelerators with ``pip install literaplay[fast]``.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from literaplay.response_schema import schema_errors
+
+try:
+    import msgspec
+except ImportError:  # optional accelerator
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+BACKEND = "msgspec" if msgspec is not None else "orjson" if orjson is not None else "json"
+
+
+@dataclass(slots=True)
+class ReplyLine:
+    """One line of a reply: a character's speech or the narrator's description."""
+
+    character: str
+    text: str
+    type: str | None = None  # "npc" (default), "user" or "system"
+
+    def to_dict(self) -> dict[str, str]:
+        d = {"character": self.character, "text": self.text}
+        if self.type is not None:
+            d["type"] = self.type
+        return d
+
+
+@dataclass(slots=True)
+class StoryResponse:
+    """A decoded story response; optional metadata is ``None`` when omitted."""
+
+    reply: list[ReplyLine] | str
+    options: list[str]
+    ended: bool
+    mood: str | None = None
+    location: str | None = None
+    key_event: str | None = None
+    trust_level: int | None = None
+    tension: str | None = None
+    characters_present: list[str] | None = None
+    active_props: list[str] | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the turn dict used by validation and state recording (omitted fields absent)."""
+        reply = self.reply if isinstance(self.reply, str) else [line.to_dict() for line in self.reply]
+        d: dict[str, Any] = {"reply": reply, "options": self.options, "ended": self.ended}
+        for name in _OPTIONAL_SLOTS:
+            value = getattr(self, name)
+            if value is not None:
+                d[name] = value
+        return d
+
+
+_OPTIONAL_SLOTS = ("mood", "location", "key_event", "trust_level", "tension", "characters_present", "active_props")
+
+if msgspec is not None:
+    _DECODER = msgspec.json.Decoder(StoryResponse)
+    _ENCODER = msgspec.json.Encoder()
+
+
+def loads(text: str | bytes) -> Any:
+    """Decode JSON with the fastest available decoder."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps(obj: Any) -> str:
+    """Encode *obj* as JSON text with the fastest available encoder."""
+    if msgspec is not None:
+        return _ENCODER.encode(obj).decode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _from_dict(data: Any) -> StoryResponse | None:
+    if not isinstance(data, dict):
+        return None
+    errors = schema_errors(data)
+    reply = data.get("reply")
+    if isinstance(reply, str):  # legacy plain-text reply
+        errors.pop("reply", None)
+    if errors or not isinstance(reply, str | list):  # like the typed decoder: any mismatch defers to the tolerant path
+        return None
+    lines: list[ReplyLine] | str = (
+        reply if isinstance(reply, str) else [ReplyLine(i["character"], i["text"], i.get("type")) for i in reply]
+    )
+    optional = {name: data[name] for name in _OPTIONAL_SLOTS if data.get(name) is not None}
+    return StoryResponse(lines, data["options"], data["ended"], **optional)
+
+
+def decode_story_response(text: str | bytes) -> StoryResponse | None:
+    """Decode well-formed response JSON into a :class:`StoryResponse`, or return None."""
+    if msgspec is not None:
+        try:
+            return _DECODER.decode(text)
+        except msgspec.MsgspecError:
+            return None
+    try:
+        data = loads(text)
+    except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
+        return None
+    return _from_dict(data)
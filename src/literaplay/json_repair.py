@@ -0,0 +1,356 @@
+"""Repair of truncated or slightly malformed JSON from the model.
+
+A response cut short by ``max_tokens`` or a dropped stream, or one with a
+trailing comma or an unescaped quote inside dialogue, fails ``json.loads``.
+Re-sending costs a full round trip, so :func:`repair_json` tries to recover
+the object locally in one linear pass:
+
+* text before the first ``{`` is skipped; anything after the root object
+  closes is ignored;
+* open strings, arrays and objects are closed; a member left without a
+  complete value (``"mood": `` / ``"ended": tr``) is dropped;
+* trailing and missing commas are fixed, quotes inside strings that are not
+  followed by JSON structure are escaped, typographic and single quotes used
+  as delimiters become ``"``, raw newlines are escaped and Python literals
+  (``True``/``None``) are translated.
+
+Each fix lowers the reported confidence; callers decide whether the result
+is good enough to show instead of asking again.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+# Inputs longer than this are clipped before repair, bounding the time spent.
+MAX_REPAIR_CHARS = 64_000
+# How far past a quote to look when deciding whether it closes the string.
+_LOOKAHEAD = 32
+
+# Confidence lost per occurrence of each fix (each kind counted at most 3 times;
+# closing containers at the end of a truncated reply counts once).
+_PENALTIES = {
+    "trailing_comma": 0.02,
+    "control_char": 0.01,
+    "python_literal": 0.02,
+    "smart_quote": 0.03,
+    "single_quote": 0.05,
+    "unescaped_quote": 0.08,
+    "invalid_escape": 0.03,
+    "missing_comma": 0.1,
+    "unquoted_string": 0.1,
+    "stray_char": 0.05,
+    "mismatched_bracket": 0.1,
+    "closed_string": 0.15,
+    "dropped_member": 0.1,
+    "closed_container": 0.1,
+    "dropped_reply_item": 0.1,
+    "clipped_input": 0.2,
+}
+_MAX_COUNTED = 3
+# Structural penalties applied to the recovered story object
+_MISSING_REPLY_FACTOR = 0.3
+_MISSING_OPTIONS_PENALTY = 0.15
+
+# Opening delimiter -> characters accepted as its closing quote
+_OPENING_QUOTES = {'"': '"', "'": "'", "“": '"”“', "„": '"”“', "”": '"”“'}
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_SCALAR_STOP = frozenset(" \t\r\n,:[]{}\"'“”„")
+_VALUE_STARTS = frozenset("\"'“„{[]}-0123456789tfnTFN")
+_UNQUOTED_KEY_RE = re.compile(r"\w+\s*:")
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+# Frame phases: what the container expects next
+_KEY, _COLON, _VALUE, _NEXT = range(4)
+
+
+@dataclass(frozen=True, slots=True)
+class RepairResult:
+    """Outcome of :func:`repair_json`."""
+
+    value: dict | None
+    confidence: float  # 0.0 (nothing recovered) .. 1.0 (no repair needed)
+    fixes: dict[str, int] = field(default_factory=dict)
+
+
+class _Frame:
+    __slots__ = ("kind", "phase", "mark")
+
+    def __init__(self, kind: str, mark: int) -> None:
+        self.kind = kind  # "{" or "["
+        self.phase = _KEY if kind == "{" else _VALUE
+        self.mark = mark  # output length where the current member starts
+
+
+def _closes_string(text: str, i: int) -> bool:
+    """Decide whether the quote just before *i* ends the string.
+
+    It does when the next non-blank character is JSON structure, a quote
+    after a gap (a missing comma), or a comma followed by the start of
+    another member or value.
+    """
+    n = len(text)
+    end = min(n, i + _LOOKAHEAD)
+    j = i
+    while j < end and text[j].isspace():
+        j += 1
+    if j >= n:
+        return True
+    if j == end:
+        return False
+    ch = text[j]
+    if ch in ":}]" or (ch == '"' and j > i):
+        return True
+    if ch != ",":
+        return False
+    j += 1
+    while j < end and text[j].isspace():
+        j += 1
+    if j >= n:
+        return True
+    return j < end and (text[j] in _VALUE_STARTS or _UNQUOTED_KEY_RE.match(text, j, end) is not None)
+
+
+class _Repairer:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.out: list[str] = []
+        self.stack: list[_Frame] = []
+        self.fixes: Counter[str] = Counter()
+
+    def fix(self, kind: str) -> None:
+        self.fixes[kind] += 1
+
+    def _begin_value(self) -> None:
+        """Prepare the top frame for a new member or element (comma, colon)."""
+        frame = self.stack[-1]
+        if frame.phase == _NEXT:
+            self.fix("missing_comma")
+            frame.mark = len(self.out)
+            self.out.append(",")
+            frame.phase = _KEY if frame.kind == "{" else _VALUE
+        if frame.phase == _COLON:
+            self.fix("stray_char")
+            self.out.append(":")
+            frame.phase = _VALUE
+
+    def _end_value(self) -> None:
+        if self.stack:
+            self.stack[-1].phase = _NEXT
+
+    def _drop_member(self) -> None:
+        frame = self.stack[-1]
+        del self.out[frame.mark :]
+        self.fix("dropped_member")
+        frame.phase = _NEXT
+
+    def _strip_trailing_comma(self) -> None:
+        if self.out and self.out[-1] == ",":
+            self.out.pop()
+            self.fix("trailing_comma")
+
+    def _close_frame(self) -> None:
+        frame = self.stack[-1]
+        if frame.kind == "{" and frame.phase in (_COLON, _VALUE):
+            self._drop_member()
+        self._strip_trailing_comma()
+        self.out.append("}" if frame.kind == "{" else "]")
+        self.stack.pop()
+        self._end_value()
+
+    def run(self) -> str | None:
+        text = self.text
+        n = len(text)
+        i = text.find("{")
+        if i == -1:
+            return None
+        in_string = False
+        closing = ""
+        is_key = False
+
+        while i < n:
+            ch = text[i]
+            if in_string:
+                if ch == "\\":
+                    if i + 1 < n:
+                        if text[i + 1] in _VALID_ESCAPES:
+                            self.out.append(text[i : i + 2])
+                        else:
+                            self.out.append("\\\\" + text[i + 1])
+                            self.fix("invalid_escape")
+                    i += 2
+                    continue
+                if ch in closing:
+                    if _closes_string(text, i + 1):
+                        self.out.append('"')
+                        in_string = False
+                        if is_key:
+                            self.stack[-1].phase = _COLON
+                        else:
+                            self._end_value()
+                    else:
+                        self.out.append('\\"')
+                        self.fix("unescaped_quote")
+                elif ch == '"':
+                    self.out.append('\\"')
+                elif ch in _CONTROL_ESCAPES:
+                    self.out.append(_CONTROL_ESCAPES[ch])
+                    self.fix("control_char")
+                else:
+                    self.out.append(ch)
+                i += 1
+                continue
+
+            if ch.isspace():
+                i += 1
+                continue
+
+            if not self.stack:
+                if self.out:
+                    break  # root object closed; ignore the rest
+                self.out.append("{")
+                self.stack.append(_Frame("{", 1))
+                i += 1
+                continue
+
+            frame = self.stack[-1]
+            if ch in _OPENING_QUOTES:
+                if ch != '"':
+                    self.fix("single_quote" if ch == "'" else "smart_quote")
+                if frame.kind == "{" and frame.phase in (_KEY, _NEXT):
+                    if frame.phase == _NEXT:
+                        self._begin_value()
+                    is_key = True
+                else:
+                    self._begin_value()
+                    is_key = False
+                closing = _OPENING_QUOTES[ch]
+                in_string = True
+                self.out.append('"')
+                i += 1
+            elif ch in "{[":
+                self._begin_value()
+                if frame.kind == "{" and frame.phase == _KEY:
+                    return None  # a container where a key belongs: not recoverable
+                self.out.append(ch)
+                self.stack.append(_Frame(ch, len(self.out)))
+                i += 1
+            elif ch in "}]":
+                if (ch == "}") != (frame.kind == "{"):
+                    self.fix("mismatched_bracket")
+                self._close_frame()
+                i += 1
+            elif ch == ":":
+                if frame.kind == "{" and frame.phase == _COLON:
+                    self.out.append(":")
+                    frame.phase = _VALUE
+                else:
+                    self.fix("stray_char")
+                i += 1
+            elif ch == ",":
+                if frame.phase == _NEXT:
+                    frame.mark = len(self.out)
+                    self.out.append(",")
+                    frame.phase = _KEY if frame.kind == "{" else _VALUE
+                else:
+                    self.fix("stray_char")
+                i += 1
+            else:
+                j = i
+                while j < n and text[j] not in _SCALAR_STOP:
+                    j += 1
+                if j == i:  # lone character the scalar scan cannot consume
+                    self.fix("stray_char")
+                    i += 1
+                    continue
+                self._scalar(text[i:j], at_eof=j == n)
+                i = j
+
+        if in_string:
+            self.out.append('"')
+            self.fix("closed_string")
+            if is_key:
+                self.stack[-1].phase = _COLON
+            else:
+                self._end_value()
+        while self.stack:
+            self.fix("closed_container")
+            self._close_frame()
+        return "".join(self.out)
+
+    def _scalar(self, token: str, at_eof: bool) -> None:
+        frame = self.stack[-1]
+        if frame.kind == "{" and frame.phase in (_KEY, _NEXT):
+            # Unquoted key ({reply: ...})
+            if frame.phase == _NEXT:
+                self._begin_value()
+            self.fix("unquoted_string")
+            self.out.append(json.dumps(token, ensure_ascii=False))
+            frame.phase = _COLON
+            return
+        self._begin_value()
+        if token in _PYTHON_LITERALS:
+            self.fix("python_literal")
+            token = _PYTHON_LITERALS[token]
+        try:
+            json.loads(token)
+        except ValueError:
+            if at_eof:  # most likely cut off mid-literal ("tr", "1.")
+                self._drop_member()
+                return
+            self.fix("unquoted_string")
+            token = json.dumps(token, ensure_ascii=False)
+        self.out.append(token)
+        self._end_value()
+
+
+def _prune_reply(value: dict, fixes: Counter[str]) -> None:
+    """Drop reply items cut off before their text (``{"character": "Ма"}``)."""
+    reply = value.get("reply")
+    if isinstance(reply, list):
+        kept = [item for item in reply if isinstance(item, dict) and isinstance(item.get("text"), str)]
+        if len(kept) != len(reply):
+            fixes["dropped_reply_item"] += len(reply) - len(kept)
+            value["reply"] = kept
+
+
+def _confidence(fixes: Counter[str], value: dict) -> float:
+    confidence = 1.0
+    for kind, count in fixes.items():
+        counted = 1 if kind == "closed_container" else min(count, _MAX_COUNTED)
+        confidence -= _PENALTIES.get(kind, 0.1) * counted
+    reply = value.get("reply")
+    if not reply:
+        confidence *= _MISSING_REPLY_FACTOR
+    if "options" not in value:
+        confidence -= _MISSING_OPTIONS_PENALTY
+    return round(max(0.0, min(1.0, confidence)), 2)
+
+
+def repair_json(text: str, max_chars: int = MAX_REPAIR_CHARS) -> RepairResult:
+    """Recover the first JSON object in *text*, repairing it if needed."""
+    fixes: Counter[str] = Counter()
+    if not text:
+        return RepairResult(None, 0.0)
+    if len(text) > max_chars:
+        text = text[:max_chars]
+        fixes["clipped_input"] += 1
+
+    repairer = _Repairer(text)
+    repairer.fixes = fixes
+    repaired = repairer.run()
+    if repaired is None:
+        return RepairResult(None, 0.0, dict(fixes))
+    try:
+        value: Any = json.loads(repaired)
+    except ValueError:
+        return RepairResult(None, 0.0, dict(fixes))
+    if not isinstance(value, dict):
+        return RepairResult(None, 0.0, dict(fixes))
+    _prune_reply(value, fixes)
+    return RepairResult(value, _confidence(fixes, value), dict(fixes))
@@ -0,0 +1,239 @@
+"""Incremental, string-aware JSON scanner for model output.
+
+:class:`StreamingJSONParser` accepts the response text in arbitrary chunks
+and reports pieces of the story JSON as soon as they are complete:
+
+* every element of the top-level ``reply`` array, when it closes;
+* the top-level ``options`` value, when it closes;
+* the whole top-level object, when its closing brace arrives.
+
+Text before the first ``{`` (code fences, "Here is the JSON:") is skipped,
+and braces inside string literals are ignored, so a line of dialogue such as
+``"Той каза: {не}"`` cannot unbalance the scan. Every character is examined
+once (a number or ``true``/``false``/``null`` cut off at the end of a chunk
+is re-read with the next one); only the completed pieces are handed to
+:func:`json.loads`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import re
+from dataclasses import dataclass
+from typing import Any
+
+# Inside a string only quotes and backslashes matter.
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+# Outside strings: structural characters, or a run of scalar characters (numbers, true/false/null).
+_TOKEN_RE = re.compile(r'[{}\[\]",:]|[^\s{}\[\]",:]+')
+_STRUCTURAL = frozenset('{}[]",:')
+
+_REPLY_KEY = "reply"
+_OPTIONS_KEY = "options"
+
+_NOT_PARSED = object()
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return _NOT_PARSED
+
+
+@dataclass(frozen=True, slots=True)
+class StreamEvent:
+    """One completed piece of the response."""
+
+    kind: str  # "reply" (one reply element), "options" or "object"
+    value: Any
+
+
+class StreamingJSONParser:
+    """Chunk-fed scanner for the first JSON object in a response.
+
+    ``feed`` returns the events completed by the chunk. After the ``object``
+    event the parser is :attr:`done`, the object is in :attr:`result` and
+    further input is ignored. A balanced ``{...}`` that is not valid JSON is
+    skipped and scanning resumes after it.
+
+    Positions are offsets into the whole input. The chunks of the object in
+    progress are kept as received and joined only for a completed piece, so
+    a feed costs the length of its chunk, not of everything received so far.
+    """
+
+    __slots__ = (
+        "done",
+        "result",
+        "_parts",
+        "_part_starts",
+        "_pending",
+        "_pos",
+        "_stack",
+        "_in_string",
+        "_string_start",
+        "_expect_key",
+        "_key",
+        "_object_start",
+        "_value_start",
+        "_item_start",
+    )
+
+    def __init__(self) -> None:
+        self.done = False
+        self.result: dict | None = None
+        self._parts: list[str] = []  # the object in progress, as received
+        self._part_starts: list[int] = []  # offset of each part
+        self._pending = ""  # received text from _pos on that is not scanned yet
+        self._pos = 0
+        self._reset_object(-1)
+
+    def _reset_object(self, start: int) -> None:
+        self._stack: list[str] = []
+        self._in_string = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: str | None = None
+        self._object_start = start
+        self._value_start = -1  # start of the current top-level value
+        self._item_start = -1  # start of the current reply element
+
+    def feed(self, chunk: str) -> list[StreamEvent]:
+        """Consume *chunk* and return the events it completed."""
+        if self.done or not chunk:
+            return []
+        buf = self._pending + chunk
+        base = self._pos  # offset of buf[0]
+        if self._stack:
+            self._part_starts.append(base + len(buf) - len(chunk))
+            self._parts.append(chunk)
+        pos = 0
+        events: list[StreamEvent] = []
+
+        while pos < len(buf):
+            if not self._stack:
+                # Looking for the start of an object; nothing before it is kept.
+                start = buf.find("{", pos)
+                if start == -1:
+                    pos = len(buf)
+                    break
+                self._reset_object(base + start)
+                self._parts, self._part_starts = [buf[start:]], [base + start]
+                self._stack.append("{")
+                self._expect_key = True
+                pos = start + 1
+                continue
+
+            if self._in_string:
+                m = _STRING_SPECIAL_RE.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                if m.group() == "\\":
+                    if m.end() == len(buf):  # escaped character not received yet
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                pos = m.end()
+                self._in_string = False
+                self._string_closed(base + pos, events)
+                continue
+
+            m = _TOKEN_RE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            tok, tok_start, pos = m.group(), base + m.start(), m.end()
+            if pos == len(buf) and tok not in _STRUCTURAL:
+                pos = m.start()  # a number or literal may continue in the next chunk
+                break
+            in_reply = self._in_reply_array()
+
+            if tok == '"':
+                self._in_string = True
+                self._string_start = tok_start
+                if in_reply:
+                    self._item_start = tok_start
+            elif tok == "{" or tok == "[":
+                if len(self._stack) == 1:
+                    self._value_start = tok_start
+                elif in_reply:
+                    self._item_start = tok_start
+                self._stack.append(tok)
+            elif tok == "}" or tok == "]":
+                if in_reply and tok == "]":
+                    self._flush_scalar_item(tok_start, events)
+                self._stack.pop()
+                if not self._stack:
+                    value = _loads(self._text(self._object_start, base + pos))
+                    self._parts, self._part_starts = [], []
+                    if isinstance(value, dict):
+                        self.done, self.result = True, value
+                        events.append(StreamEvent("object", value))
+                        buf, pos = "", 0
+                        break
+                    # not JSON after all; resume after it
+                else:
+                    self._container_closed(base + pos, events)
+            elif tok == ",":
+                if len(self._stack) == 1:
+                    self._expect_key, self._key = True, None
+                elif in_reply:
+                    self._flush_scalar_item(tok_start, events)
+            elif tok != ":" and in_reply:
+                self._item_start = tok_start  # scalar element; complete at the next ',' or ']'
+
+        self._pending, self._pos = buf[pos:], base + pos
+        return events
+
+    # ------------------------------------------------------------------ #
+
+    def _text(self, start: int, end: int) -> str:
+        """The received text from offset *start* to *end* (both within the object in progress)."""
+        first = bisect.bisect_right(self._part_starts, start) - 1
+        pieces = []
+        for k in range(first, len(self._parts)):
+            part_start = self._part_starts[k]
+            if part_start >= end:
+                break
+            pieces.append(self._parts[k][max(0, start - part_start) : end - part_start])
+        return "".join(pieces)
+
+    def _in_reply_array(self) -> bool:
+        return len(self._stack) == 2 and self._stack[1] == "[" and self._key == _REPLY_KEY
+
+    def _string_closed(self, end: int, events: list[StreamEvent]) -> None:
+        if len(self._stack) == 1 and self._expect_key:
+            key = _loads(self._text(self._string_start, end))
+            self._key = key if isinstance(key, str) else None
+            self._expect_key = False
+        elif self._in_reply_array():
+            self._emit_item(self._text(self._item_start, end), events)
+
+    def _container_closed(self, end: int, events: list[StreamEvent]) -> None:
+        depth = len(self._stack)
+        if depth == 1 and self._key == _OPTIONS_KEY:
+            value = _loads(self._text(self._value_start, end))
+            if value is not _NOT_PARSED:
+                events.append(StreamEvent("options", value))
+        elif depth == 2 and self._in_reply_array():
+            self._emit_item(self._text(self._item_start, end), events)
+
+    def _flush_scalar_item(self, end: int, events: list[StreamEvent]) -> None:
+        if self._item_start >= 0:
+            self._emit_item(self._text(self._item_start, end).strip(), events)
+
+    def _emit_item(self, text: str, events: list[StreamEvent]) -> None:
+        self._item_start = -1
+        value = _loads(text)
+        if value is not _NOT_PARSED:
+            events.append(StreamEvent("reply", value))
+
+
+def parse_first_object(text: str) -> dict | None:
+    """Return the first JSON object embedded in *text*, or None."""
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    return parser.result
@@ -0,0 +1,348 @@
+"""Detection of future-chapter knowledge leaks in AI replies.
+
+The KNOWLEDGE ASYMMETRY rule in the system prompt asks the model not to know
+what happens later in the book. This module checks it: for the current
+chapter it collects names and distinctive terms that first appear *after*
+that chapter — in later ``text.md`` chapters and in later ``chapters``
+entries of ``meta.yaml`` — and compiles them into a single Aho-Corasick
+automaton that scans a reply in one linear pass, incrementally if the reply
+arrives in streamed chunks.
+
+Matching is case-insensitive, anchored at a word start and tolerant of short
+Bulgarian inflection suffixes ("Огнянов" also matches "Огнянова").
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from collections import Counter, deque
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from literaplay.book_loader import BookTextIndex
+
+# Terms are matched by a stem of at most this many characters, inside a word
+# at most _MAX_SUFFIX characters longer than the term (inflection).
+_STEM_LEN = 6
+_MAX_SUFFIX = 4
+_MIN_TERM_LEN = 4
+# A later-chapter term must occur at least this often to count as distinctive.
+_MIN_TERM_COUNT = 2
+_MAX_TERMS = 3000
+
+_CAPITALIZED_RE = re.compile(r"\b[А-ЯЁ][а-яё]{3,}\b")
+_WORD_RE = re.compile(r"\w+")
+
+_META_TEXT_FIELDS = ("title", "setting", "character_mood", "plot_summary", "end_condition")
+
+
+# ── Aho-Corasick automaton ───────────────────────────────────────────
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher; matches all patterns in one pass over the text."""
+
+    __slots__ = ("patterns", "_goto", "_fail", "_out")
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns: list[str] = list(dict.fromkeys(p for p in patterns if p))
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+
+        for idx, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] += (idx,)
+
+        queue: deque[int] = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def step(self, node: int, ch: str) -> int:
+        """Advance the automaton from *node* over *ch* and return the new node."""
+        goto, fail = self._goto, self._fail
+        while node and ch not in goto[node]:
+            node = fail[node]
+        return goto[node].get(ch, 0)
+
+    def outputs(self, node: int) -> tuple[int, ...]:
+        return self._out[node]
+
+    def iter_matches(self, text: str) -> Iterable[tuple[int, int]]:
+        """Yield ``(end_index, pattern_index)`` for every match; end is exclusive."""
+        node = 0
+        out = self._out
+        for i, ch in enumerate(text):
+            node = self.step(node, ch)
+            for idx in out[node]:
+                yield i + 1, idx
+
+
+# ── Leak detection ───────────────────────────────────────────────────
+
+
+@dataclass(frozen=True, slots=True)
+class Leak:
+    """One future-knowledge term found in a reply."""
+
+    term: str  # canonical form, as first seen in the book
+    start: int
+    end: int
+
+
+class LeakDetector:
+    """Scans text for terms the character should not know yet."""
+
+    __slots__ = ("_automaton", "_terms")
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        by_stem: dict[str, str] = {}
+        for term in terms:
+            by_stem.setdefault(term.lower()[:_STEM_LEN], term)
+        self._automaton = AhoCorasick(by_stem)
+        self._terms = [by_stem[p] for p in self._automaton.patterns]
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def scanner(self) -> LeakScanner:
+        return LeakScanner(self._automaton, self._terms)
+
+    def scan(self, text: str) -> list[Leak]:
+        """Return every leak in *text*."""
+        if not self._terms or not text:
+            return []
+        scanner = self.scanner()
+        return scanner.feed(text) + scanner.finish()
+
+
+class LeakScanner:
+    """Incremental scanner for streamed text.
+
+    ``feed`` returns the leaks whose word has ended within the text seen so
+    far; ``finish`` flushes a match still open at the end of the stream.
+    Positions are offsets into the concatenated stream.
+    """
+
+    __slots__ = ("_ac", "_terms", "_node", "_pos", "_prev_is_word", "_word_start", "_pending")
+
+    def __init__(self, automaton: AhoCorasick, terms: list[str]) -> None:
+        self._ac = automaton
+        self._terms = terms
+        self._node = 0
+        self._pos = 0
+        self._prev_is_word = False
+        self._word_start = 0
+        # (pattern index, start) matched at a word start, awaiting the word end
+        self._pending: list[tuple[int, int]] = []
+
+    def feed(self, chunk: str) -> list[Leak]:
+        leaks: list[Leak] = []
+        ac, patterns = self._ac, self._ac.patterns
+        node, pos, prev_is_word = self._node, self._pos, self._prev_is_word
+        for ch in chunk:
+            is_word = ch.isalnum()
+            lower = ch.lower()
+            if len(lower) == 1:  # keep offsets aligned with the original text
+                ch = lower
+            if is_word and not prev_is_word:
+                self._word_start = pos
+            elif not is_word and prev_is_word and self._pending:
+                leaks.extend(self._resolve(pos))
+            node = ac.step(node, ch)
+            pos += 1
+            for idx in ac.outputs(node):
+                start = pos - len(patterns[idx])
+                if start == self._word_start and is_word:
+                    self._pending.append((idx, start))
+            prev_is_word = is_word
+        self._node, self._pos, self._prev_is_word = node, pos, prev_is_word
+        return leaks
+
+    def finish(self) -> list[Leak]:
+        leaks = self._resolve(self._pos) if self._pending else []
+        self._node, self._prev_is_word = 0, False
+        return leaks
+
+    def _resolve(self, word_end: int) -> list[Leak]:
+        leaks = [
+            Leak(self._terms[idx], start, word_end)
+            for idx, start in self._pending
+            if word_end - start <= len(self._terms[idx]) + _MAX_SUFFIX
+        ]
+        self._pending.clear()
+        # Keep only the longest match per word
+        if len(leaks) > 1:
+            leaks = [max(leaks, key=lambda leak: len(leak.term))]
+        return leaks
+
+
+def mask_leaks(text: str, leaks: list[Leak], replacement: str = "…") -> str:
+    """Replace each leaked word in *text* with *replacement*."""
+    for leak in sorted(leaks, key=lambda leak: leak.start, reverse=True):
+        text = text[: leak.start] + replacement + text[leak.end :]
+    return text
+
+
+# ── Building term lists ──────────────────────────────────────────────
+
+# A capitalized word after a word character or comma is not at a sentence or
+# utterance start, so its capital marks a proper noun.
+_MID_SENTENCE_RE = re.compile(r"(?<=[\w,;] )[А-ЯЁ][а-яё]{3,}\b")
+_VOWELS = frozenset("аеиоуъюяѝ")
+
+
+def _root(word: str) -> str:
+    """Stem of *word* without a final vowel, so "Мичо" and "Мича" share "мич"."""
+    stem = word.lower()[:_STEM_LEN]
+    return stem[:-1] if len(stem) >= _MIN_TERM_LEN and stem[-1] in _VOWELS else stem
+
+
+class _KnownWords:
+    """Words the character knows, matched tolerantly of inflection in either direction."""
+
+    __slots__ = ("_prefixes", "_roots")
+
+    def __init__(self) -> None:
+        self._prefixes: set[str] = set()
+        self._roots: set[str] = set()
+
+    def update(self, words: Iterable[str]) -> None:
+        for word in words:
+            stem = word.lower()[:_STEM_LEN]
+            self._prefixes.update(stem[:k] for k in range(3, len(stem) + 1))
+            self._roots.add(_root(word))
+
+    def __contains__(self, word: str) -> bool:
+        root = _root(word)
+        if root in self._prefixes:  # "Иван" when "Иване" is known
+            return True
+        stem = word.lower()[:_STEM_LEN]
+        return any(stem[:k] in self._roots for k in range(_MIN_TERM_LEN, len(stem) + 1))  # "Попчето" / "Попче"
+
+
+def _meta_text(chapter: dict) -> str:
+    return " ".join(str(chapter.get(k, "")) for k in _META_TEXT_FIELDS)
+
+
+@functools.lru_cache(maxsize=64)
+def book_vocabulary(book: BookTextIndex) -> tuple[list[Counter[str]], frozenset[str]]:
+    """Per-chapter capitalized-word counts and the set of words seen in lower case."""
+    per_chapter = [Counter(_CAPITALIZED_RE.findall(book.get_text(title))) for title in book.titles()]
+    lowercase_words = frozenset(
+        w for title in book.titles() for w in _WORD_RE.findall(book.get_text(title)) if w.islower()
+    )
+    return per_chapter, lowercase_words
+
+
+@functools.lru_cache(maxsize=64)
+def proper_nouns(book: BookTextIndex) -> frozenset[str]:
+    """Capitalized words seen at least once in the middle of a sentence."""
+    return frozenset(w for title in book.titles() for w in _MID_SENTENCE_RE.findall(book.get_text(title)))
+
+
+@functools.lru_cache(maxsize=8)
+def shared_vocabulary(books: tuple[BookTextIndex, ...]) -> frozenset[str]:
+    """Stems of proper nouns that are also capitalized in another of *books*.
+
+    Names several books mention ("Русия", "Букурещ", "Левски") are general
+    knowledge rather than plot, so they are never treated as future terms.
+    """
+    capitalized: Counter[str] = Counter()
+    names: set[str] = set()
+    for book in books:
+        per_chapter, _ = book_vocabulary(book)
+        capitalized.update({w.lower()[:_STEM_LEN] for counts in per_chapter for w in counts})
+        names.update(w.lower()[:_STEM_LEN] for w in proper_nouns(book))
+    return frozenset(stem for stem in names if capitalized[stem] >= 2)
+
+
+def future_terms(
+    chapters: list[dict],
+    chapter_index: int,
+    book: BookTextIndex | None = None,
+    known_text: str = "",
+    common: frozenset[str] = frozenset(),
+) -> list[str]:
+    """Return names and distinctive terms that first appear after *chapter_index*.
+
+    Candidates are capitalized Cyrillic words (proper nouns, in practice)
+    from later book chapters and later ``chapters`` entries. A candidate is
+    dropped when it (or an inflected form) already occurs up to the current
+    chapter or in *known_text* (the situation's prompt, intro and known
+    terms, which the model is given), when its stem is in *common* (see
+    :func:`shared_vocabulary`) or, for book words, when it is ordinary
+    vocabulary: seen in lower case, or capitalized only at sentence starts.
+    """
+    known = _KnownWords()
+    known.update(_WORD_RE.findall(known_text))
+    for ch in chapters[: chapter_index + 1]:
+        known.update(_WORD_RE.findall(_meta_text(ch)))
+
+    candidates: Counter[str] = Counter()
+    for ch in chapters[chapter_index + 1 :]:
+        candidates.update({w: _MIN_TERM_COUNT for w in _CAPITALIZED_RE.findall(_meta_text(ch))})
+
+    current = chapters[chapter_index] if 0 <= chapter_index < len(chapters) else {}
+    anchor = current.get("text_chapter")
+    if book is not None and anchor:
+        titles = book.titles()
+        if anchor in titles:
+            split = titles.index(anchor) + 1
+            per_chapter, lowercase_words = book_vocabulary(book)
+            names = proper_nouns(book)
+            for counts in per_chapter[:split]:
+                known.update(counts)
+            for counts in per_chapter[split:]:
+                for word, n in counts.items():
+                    if word in names and word.lower() not in lowercase_words:
+                        candidates[word] += n
+
+    terms = [
+        word
+        for word, n in candidates.most_common()
+        if n >= _MIN_TERM_COUNT
+        and len(word) >= _MIN_TERM_LEN
+        and word.lower()[:_STEM_LEN] not in common
+        and word not in known
+    ]
+    return terms[:_MAX_TERMS]
+
+
+def build_leak_detector(
+    situation: Mapping[str, Any],
+    chapter_index: int,
+    book: BookTextIndex | None = None,
+    library: tuple[BookTextIndex, ...] = (),
+) -> LeakDetector:
+    """Build the detector for one chapter of a situation.
+
+    *library* holds every book's text; names shared between books are
+    general knowledge. ``known_terms`` in the situation lists names its
+    character already knows although the book introduces them later.
+    """
+    known_text = " ".join(
+        str(situation.get(k, "")) for k in ("prompt", "intro", "first_message", "characters", "known_terms")
+    )
+    common = shared_vocabulary(library) if len(library) > 1 else frozenset()
+    terms = future_terms(situation.get("chapters", []), chapter_index, book, known_text, common)
+    return LeakDetector(terms)
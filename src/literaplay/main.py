@@ -1,9 +1,10 @@
 import contextlib
-import copy
 import json
 import logging
 import re
 import sys
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 
 # Allow direct execution from IDEs
@@ -11,102 +12,208 @@ _src_dir = Path(__file__).resolve().parent.parent
 if str(_src_dir) not in sys.path:
     sys.path.insert(0, str(_src_dir))
 
-from PySide6.QtCore import QObject, QThread, QUrl, Signal, Slot
-from PySide6.QtWebChannel import QWebChannel
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWidgets import QApplication, QMainWindow
-
-from literaplay import config
-from literaplay.ai_service import AIService, APIOverloadedError, ChatSession, validate_api_key
-from literaplay.book_loader import get_books_dir, get_chapter_excerpt, load_book_texts
-from literaplay.data import LIBRARY
-from literaplay.response_parser import parse_ai_json_response, validate_story_response
-from literaplay.story_state import StoryStateManager
+from literaplay import startup
+
+_PROFILER = startup.StartupProfiler()
+
+with _PROFILER.phase("import_qt"):
+    from PySide6.QtCore import QObject, QThread, QUrl, Signal, Slot
+    from PySide6.QtWebChannel import QWebChannel
+    from PySide6.QtWebEngineWidgets import QWebEngineView
+    from PySide6.QtWidgets import QApplication, QMainWindow
+
+with _PROFILER.phase("import_app"):
+    from literaplay import config, fast_json, metrics, tracing
+    from literaplay.ai_service import AIService, APIOverloadedError, ChatSession, validate_api_key
+    from literaplay.book_loader import get_books_dir, get_chapter_excerpt, load_book_texts
+    from literaplay.cancellation import CancelToken, DeadlineExceeded, TurnCancelled
+    from literaplay.catalog import Situation, build_catalog, compile_situations, situation_details
+    from literaplay.character_lexicon import build_character_lexicon
+    from literaplay.fast_json import StoryResponse, decode_story_response
+    from literaplay.json_repair import repair_json
+    from literaplay.knowledge_guard import LeakDetector, build_leak_detector
+    from literaplay.response_parser import parse_ai_json_response, validate_story_response
+    from literaplay.story_state import StoryStateManager
+    from literaplay.turn_queue import TurnQueue
+    from literaplay.usage import UsageLedger
 
 UI_PATH = Path(__file__).parent / "ui" / "index.html"
 
-_WORKER_STACK_SIZE = 4 * 1024 * 1024  # 4 MB — google-genai overflows the default 512 KB
+_WORKER_STACK_SIZE = 4 * 1024 * 1024  # 4 MB — google-genai overflows the default 512 KB (SDK transport only)
 _WORKER_WAIT_TIMEOUT_MS = 3000
 
 
-_LIBRARY_JSON_CACHE: str | None = None
-_BOOK_TEXTS = load_book_texts(get_books_dir())
+def _load_library() -> dict:
+    from literaplay.data import LIBRARY  # parses every books/*/meta.yaml
+
+    return LIBRARY
+
 
+# Loaded by StartupWorker after the window is shown; result() waits if a slot needs one first.
+_LIBRARY = startup.Deferred("library", _load_library, _PROFILER)
+_SITUATIONS = startup.Deferred("situations", lambda: compile_situations(_LIBRARY.result()), _PROFILER)
+_CATALOG_JSON = startup.Deferred("catalog", lambda: fast_json.dumps(build_catalog(_LIBRARY.result())), _PROFILER)
+_BOOK_TEXTS = startup.Deferred("book_texts", lambda: load_book_texts(get_books_dir()), _PROFILER)
+# In this order; the menu can be shown once "catalog" is ready
+_STARTUP_PHASES = (_LIBRARY, _SITUATIONS, _CATALOG_JSON, _BOOK_TEXTS)
 
-def _build_library_json() -> str:
-    """Build a JSON-serializable copy of LIBRARY (cached after first call)."""
-    global _LIBRARY_JSON_CACHE
-    if _LIBRARY_JSON_CACHE is not None:
-        return _LIBRARY_JSON_CACHE
-    lib = copy.deepcopy(LIBRARY)
-    for _, work in lib.items():
-        for sit in work.get("situations", []):
-            if "user_character" not in sit:
-                sit["user_character"] = "Разказвач"
-    _LIBRARY_JSON_CACHE = json.dumps(lib)
-    return _LIBRARY_JSON_CACHE
+
+def _build_catalog_json() -> str:
+    """Return the compact menu catalog of LIBRARY as JSON (built once)."""
+    return _CATALOG_JSON.result()
+
+
+def _create_ai_service(provider: str, key: str) -> AIService:
+    """AIService for *provider* with the configured model, transport, reasoning, routing and hedging."""
+    service = AIService(
+        provider,
+        key,
+        config.DEFAULT_MODEL,
+        structured_output=config.get_structured_output(provider),
+        transport=config.get_transport(provider),
+        reasoning=config.REASONING,
+        fast_model=config.get_fast_model(provider),
+    )
+    if config.hedging_enabled(provider):
+        secondary = config.HEDGE_PROVIDER
+        try:
+            service.enable_hedging(
+                AIService(
+                    secondary,
+                    config.HEDGE_API_KEY,
+                    config.HEDGE_MODEL,
+                    structured_output=config.get_structured_output(secondary),
+                    transport=config.get_transport(secondary),
+                    reasoning=config.REASONING,
+                    fast_model=config.get_fast_model(secondary),
+                ),
+                config.HEDGE_DELAY_S,
+            )
+        except Exception:
+            logging.exception("Failed to create the %s client for hedging; continuing without it", secondary)
+    return service
 
 
 # ================== WORKER THREAD ==================
 
 
 class AIChatWorker(QThread):
-    response_signal = Signal(dict)
+    response_signal = Signal(object)  # StoryResponse (fast path) or dict
     error_signal = Signal(str)
     overload_signal = Signal()
 
-    def __init__(self, ai_service: AIService, chat_session: ChatSession, user_text: str, context_injection: str = ""):
+    def __init__(
+        self,
+        ai_service: AIService,
+        chat_session: ChatSession,
+        user_text: str,
+        context_injection: str = "",
+        turn_type: str = "turn",
+        key_beat: bool | None = None,
+        cancel: CancelToken | None = None,
+        trace: tracing.Span | None = None,
+    ):
         super().__init__()
-        self.setStackSize(_WORKER_STACK_SIZE)
+        if ai_service.transport == "sdk":
+            self.setStackSize(_WORKER_STACK_SIZE)
         self.ai_service = ai_service
         self.chat_session = chat_session
         self.user_text = user_text
         self.context_injection = context_injection
+        self.turn_type = turn_type
+        self.key_beat = key_beat
+        self.cancel = cancel or CancelToken()
+        self.trace = trace
 
     def run(self):
+        with tracing.use(self.trace):
+            self._run()
+
+    def _run(self):
         try:
             response_text = self.ai_service.send_message_with_context(
-                self.chat_session, self.user_text, self.context_injection
+                self.chat_session,
+                self.user_text,
+                self.context_injection,
+                turn_type=self.turn_type,
+                key_beat=self.key_beat,
+                cancel=self.cancel,
             )
-
-            # Parse response
-            data = parse_ai_json_response(response_text)
-            if data and isinstance(data, dict):
-                self.response_signal.emit(
-                    {
-                        "reply": data.get("reply", response_text),
-                        "options": data.get("options", []),
-                        "ended": data.get("ended", False),
-                        "mood": data.get("mood", ""),
-                        "location": data.get("location", ""),
-                        "key_event": data.get("key_event", ""),
-                    }
-                )
-            else:
-                self.response_signal.emit(
-                    {
-                        "reply": response_text,
-                        "options": [],
-                        "ended": False,
-                        "mood": "",
-                        "location": "",
-                        "key_event": "",
-                    }
-                )
+            with tracing.span("parse", reply_chars=len(response_text)) as span:
+                response, decoder = self._parse(response_text)
+                if span is not None:
+                    span.set(decoder=decoder)
+            metrics.REPLIES_PARSED.labels(decoder).inc()
+            metrics.TURNS.labels("ok").inc()
+            self.response_signal.emit(response)
+        except DeadlineExceeded:
+            logging.warning("Turn exceeded its %.0fs deadline", config.TURN_DEADLINE_S)
+            metrics.TURNS.labels("timeout").inc()
+            self.error_signal.emit("Отговорът отне твърде дълго. Опитайте отново.")
+        except TurnCancelled as e:
+            logging.info("Turn cancelled: %s", e.reason)  # the bridge has already moved on
+            metrics.TURNS.labels("cancelled").inc()
         except Exception as e:
             logging.exception("AIChatWorker encountered an error")
             if isinstance(e, APIOverloadedError):
+                metrics.TURNS.labels("overloaded").inc()
                 self.overload_signal.emit()
             else:
+                metrics.TURNS.labels("error").inc()
                 self.error_signal.emit(str(e))
 
+    @staticmethod
+    def _parse(response_text: str) -> tuple[dict | StoryResponse, str]:
+        """The reply as a StoryResponse or dict, and which decoder produced it."""
+        # Fast path: well-formed output decodes straight into typed structs
+        decoded = decode_story_response(response_text)
+        if decoded is not None:
+            return decoded, "fast"
+
+        # Parse response, repairing truncated/malformed JSON rather than re-requesting
+        data = parse_ai_json_response(response_text)
+        decoder = "json"
+        repair_confidence = None
+        if not isinstance(data, dict):
+            repaired = repair_json(response_text)
+            if repaired.value is not None and repaired.confidence >= config.REPAIR_MIN_CONFIDENCE:
+                logging.info("Repaired AI JSON (confidence %.2f): %s", repaired.confidence, repaired.fixes)
+                data, repair_confidence, decoder = repaired.value, repaired.confidence, "repaired"
+        if data and isinstance(data, dict):
+            response = {
+                "reply": data.get("reply", response_text),
+                "options": data.get("options", []),
+                "ended": data.get("ended", False),
+                "mood": data.get("mood", ""),
+                "location": data.get("location", ""),
+                "key_event": data.get("key_event", ""),
+            }
+            if repair_confidence is not None:
+                response["_repair_confidence"] = repair_confidence
+            return response, decoder
+        return {
+            "reply": response_text,
+            "options": [],
+            "ended": False,
+            "mood": "",
+            "location": "",
+            "key_event": "",
+        }, "raw"
+
+
+class _UsageRelay(QObject):
+    """Carries usage reports from request threads to the bridge; the ledger is used from the UI thread only."""
+
+    reported = Signal(object)  # (session id, situation, chapter id, CallInfo)
+
 
 class APIVerifyWorker(QThread):
     finished_signal = Signal(bool, str)
 
     def __init__(self, provider: str, key: str):
         super().__init__()
-        self.setStackSize(_WORKER_STACK_SIZE)
+        if config.get_transport(provider) == "sdk":
+            self.setStackSize(_WORKER_STACK_SIZE)
         self.provider = provider
         self.key = key
 
@@ -115,9 +222,82 @@ class APIVerifyWorker(QThread):
         self.finished_signal.emit(is_valid, message)
 
 
+class StartupWorker(QThread):
+    """Runs the deferred startup phases once the window is up.
+
+    Loads the library and book texts, then imports the provider SDK and
+    creates the client for a saved key. Emits ``phase_ready`` (or
+    ``phase_failed``) as each phase finishes and ``client_ready`` last.
+    """
+
+    phase_ready = Signal(str)
+    phase_failed = Signal(str, str)  # phase name, error
+    client_ready = Signal(object)  # AIService, or None without a usable saved key
+
+    def __init__(self):
+        super().__init__()
+        if config.PROVIDER and config.get_transport(config.PROVIDER) == "sdk":
+            self.setStackSize(_WORKER_STACK_SIZE)
+
+    def run(self):
+        for deferred in _STARTUP_PHASES:
+            try:
+                deferred.result()
+            except Exception as e:
+                logging.exception("Startup phase %s failed", deferred.name)
+                self.phase_failed.emit(deferred.name, str(e))
+            else:
+                self.phase_ready.emit(deferred.name)
+
+        service = None
+        if config.API_KEY and config.PROVIDER:
+            try:
+                with _PROFILER.phase("ai_client"):
+                    service = _create_ai_service(config.PROVIDER, config.API_KEY)
+            except Exception:
+                logging.exception("Failed to create AI client for the saved key")
+        self.client_ready.emit(service)
+
+
 # ================== BACKEND BRIDGE ==================
 
 
+@dataclass(slots=True)
+class _TurnUpdate:
+    """Everything the frontend receives after one AI turn.
+
+    ``None`` fields are not part of this turn (``progress`` is ``None`` when
+    unchanged since the last turn).
+    """
+
+    messages: list[dict] = field(default_factory=list)
+    options: list[str] | None = None
+    progress: dict | None = None
+    chapter_title: str | None = None
+    ended_text: str | None = None
+    loading: bool = False  # a queued turn is sent next
+
+    def to_payload(self) -> dict:
+        """The turnCompleted payload: messages plus whichever other parts are present."""
+        payload: dict = {"messages": self.messages, "loading": self.loading}
+        if self.chapter_title is not None:
+            payload["chapterTransition"] = self.chapter_title
+        if self.ended_text is not None:
+            payload["ended"] = self.ended_text
+        if self.options is not None:
+            payload["options"] = self.options
+        if self.progress is not None:
+            payload["progress"] = self.progress
+        return payload
+
+
+def _ended_text(reply: list | str) -> str:
+    """Final narrative text for chatEnded."""
+    if isinstance(reply, list):
+        return "\n\n".join(msg.get("text", "") for msg in reply)
+    return str(reply)
+
+
 def _format_reply_messages(reply: list | str, default_character: str) -> list[dict]:
     """Normalise a reply (list-of-dicts or plain string) into message dicts."""
     if isinstance(reply, list):
@@ -142,7 +322,9 @@ class BackendBridge(QObject):
 
     # Signals to JS
     apiValidationResult = Signal(bool, str)
-    libraryLoaded = Signal(str)
+    startupFailed = Signal(str, str)  # phase name, error — the app cannot continue
+    libraryLoaded = Signal(str)  # JSON: compact catalog (titles, colours, characters, keys)
+    situationDetailsLoaded = Signal(str)  # JSON: one situation's details, requested on open
     chatMessageReceived = Signal(str)  # JSON string {sender, text, isUser, isSystem}
     chatOptionsUpdated = Signal(str)  # JSON string — QWebChannel cannot serialize Python lists
     chatStarted = Signal(str, str)  # intro, first_message
@@ -155,6 +337,11 @@ class BackendBridge(QObject):
     currentModel = Signal(str)  # Let JS know the current active model
     currentProvider = Signal(str)  # Let JS know the current provider
     providerModelsLoaded = Signal(str)  # JSON: {default, models[]}
+    # One JSON payload per AI turn (see _TurnUpdate), sent instead of the per-item
+    # signals above once JS calls enable_turn_batching()
+    turnCompleted = Signal(str)
+    queueDepthChanged = Signal(int)  # inputs waiting for the turn in flight (see turn_queue)
+    usageUpdated = Signal(str)  # JSON: {session, chapter} token and cost totals (see usage.UsageTotals)
 
     def __init__(self, app_window):
         super().__init__()
@@ -162,35 +349,94 @@ class BackendBridge(QObject):
 
         self.ai_service: AIService | None = None
         self.chat_session = None
-        self.current_work: dict | None = None
+        self.current_work: Situation | None = None
         self.worker: AIChatWorker | None = None
+        self._turn_cancel: CancelToken | None = None
+        self._turn_text: str | None = None
+        self._turn_span: tracing.Span | None = None
+        self._tracer = tracing.Tracer(config.TRACE_FILE if config.TRACE_ENABLED else None, config.TRACE_MAX_BYTES)
+        self._usage = UsageLedger(config.USAGE_FILE)
+        self._usage_relay = _UsageRelay()
+        self._usage_relay.reported.connect(self._on_usage_reported)
+        self._session_id = ""
         self.api_worker: APIVerifyWorker | None = None
         self.story_manager: StoryStateManager | None = None
+        self.leak_detector: LeakDetector | None = None
         self._current_book_key: str | None = None
         # Keep strong references to running workers to prevent premature GC;
         # finished workers are removed automatically via _cleanup_worker.
         self._active_workers: list = []
         self._chat_in_progress = False
+        self._turn_queue = TurnQueue(max_chars=self._MAX_USER_MESSAGE_CHARS)
+        self._queue_depth_sent = 0
+        self._session_open = False  # counted in metrics.ACTIVE_SESSIONS
+        self._turn_batching = False
+        self._last_progress: dict | None = None
+        # Deferred startup (see StartupWorker): the menu is shown once the
+        # catalog is loaded and, for a saved key, the client is created.
+        self._ready_phases: set[str] = set()
+        self._client_pending = bool(config.API_KEY and config.PROVIDER)
+        self._library_requested = False
+        self._startup_error: tuple[str, str] | None = None
+
+    def start_background_init(self) -> QThread:
+        """Start the deferred startup phases; call after the window is shown."""
+        worker = StartupWorker()
+        worker.phase_ready.connect(self._on_startup_phase_ready)
+        worker.phase_failed.connect(self._on_startup_phase_failed)
+        worker.client_ready.connect(self._on_startup_client_ready)
+        self._track_worker(worker)
+        worker.start()
+        return worker
 
-        if config.API_KEY and config.PROVIDER:
-            with contextlib.suppress(Exception):
-                self.ai_service = AIService(config.PROVIDER, config.API_KEY, config.DEFAULT_MODEL)
+    @Slot(str)
+    def _on_startup_phase_ready(self, name):
+        self._ready_phases.add(name)
+        self._emit_library_if_ready()
+
+    @Slot(str, str)
+    def _on_startup_phase_failed(self, name, message):
+        # Later phases depend on the library and re-raise its error; report the first failure only
+        if self._startup_error is None:
+            self._startup_error = (name, message)
+            self.startupFailed.emit(name, message)
+
+    @Slot(object)
+    def _on_startup_client_ready(self, service):
+        self._client_pending = False
+        if self.ai_service is None:  # the user may have entered a key meanwhile
+            self.ai_service = service
+        self._emit_library_if_ready()
+
+    def _emit_library_if_ready(self):
+        """Send the catalog once it is requested, loaded, and a client exists."""
+        if not self._library_requested or _CATALOG_JSON.name not in self._ready_phases:
+            return
+        if self.ai_service is None:
+            if not self._client_pending:
+                self._library_requested = False  # no usable saved key: stay on the API screen
+            return
+        self._library_requested = False
+        self.libraryLoaded.emit(_build_catalog_json())
+        _PROFILER.mark("interactive")
 
     @Slot()
     def request_initial_state(self):
         """Called by JS when the page finishes loading."""
+        if self._startup_error is not None:  # failed before the page could hear it
+            self.startupFailed.emit(*self._startup_error)
+            return
         self.currentModel.emit(config.DEFAULT_MODEL)
 
         if config.PROVIDER:
             self.currentProvider.emit(config.PROVIDER)
             self.providerModelsLoaded.emit(config.get_models_json(config.PROVIDER))
 
-        if config.API_KEY and config.PROVIDER and self.ai_service:
-            # Skip straight to menu
-            self.libraryLoaded.emit(_build_library_json())
-        else:
-            # JS stays on API screen by default
-            pass
+        if config.API_KEY and config.PROVIDER:
+            # Skip straight to menu once the catalog and client are ready;
+            # otherwise JS stays on the API screen
+            self._library_requested = True
+            self._emit_library_if_ready()
 
     @Slot(str, str)
     def verify_api_key(self, provider, key):
@@ -208,6 +454,7 @@ class BackendBridge(QObject):
 
     @Slot(str, str, bool)
     def save_api_key_decision(self, provider, key, should_save):
+        self._cancel_turn("provider changed")
         if should_save:
             config.save_provider(provider)
             config.save_api_key(key)
@@ -224,11 +471,12 @@ class BackendBridge(QObject):
                 config.save_model_name(default_model)
 
         try:
-            self.ai_service = AIService(provider, key, config.DEFAULT_MODEL)
+            self.ai_service = _create_ai_service(provider, key)
             self.currentModel.emit(config.DEFAULT_MODEL)
             self.currentProvider.emit(provider)
             self.providerModelsLoaded.emit(config.get_models_json(provider))
-            self.libraryLoaded.emit(_build_library_json())
+            self._library_requested = True
+            self._emit_library_if_ready()
         except Exception as e:
             logging.exception("Failed to initialize AI service")
             self.apiValidationResult.emit(False, str(e))
@@ -244,55 +492,121 @@ class BackendBridge(QObject):
 
     @Slot(str)
     def save_model(self, model_name):
-        if self._chat_in_progress:
-            self.chatError.emit("Изчакайте текущото съобщение.")
-            return
+        # Applied between turns: the turn in flight is stopped and resent on the new model
+        interrupted = self._cancel_turn("model changed", keep_queue=True)
         config.save_model_name(model_name)
         if config.API_KEY and config.PROVIDER:
             try:
-                self.ai_service = AIService(config.PROVIDER, config.API_KEY, config.DEFAULT_MODEL)
+                self.ai_service = _create_ai_service(config.PROVIDER, config.API_KEY)
                 if self.current_work and self.chat_session:
-                    self.chat_session = self.ai_service.create_chat(self.current_work["prompt"])
+                    self.chat_session = self._create_chat(self.ai_service, self.current_work)
+                    if self.story_manager:
+                        # The new session has no history — resend the full state block
+                        self.story_manager.force_full_refresh()
                 self.currentModel.emit(config.DEFAULT_MODEL)
             except Exception as e:
                 logging.exception("Failed to update model")
                 self.chatError.emit(str(e))
+        if interrupted is not None:
+            self._turn_queue.requeue(interrupted)
+        self._send_next_turn()
+
+    @Slot(str, str)
+    def request_situation_details(self, work_key, sit_key):
+        """Called by JS when a situation is opened; the menu catalog omits these fields."""
+        situation = _SITUATIONS.result().get((work_key, sit_key))
+        if situation is None:
+            self.chatError.emit("Situation not found.")
+            return
+        self.situationDetailsLoaded.emit(fast_json.dumps(situation_details(situation)))
 
     @Slot(str, str)
     def start_chat_session(self, work_key, sit_key):
-        work_data = LIBRARY.get(work_key)
-        if not work_data:
+        self._cancel_turn("new chat")
+        if work_key not in _LIBRARY.result():
             self.chatError.emit("Work not found.")
             return
 
-        sit_data = next((s for s in work_data.get("situations", []) if s.get("key") == sit_key), None)
-        if not sit_data:
+        situation = _SITUATIONS.result().get((work_key, sit_key))
+        if situation is None:
             self.chatError.emit("Situation not found.")
             return
 
-        # Deep-copy sit_data so nested structures (e.g. chapters list)
-        # are not shared with the original LIBRARY dict.
-        self.current_work = copy.deepcopy(sit_data)
-        self.current_work["_key"] = sit_key
+        # Shared and read-only: per-session state lives in story_manager
+        self.current_work = situation
         self._current_book_key = work_key
+        self._session_id = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {self._situation_key()}"
         self.chat_session = None
-        self.story_manager = StoryStateManager(self.current_work)
+        self.story_manager = StoryStateManager(
+            self.current_work,
+            state_encoding=config.get_state_encoding(config.PROVIDER),
+            event_similarity=config.KEY_EVENT_SIMILARITY,
+            character_lexicon=build_character_lexicon(self.current_work, _BOOK_TEXTS.result().get(work_key)),
+        )
+        self._rebuild_leak_detector()
 
         if self.ai_service:
             try:
-                self.chat_session = self.ai_service.create_chat(self.current_work["prompt"])
+                self.chat_session = self._create_chat(self.ai_service, self.current_work)
+                self._set_session_open(True)
                 self.chatStarted.emit(
                     self.current_work["intro"],
                     self.current_work.get("first_message", "Здравей!"),
                 )
                 self.chatOptionsUpdated.emit(json.dumps(self.current_work.get("choices", [])))
                 # Emit initial progress
-                if self.story_manager.has_chapters:
-                    self.storyProgressUpdated.emit(json.dumps(self.story_manager.get_progress_info()))
+                self._last_progress = None
+                progress = self._progress_if_changed()
+                if progress is not None:
+                    self.storyProgressUpdated.emit(json.dumps(progress))
             except Exception as e:
                 logging.exception("Failed to start chat")
+                self._set_session_open(self.chat_session is not None)
                 self.chatError.emit(str(e))
 
+    @Slot()
+    def leave_chat(self):
+        """Called by JS when the user goes back to the menu."""
+        self._cancel_turn("left chat")
+        self._set_session_open(False)
+
+    def _set_session_open(self, session_open: bool) -> None:
+        if session_open != self._session_open:
+            self._session_open = session_open
+            metrics.ACTIVE_SESSIONS.inc(1 if session_open else -1)
+
+    def _cancel_turn(self, reason: str, keep_queue: bool = False) -> str | None:
+        """Abort the turn in flight, if any, and return its text; its worker exits without emitting.
+
+        Queued input is discarded too unless *keep_queue*.
+        """
+        interrupted = self._turn_text if self._chat_in_progress else None
+        if self._turn_cancel is not None:
+            self._turn_cancel.cancel(reason)
+            self._turn_cancel = None
+        self.worker = None
+        self._turn_text = None
+        self._end_turn_span(f"cancelled: {reason}")
+        if not keep_queue:
+            self._turn_queue.clear()
+            self._emit_queue_depth()
+        if self._chat_in_progress:
+            self._chat_in_progress = False
+            self.loadingStateChanged.emit(False)
+        return interrupted
+
+    def _emit_queue_depth(self) -> None:
+        depth = self._turn_queue.depth
+        if depth != self._queue_depth_sent:
+            metrics.QUEUE_DEPTH.inc(depth - self._queue_depth_sent)
+            self._queue_depth_sent = depth
+            self.queueDepthChanged.emit(depth)
+
+    def _is_stale(self) -> bool:
+        """Whether the signal being handled came from a worker whose turn was cancelled."""
+        sender = self.sender()
+        return isinstance(sender, AIChatWorker) and sender is not self.worker
+
     # Maximum number of characters accepted from the user in a single message.
     # Prevents context-window exhaustion and prompt-injection via huge payloads.
     _MAX_USER_MESSAGE_CHARS = 2000
@@ -307,6 +621,16 @@ class BackendBridge(QObject):
         re.IGNORECASE,
     )
 
+    def _rebuild_leak_detector(self) -> None:
+        """Compile the future-knowledge detector for the current chapter."""
+        self.leak_detector = None
+        if config.LEAK_POLICY == "off" or not self.story_manager or not self.current_work:
+            return
+        chapter_index = self.story_manager.get_state().current_chapter_index
+        books = _BOOK_TEXTS.result()
+        book = books.get(self._current_book_key or "")
+        self.leak_detector = build_leak_detector(self.current_work, chapter_index, book, tuple(books.values()))
+
     def _track_worker(self, worker: QThread) -> None:
         """Keep a strong ref to *worker* and auto-remove it when finished."""
         self._active_workers.append(worker)
@@ -323,10 +647,6 @@ class BackendBridge(QObject):
             self.chatError.emit("Няма активна сесия.")
             return
 
-        # Double-send guard: ignore if a chat request is already in progress
-        if self._chat_in_progress:
-            return
-
         # Validate and cap input length
         if not text or not text.strip():
             return
@@ -339,110 +659,251 @@ class BackendBridge(QObject):
         if not text:
             return
 
+        # Input sent during a turn waits for it (coalesced with other waiting input)
+        self._turn_queue.submit(text)
+        if self._chat_in_progress:
+            self._emit_queue_depth()
+            return
+        self._send_next_turn()
+
+    def _send_next_turn(self) -> None:
+        """Start a turn for the next queued request, unless one is in flight or nothing waits."""
+        if self._chat_in_progress or not self.ai_service or not self.chat_session:
+            return
+        queued = self._turn_queue.pop()
+        self._emit_queue_depth()
+        if queued is None:
+            return
+        if queued.inputs > 1:
+            logging.info("Sending %d queued inputs as one turn", queued.inputs)
+        text = queued.text
+
         self._chat_in_progress = True
+        self._turn_text = text
         self.loadingStateChanged.emit(True)
 
-        # Build context injection from story state
-        context = ""
-        if self.story_manager and self.story_manager.has_chapters:
-            book_excerpt = ""
-            if self._current_book_key and self.current_work:
-                chapter = self.story_manager.current_chapter()
-                if chapter:
-                    book_excerpt = get_chapter_excerpt(
-                        _BOOK_TEXTS,
-                        self._current_book_key,
-                        chapter.id,
-                        self.current_work.get("chapters", []),
-                    )
-            context = self.story_manager.build_context_injection(book_excerpt)
-
-        self.worker = AIChatWorker(self.ai_service, self.chat_session, text, context)
+        turn_type = self.story_manager.turn_type() if self.story_manager else "turn"
+        key_beat = self.story_manager.is_key_beat() if self.story_manager else None
+        self._turn_span = self._tracer.start_trace(
+            "turn",
+            provider=self.ai_service.provider,
+            model=self.ai_service.model_name,
+            situation=self._situation_key(),
+            turn_type=turn_type,
+            key_beat=key_beat,
+            queued_inputs=queued.inputs,
+        )
+        with tracing.use(self._turn_span):
+            context = self._build_context()
+
+        deadline = config.TURN_DEADLINE_S if config.TURN_DEADLINE_S > 0 else None
+        self._turn_cancel = CancelToken(deadline)
+        self.worker = AIChatWorker(
+            self.ai_service, self.chat_session, text, context, turn_type, key_beat, self._turn_cancel, self._turn_span
+        )
         self.worker.response_signal.connect(self._on_chat_response_worker)
         self.worker.error_signal.connect(self._on_chat_error_worker)
         self.worker.overload_signal.connect(self._on_chat_overload_worker)
         self._track_worker(self.worker)
         self.worker.start()
 
-    def _emit_reply_messages(self, reply):
-        """Emit chatMessageReceived for each message in the reply."""
-        if self.current_work is None:
+    def _build_context(self) -> str:
+        """The story-state block for the next turn (empty without chapters)."""
+        if not self.story_manager or not self.story_manager.has_chapters:
+            return ""
+        chapter = self.story_manager.current_chapter()
+        tracing.annotate(chapter=chapter.id if chapter else None, turn=self.story_manager.get_state().turn_count)
+        book_excerpt = ""
+        if self._current_book_key and self.current_work and chapter:
+            with tracing.span("context.excerpt"):
+                book_excerpt = get_chapter_excerpt(
+                    _BOOK_TEXTS.result(),
+                    self._current_book_key,
+                    chapter.id,
+                    self.current_work.get("chapters", []),
+                )
+        with tracing.span("context.build", excerpt_chars=len(book_excerpt)) as span:
+            context = self.story_manager.build_context_injection(book_excerpt)
+            if span is not None:
+                span.set(context_chars=len(context))
+        return context
+
+    def _situation_key(self) -> str | None:
+        return f"{self.current_work.work_key}/{self.current_work.key}" if self.current_work else None
+
+    def _create_chat(self, ai_service: AIService, work: Situation):
+        """A chat session for *work* whose requests are added to the usage ledger.
+
+        The session, situation and chapter are fixed here (each chapter gets
+        its own session), so a request that finishes after the story moved on
+        or the chat was left is still charged to the right place.
+        """
+        session = ai_service.create_chat(work["prompt"])
+        chapter = self.story_manager.current_chapter() if self.story_manager else None
+        tag = (self._session_id, self._situation_key(), chapter.id if chapter else None)
+        relay = self._usage_relay
+        session.on_usage = lambda call: relay.reported.emit((*tag, call))  # on the request's thread
+        return session
+
+    @Slot(object)
+    def _on_usage_reported(self, report):
+        """Add one billed request to the usage ledger and send the totals to the UI."""
+        session_id, situation, chapter_id, call = report
+        if situation is None:
             return
-        for msg in _format_reply_messages(reply, self.current_work["character"]):
-            self.chatMessageReceived.emit(json.dumps(msg))
+        self._usage.record(call.provider, call.model, call.usage, session_id, situation, chapter_id)
+        if session_id != self._session_id:
+            return  # finished after the user left that chat
+        totals = {"session": self._usage.get("session", session_id).to_dict()}
+        if chapter_id:
+            totals["chapter"] = self._usage.get("chapter", f"{situation}#{chapter_id}").to_dict()
+        self.usageUpdated.emit(fast_json.dumps(totals))
+
+    def _end_turn_span(self, error: str | None = None) -> None:
+        if self._turn_span is not None:
+            self._turn_span.end(error)
+            self._turn_span = None
 
-    def _emit_ended(self, reply):
-        """Emit chatEnded with the final narrative text."""
-        if isinstance(reply, list):
-            self.chatEnded.emit("\n\n".join(msg.get("text", "") for msg in reply))
-        else:
-            self.chatEnded.emit(str(reply))
-
-    @Slot(dict)
-    def _on_chat_response_worker(self, data):
+    @Slot()
+    def enable_turn_batching(self):
+        """Called by JS to receive each turn as a single turnCompleted payload."""
+        self._turn_batching = True
+
+    def _progress_if_changed(self) -> dict | None:
+        """Return the story progress if it differs from what the frontend last got."""
+        if not self.story_manager or not self.story_manager.has_chapters:
+            return None
+        progress = self.story_manager.get_progress_info()
+        if progress == self._last_progress:
+            return None
+        self._last_progress = progress
+        return progress
+
+    def _deliver_turn(self, turn: _TurnUpdate) -> None:
+        """Send a turn to the frontend: one payload when batching, else the per-item signals."""
+        if turn.ended_text is not None:  # nothing left to answer queued input
+            self._turn_queue.clear()
+            self._emit_queue_depth()
+        turn.loading = len(self._turn_queue) > 0
+        # Signal emission only: the web view renders asynchronously, after this span ends
+        with tracing.span("deliver", messages=len(turn.messages), batched=self._turn_batching):
+            self._emit_turn(turn)
+
+    def _emit_turn(self, turn: _TurnUpdate) -> None:
+        if self._turn_batching:
+            self.turnCompleted.emit(fast_json.dumps(turn.to_payload()))
+            return
+        for msg in turn.messages:
+            self.chatMessageReceived.emit(fast_json.dumps(msg))
+        if turn.chapter_title is not None:
+            self.chapterTransition.emit(turn.chapter_title)
+        if turn.ended_text is not None:
+            self.chatEnded.emit(turn.ended_text)
+        if turn.options is not None:
+            self.chatOptionsUpdated.emit(fast_json.dumps(turn.options))
+        if turn.progress is not None:
+            self.storyProgressUpdated.emit(fast_json.dumps(turn.progress))
+
+    @Slot(object)
+    def _on_chat_response_worker(self, data: dict | StoryResponse):
+        if self._is_stale():
+            return
+        self._finish_turn()
+        if not self._turn_batching:
+            self.loadingStateChanged.emit(False)
+        with tracing.use(self._turn_span):
+            self._apply_response(data)
+        self._end_turn_span()
+        self._send_next_turn()
+
+    def _finish_turn(self) -> None:
+        self._turn_cancel = None
+        self._turn_text = None
         self._chat_in_progress = False
-        self.loadingStateChanged.emit(False)
 
+    def _apply_response(self, data: dict | StoryResponse) -> None:
+        """Record the turn in the story state and deliver it to the frontend."""
         # Validate & sanitize against story state
         if self.story_manager and self.story_manager.has_chapters:
-            data = validate_story_response(
-                data,
-                state=self.story_manager.get_state(),
-                chapter=self.story_manager.current_chapter(),
-                is_last_chapter=self.story_manager.is_last_chapter(),
-            )
+            with tracing.span("validate", leak_policy=config.LEAK_POLICY):
+                data = validate_story_response(
+                    data,
+                    state=self.story_manager.get_state(),
+                    chapter=self.story_manager.current_chapter(),
+                    is_last_chapter=self.story_manager.is_last_chapter(),
+                    leak_detector=self.leak_detector,
+                    leak_policy=config.LEAK_POLICY,
+                )
             # Record the turn so state updates
-            self.story_manager.record_turn(data)
+            with tracing.span("record"):
+                self.story_manager.record_turn(data)
+        elif isinstance(data, StoryResponse):
+            data = data.to_dict()
 
         reply = data.get("reply", "")
         options = data.get("options", [])
         ended = data.get("ended", False)
         chapter_ended = data.get("_chapter_ended", False)
+        default_character = self.current_work["character"] if self.current_work else ""
+        turn = _TurnUpdate()
 
         if ended:
-            self._emit_ended(reply)
+            turn.ended_text = _ended_text(reply)
         elif chapter_ended:
-            self._emit_reply_messages(reply)
+            turn.messages = _format_reply_messages(reply, default_character)
             story_manager = self.story_manager
             ai_service = self.ai_service
             current_work = self.current_work
             if story_manager is None or ai_service is None or current_work is None:
+                self._deliver_turn(turn)
                 return
             advanced = story_manager.advance_chapter()
             if advanced:
+                self._rebuild_leak_detector()
                 next_ch = story_manager.current_chapter()
-                title = next_ch.title if next_ch else ""
-                self.chapterTransition.emit(title)
+                turn.chapter_title = next_ch.title if next_ch else ""
                 # Create a new chat session for the next chapter
                 try:
-                    self.chat_session = ai_service.create_chat(current_work["prompt"])
+                    self.chat_session = self._create_chat(ai_service, current_work)
                 except Exception as e:
                     logging.exception("Chapter transition error")
+                    self._deliver_turn(turn)
                     self.chatError.emit(str(e))
                     return
-                self.storyProgressUpdated.emit(json.dumps(story_manager.get_progress_info()))
-                self.chatOptionsUpdated.emit(json.dumps(options))
+                turn.progress = self._progress_if_changed()
+                turn.options = options
             else:
                 # No more chapters — story is over
-                self._emit_ended(reply)
+                turn.ended_text = _ended_text(reply)
         else:
-            self._emit_reply_messages(reply)
-            self.chatOptionsUpdated.emit(json.dumps(options))
-            # Update progress
-            if self.story_manager and self.story_manager.has_chapters:
-                self.storyProgressUpdated.emit(json.dumps(self.story_manager.get_progress_info()))
+            turn.messages = _format_reply_messages(reply, default_character)
+            turn.options = options
+            turn.progress = self._progress_if_changed()
+        self._deliver_turn(turn)
 
     @Slot(str)
     def _on_chat_error_worker(self, message):
-        self._chat_in_progress = False
+        if self._is_stale():
+            return
+        self._finish_turn()
+        self._end_turn_span(message)
         self.loadingStateChanged.emit(False)
+        if self.story_manager:
+            self.story_manager.force_full_refresh()
         self.chatError.emit(message)
+        self._send_next_turn()
 
     @Slot()
     def _on_chat_overload_worker(self):
-        self._chat_in_progress = False
+        if self._is_stale():
+            return
+        self._finish_turn()
+        self._end_turn_span("overloaded")
         self.loadingStateChanged.emit(False)
+        if self.story_manager:
+            self.story_manager.force_full_refresh()
         self.chatOverloaded.emit()
+        self._send_next_turn()
 
 
 # ================== MAIN APP ==================
@@ -470,6 +931,9 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """Ensure running QThread workers are stopped before exit."""
+        self.backend._cancel_turn("app closed")
+        self.backend._set_session_open(False)
+        self.backend._tracer.close()
         for worker in list(self.backend._active_workers):
             if worker is not None and worker.isRunning():
                 worker.quit()
@@ -479,13 +943,41 @@ class MainWindow(QMainWindow):
 
 def main():
     """Application entry point (referenced by pyproject.toml console_scripts)."""
+    profiling = startup.profiling_requested(sys.argv)
+    if profiling and startup.needs_reexec():
+        sys.exit(startup.run_with_import_profile("literaplay.main", sys.argv[1:]))
+
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
+    if config.METRICS_PORT:
+        try:
+            server = metrics.start_http_server(config.METRICS_PORT, config.METRICS_HOST)
+            logging.info("Serving metrics at %s", server.url)
+        except OSError:
+            logging.exception("Could not serve metrics on port %d", config.METRICS_PORT)
+    with _PROFILER.phase("qt_app"):
+        app = QApplication(sys.argv)
+    with _PROFILER.phase("window"):
+        window = MainWindow()
+        window.show()
+    _PROFILER.mark("window_shown")
+    worker = window.backend.start_background_init()
+
+    if profiling:
+        pending = {"page", "background"}
+
+        def _finished(part: str) -> None:
+            pending.discard(part)
+            if not pending:
+                _PROFILER.mark("interactive")
+                print(_PROFILER.report())
+                app.quit()
+
+        window.browser.loadFinished.connect(lambda _ok: (_PROFILER.mark("page_loaded"), _finished("page")))
+        worker.finished.connect(lambda: _finished("background"))
+
     sys.exit(app.exec())
 
 
@@ -0,0 +1,123 @@
+"""Conversation history in a portable form, and in each provider's format.
+
+The portable form is a list of ``{"role": "user" | "assistant", "content":
+str}`` messages, which is what :class:`~literaplay.ai_service.ChatSession`
+already keeps for OpenAI, Anthropic and the REST transport. The Gemini SDK
+keeps its own ``Content`` objects (role ``model``, text in ``parts``).
+
+Converting through the portable form lets a conversation move between
+providers (see :mod:`literaplay.resilience`). Only text survives the trip:
+system messages are dropped (each provider takes the system prompt
+separately), as are thinking blocks. Anthropic tool calls become their JSON
+input, the same text the app stores for them.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from typing import Any
+
+PortableMessage = dict[str, str]
+
+
+def _get(item: Any, name: str, default: Any = None) -> Any:
+    """Field *name* of an SDK object or of its dict form."""
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def _message(role: str, content: str) -> PortableMessage:
+    return {"role": "assistant" if role in ("assistant", "model") else "user", "content": content}
+
+
+# ── OpenAI ───────────────────────────────────────────────────────────
+
+
+def from_openai(messages: Iterable[Any]) -> list[PortableMessage]:
+    result = []
+    for m in messages:
+        role, content = _get(m, "role"), _get(m, "content") or ""
+        if role not in ("user", "assistant"):
+            continue
+        if not isinstance(content, str):  # content parts
+            content = "".join(_get(p, "text") or "" for p in content if _get(p, "type") == "text")
+        result.append(_message(role, content))
+    return result
+
+
+def to_openai(history: Iterable[PortableMessage], system_prompt: str | None = None) -> list[dict[str, str]]:
+    messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    return messages + [dict(m) for m in history]
+
+
+# ── Anthropic ────────────────────────────────────────────────────────
+
+
+def from_anthropic(messages: Iterable[Any]) -> list[PortableMessage]:
+    result = []
+    for m in messages:
+        content = _get(m, "content") or ""
+        if not isinstance(content, str):  # content blocks
+            parts = []
+            for block in content:
+                kind = _get(block, "type")
+                if kind == "text":
+                    parts.append(_get(block, "text") or "")
+                elif kind == "tool_use":
+                    parts.append(json.dumps(_get(block, "input") or {}, ensure_ascii=False))
+            content = "".join(parts)
+        result.append(_message(_get(m, "role"), content))
+    return result
+
+
+def to_anthropic(history: Iterable[PortableMessage]) -> list[dict[str, str]]:
+    """Messages API form: starts with a user turn and alternates, so neighbours with one role are merged."""
+    messages: list[dict[str, str]] = []
+    for m in history:
+        if not messages and m["role"] != "user":
+            continue
+        if messages and messages[-1]["role"] == m["role"]:
+            messages[-1] = {"role": m["role"], "content": f"{messages[-1]['content']}\n\n{m['content']}"}
+        else:
+            messages.append(dict(m))
+    return messages
+
+
+# ── Gemini ───────────────────────────────────────────────────────────
+
+
+def from_gemini(contents: Iterable[Any]) -> list[PortableMessage]:
+    result = []
+    for c in contents:
+        text = "".join(_get(p, "text") or "" for p in _get(c, "parts") or () if not _get(p, "thought"))
+        result.append(_message(_get(c, "role") or "user", text))
+    return result
+
+
+def to_gemini(history: Iterable[PortableMessage]) -> list[dict[str, Any]]:
+    """``contents`` in dict form, accepted by the REST API and by the SDK's ``history``."""
+    return [
+        {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]} for m in history
+    ]
+
+
+_FROM = {"openai": from_openai, "anthropic": from_anthropic, "gemini": from_gemini}
+_TO = {"openai": to_openai, "anthropic": to_anthropic, "gemini": to_gemini}
+
+
+def to_portable(provider: str, messages: Iterable[Any]) -> list[PortableMessage]:
+    """Portable history from *provider*'s message format."""
+    convert = _FROM.get(provider)
+    if convert is None:
+        raise ValueError(f"Unknown provider: {provider}")
+    return convert(messages)
+
+
+def from_portable(provider: str, history: Iterable[PortableMessage]) -> list[dict[str, Any]]:
+    """*provider*'s message format from portable history."""
+    convert = _TO.get(provider)
+    if convert is None:
+        raise ValueError(f"Unknown provider: {provider}")
+    return convert(history)
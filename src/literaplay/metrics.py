@@ -0,0 +1,301 @@
+"""Live operational metrics in the Prometheus text format.
+
+The registry holds counters, gauges and histograms. Hot paths update
+them from the UI thread and from worker threads:
+
+* ``literaplay_turns_total{outcome}`` counts finished turns. ``rate()``
+  of it gives turns per second, and the outcome label shows the share that
+  failed.
+* ``literaplay_request_duration_seconds{provider,model}`` is a histogram
+  of model-call latency, one sample per attempt (hedges included).
+* ``literaplay_request_errors_total{provider,model,kind}`` counts failed
+  calls. ``kind`` is ``overload`` or ``other``.
+* ``literaplay_retries_total{provider}`` counts retries after an overload.
+* ``literaplay_replies_parsed_total{decoder}`` counts replies by decoder.
+  ``decoder="raw"`` means the reply could not be parsed.
+* ``literaplay_location_drift_total`` counts locations that
+  ``validate_story_response`` reverted to the chapter setting.
+* ``literaplay_active_sessions`` and ``literaplay_queue_depth`` are gauges
+  of open chat sessions and queued inputs.
+
+An update takes one short per-series lock, and label lookups after the
+first are a dict read, so instrumentation costs well under a microsecond.
+:func:`start_http_server` serves :meth:`Registry.render` at ``/metrics``
+from a daemon thread. The server only starts when ``LITERAPLAY_METRICS_PORT``
+is set. Nothing beyond the standard library is used.
+"""
+
+from __future__ import annotations
+
+import abc
+import bisect
+import math
+import threading
+from collections.abc import Iterator, Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Generic, TypeVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; model calls take from a few hundred milliseconds to about a minute
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 45.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)) + "}"
+
+
+class _Series:
+    """One labelled time series of a counter or gauge."""
+
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramSeries:
+    __slots__ = ("_lock", "_bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # per bucket, not cumulative; the last is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+_S = TypeVar("_S", _Series, _HistogramSeries)
+
+
+class _Metric(abc.ABC, Generic[_S]):
+    """A named metric; :meth:`labels` returns the series for one set of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple[str, ...], _S] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # an unlabelled metric is exported as 0 before its first update
+
+    @abc.abstractmethod
+    def _new_series(self) -> _S: ...
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterator[tuple[str, str, float]]:
+        """(name, formatted labels, value) for every series."""
+
+    def labels(self, *values: object) -> _S:
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _items(self) -> list[tuple[tuple[str, ...], _S]]:
+        with self._lock:  # a series may be added while a scrape iterates
+            return sorted(self._series.items(), key=lambda item: item[0])
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples()]
+        return "\n".join(lines)
+
+
+class _ValueMetric(_Metric[_Series]):
+    """A metric with one value per series: a counter or a gauge."""
+
+    def _new_series(self) -> _Series:
+        return _Series()
+
+    def _samples(self) -> Iterator[tuple[str, str, float]]:
+        for key, series in self._items():
+            yield self.name, _format_labels(self.labelnames, key), series.value
+
+
+class Counter(_ValueMetric):
+    """A count that only goes up."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled series."""
+        self.labels().inc(amount)
+
+
+class Gauge(_ValueMetric):
+    """A value that goes up and down."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric[_HistogramSeries]):
+    """Observations counted into cumulative ``le`` buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_series(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterator[tuple[str, str, float]]:
+        names = (*self.labelnames, "le")
+        for key, series in self._items():
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(names, (*key, _format_value(bound))), cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class Registry:
+    """The metrics of a process, rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _M) -> _M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        return "".join(metric.render() + "\n" for metric in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+TURNS = REGISTRY.counter("literaplay_turns_total", "Chat turns by outcome.", ("outcome",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "literaplay_request_duration_seconds", "Latency of model calls that succeeded.", ("provider", "model")
+)
+REQUEST_ERRORS = REGISTRY.counter(
+    "literaplay_request_errors_total",
+    "Model calls that failed, by kind (overload or other).",
+    ("provider", "model", "kind"),
+)
+RETRIES = REGISTRY.counter("literaplay_retries_total", "Model calls retried after an overload.", ("provider",))
+REPLIES_PARSED = REGISTRY.counter(
+    "literaplay_replies_parsed_total", "Replies by the decoder that read them (raw: unparseable).", ("decoder",)
+)
+LOCATION_DRIFT = REGISTRY.counter("literaplay_location_drift_total", "Reply locations reverted to the chapter setting.")
+ACTIVE_SESSIONS = REGISTRY.gauge("literaplay_active_sessions", "Open chat sessions.")
+QUEUE_DEPTH = REGISTRY.gauge("literaplay_queue_depth", "User inputs waiting for the turn in flight.")
+
+
+# ── HTTP endpoint ────────────────────────────────────────────────────
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # one line per scrape would drown the app log
+
+
+class MetricsServer:
+    """Serves *registry* at ``http://host:port/metrics`` from a daemon thread; port 0 picks a free one."""
+
+    def __init__(self, registry: Registry = REGISTRY, host: str = "127.0.0.1", port: int = 0) -> None:
+        handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> MetricsServer:
+    """Start serving *registry*; raises OSError when the port is taken."""
+    return MetricsServer(registry, host, port)
@@ -0,0 +1,148 @@
+"""Reasoning effort and thinking budgets per model and turn type.
+
+Reasoning models (OpenAI o-series and gpt-5, Gemini 2.5/3, Claude 4.x) can
+think for seconds before a two-sentence reply. :class:`ReasoningPolicy`
+chooses an effort level for each request from the kind of turn:
+
+* ``turn``: an ordinary exchange inside a chapter (default ``minimal``);
+* ``transition``: the first turn of a chapter, or a turn close enough to
+  the chapter's end that the model must decide whether it is over
+  (default ``medium``).
+
+Levels are ``default`` (send nothing; the provider decides), ``minimal``,
+``low``, ``medium`` and ``high``. The helpers below translate a level into
+each provider's parameters. Models without a reasoning control get none.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+# Sampling used for every story request (reasoning models that reject it get none)
+TEMPERATURE = 0.2
+TOP_P = 0.95
+GEMINI_TOP_K = 40
+ANTHROPIC_MAX_TOKENS = 4096
+
+LEVELS = ("default", "minimal", "low", "medium", "high")
+TURN_TYPES = ("turn", "transition")
+DEFAULT_LEVELS: Mapping[str, str] = {"turn": "minimal", "transition": "medium"}
+
+_OPENAI_REASONING_RE = re.compile(r"^(o\d|gpt-5)")
+_ANTHROPIC_THINKING_RE = re.compile(r"^claude-(3-7|(opus|sonnet|haiku)-4)")
+
+# Gemini 2.5 thinking budgets (tokens); Pro cannot switch thinking off, its floor is 128.
+_GEMINI_BUDGETS = {"minimal": 0, "low": 512, "medium": 2048, "high": 8192}
+_GEMINI_PRO_MIN_BUDGET = 128
+# Claude extended thinking budgets; below "low" thinking stays off (the API minimum is 1024).
+_ANTHROPIC_BUDGETS = {"low": 1024, "medium": 4096, "high": 8192}
+
+
+@dataclass(frozen=True, slots=True)
+class ReasoningPolicy:
+    """Effort level per turn type, with optional per-model overrides."""
+
+    levels: Mapping[str, str] = field(default_factory=lambda: dict(DEFAULT_LEVELS))
+    model_levels: Mapping[tuple[str, str], str] = field(default_factory=dict)
+
+    def level(self, model: str, turn_type: str) -> str:
+        override = self.model_levels.get((model, turn_type))
+        if override is not None:
+            return override
+        return self.levels.get(turn_type, self.levels.get("turn", "default"))
+
+    @classmethod
+    def parse(cls, raw: str) -> ReasoningPolicy:
+        """Parse ``"turn=minimal,transition=medium,o3:turn=low"``; invalid entries are ignored.
+
+        A bare level (``"low"``) applies to every turn type, as does a model
+        without a turn type (``"o3=low"``).
+        """
+        levels = dict(DEFAULT_LEVELS)
+        model_levels: dict[tuple[str, str], str] = {}
+        for entry in raw.split(","):
+            entry = entry.strip().lower()
+            if not entry:
+                continue
+            target, _, level = entry.rpartition("=")
+            if level not in LEVELS:
+                continue
+            model, _, turn_type = target.rpartition(":")
+            if not model and turn_type not in TURN_TYPES:
+                model, turn_type = turn_type, ""  # "o3=low": every turn type of one model
+            turn_types = TURN_TYPES if not turn_type else (turn_type,)
+            if any(t not in TURN_TYPES for t in turn_types):
+                continue
+            for t in turn_types:
+                if model:
+                    model_levels[(model, t)] = level
+                else:
+                    levels[t] = level
+        return cls(levels, model_levels)
+
+
+# ── Provider parameters ──────────────────────────────────────────────
+
+
+def openai_is_reasoning_model(model: str) -> bool:
+    """o-series and gpt-5 models take ``reasoning_effort`` and reject sampling parameters."""
+    return _OPENAI_REASONING_RE.match(model) is not None
+
+
+def openai_options(model: str, level: str) -> dict[str, Any]:
+    """Sampling or ``reasoning_effort`` keyword arguments for a chat completion."""
+    if not openai_is_reasoning_model(model):
+        return {"temperature": TEMPERATURE, "top_p": TOP_P}
+    effort = openai_reasoning_effort(model, level)
+    return {"reasoning_effort": effort} if effort else {}
+
+
+def openai_reasoning_effort(model: str, level: str) -> str | None:
+    """``reasoning_effort`` for *model*, or None to leave it unset."""
+    if level == "default" or not openai_is_reasoning_model(model):
+        return None
+    if level == "minimal" and not model.startswith("gpt-5"):
+        return "low"  # o-series has no "minimal"
+    return level
+
+
+def gemini_thinking(model: str, level: str) -> dict[str, Any] | None:
+    """``ThinkingConfig`` fields (snake_case) for *model*, or None to leave thinking unset."""
+    if level == "default":
+        return None
+    if model.startswith("gemini-3"):
+        return {"thinking_level": "low" if level in ("minimal", "low") else "high"}
+    if model.startswith("gemini-2.5"):
+        budget = _GEMINI_BUDGETS[level]
+        if "pro" in model:
+            budget = max(budget, _GEMINI_PRO_MIN_BUDGET)
+        return {"thinking_budget": budget}
+    return None
+
+
+def anthropic_thinking_budget(model: str, level: str) -> int:
+    """Extended-thinking budget in tokens for *model*; 0 keeps thinking off."""
+    if _ANTHROPIC_THINKING_RE.match(model) is None:
+        return 0
+    return _ANTHROPIC_BUDGETS.get(level, 0)
+
+
+def anthropic_options(model: str, level: str) -> dict[str, Any]:
+    """``max_tokens``, sampling and ``thinking`` keyword arguments for a messages request.
+
+    With thinking on, the budget is added to ``max_tokens`` and temperature
+    is left unset (the API requires its default). Forced tool use is not
+    allowed then either, so callers switch ``tool_choice`` to ``auto`` when
+    ``"thinking"`` is present.
+    """
+    budget = anthropic_thinking_budget(model, level)
+    if not budget:
+        return {"max_tokens": ANTHROPIC_MAX_TOKENS, "temperature": TEMPERATURE, "top_p": TOP_P}
+    return {
+        "max_tokens": ANTHROPIC_MAX_TOKENS + budget,
+        "top_p": TOP_P,
+        "thinking": {"type": "enabled", "budget_tokens": budget},
+    }
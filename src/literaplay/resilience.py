@@ -0,0 +1,248 @@
+"""Hedged requests and cross-provider failover.
+
+For users with keys for two providers. Without this, a slow or overloaded
+provider means waiting: :meth:`AIService.send_message` retries the same
+provider with 5 s and 10 s of backoff before giving up. :class:`HedgedSender`
+instead starts the turn on the primary provider and waits for its first
+token (or, for SDK transports, which do not stream, its reply) until a
+deadline. If none arrives by then, the same turn is sent to the secondary
+provider and whichever reply completes first is used. If the primary fails
+outright, the secondary gets the turn immediately.
+
+The deadline is the primary's observed p95 time to first token, or the
+configured delay until enough turns have been seen. Each attempt runs on a
+fork of the chat session. The winner's turn is then written back to the
+real session, translated through the portable history format
+(:mod:`literaplay.message_formats`) when it came from the other provider.
+The losing attempt is cancelled through its own child of the turn's
+:class:`~literaplay.cancellation.CancelToken`, which aborts its connection
+at once; cancelling the turn cancels both attempts.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from literaplay import tracing
+from literaplay.ai_service import AIService, APIOverloadedError, ChatSession, is_overload_error
+from literaplay.cancellation import CancelToken
+
+# Time-to-first-token samples kept for the p95, and how many are needed before it is used
+DEADLINE_WINDOW = 50
+MIN_DEADLINE_SAMPLES = 20
+
+# google-genai overflows the default thread stack on some platforms (see main._WORKER_STACK_SIZE)
+_ATTEMPT_STACK_SIZE = 4 * 1024 * 1024
+_stack_lock = threading.Lock()
+
+
+@dataclass(eq=False)
+class _Attempt:
+    role: str  # "primary" or "secondary"
+    service: AIService
+    session: ChatSession
+    cancel: CancelToken
+    started: float = field(default_factory=time.perf_counter)
+    streaming: bool = False  # set on the first fragment
+
+
+# Events the attempt threads put on the turn's queue
+@dataclass
+class _Cancelled:
+    pass
+
+
+@dataclass
+class _FirstToken:
+    attempt: _Attempt
+
+
+@dataclass
+class _Done:
+    attempt: _Attempt
+    reply: str
+
+
+@dataclass
+class _Failed:
+    attempt: _Attempt
+    error: Exception
+
+
+_Event = _Cancelled | _FirstToken | _Done | _Failed
+
+
+def _start_thread(target: Callable[[], None], name: str) -> None:
+    with _stack_lock:
+        previous = threading.stack_size(_ATTEMPT_STACK_SIZE)
+        try:
+            threading.Thread(target=target, name=name, daemon=True).start()
+        finally:
+            threading.stack_size(previous)
+
+
+def _p95(samples: list[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class HedgedSender:
+    """Sends turns to *primary*, hedging to and failing over to *secondary*."""
+
+    def __init__(self, primary: AIService, secondary: AIService, delay_s: float) -> None:
+        self.primary = primary
+        self.secondary = secondary
+        self.delay_s = delay_s
+        self._first_token_s: deque[float] = deque(maxlen=DEADLINE_WINDOW)
+        self._lock = threading.Lock()
+
+    def deadline_s(self) -> float:
+        """How long to wait for the primary's first token before hedging."""
+        with self._lock:
+            samples = list(self._first_token_s)
+        if len(samples) < MIN_DEADLINE_SAMPLES:
+            return self.delay_s
+        return _p95(samples)
+
+    def send(
+        self,
+        session: ChatSession,
+        text: str,
+        status_callback: Callable[[str], None] | None = None,
+        turn_type: str = "turn",
+        key_beat: bool | None = None,
+        cancel: CancelToken | None = None,
+    ) -> str:
+        """Send *text* for *session* (a primary-provider session) and return the reply.
+
+        *cancel* bounds the turn as in :meth:`AIService.send_message`.
+        """
+        cancel = cancel or CancelToken()
+        cancel.check()
+        events: queue.Queue[_Event] = queue.Queue()
+        forget = cancel.on_cancel(lambda: events.put(_Cancelled()))
+        try:
+            return self._run(session, text, status_callback, turn_type, key_beat, cancel, events)
+        finally:
+            forget()
+
+    def _run(
+        self,
+        session: ChatSession,
+        text: str,
+        status_callback: Callable[[str], None] | None,
+        turn_type: str,
+        key_beat: bool | None,
+        cancel: CancelToken,
+        events: queue.Queue[_Event],
+    ) -> str:
+        primary = self._start(
+            _Attempt("primary", self.primary, session.fork(), cancel.child()), text, turn_type, key_beat, events
+        )
+        secondary: _Attempt | None = None
+        first_token_seen = False
+        errors: dict[str, Exception] = {}
+
+        wait_s = self.deadline_s()
+        hedge_at = time.perf_counter() + wait_s
+        while True:
+            hedging = secondary is None and not first_token_seen
+            timeout = max(0.0, hedge_at - time.perf_counter()) if hedging else None
+            remaining = cancel.remaining()
+            if remaining is not None:
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            try:
+                event = events.get(timeout=timeout)
+            except queue.Empty:
+                cancel.check()  # the turn's deadline passed
+                logging.warning(
+                    "No reply from %s after %.1fs; hedging to %s", self._names()[0], wait_s, self._names()[1]
+                )
+                secondary = self._start_secondary(session, text, turn_type, key_beat, events, status_callback, cancel)
+                continue
+            if isinstance(event, _Cancelled):
+                raise cancel.error()
+
+            if isinstance(event, _FirstToken):
+                if event.attempt is primary and not first_token_seen:
+                    first_token_seen = True
+                    self._observe(time.perf_counter() - primary.started)
+                continue
+            if isinstance(event, _Done):
+                if event.attempt is primary and not first_token_seen:  # not streamed: the reply was the first token
+                    self._observe(time.perf_counter() - primary.started)
+                self._finish(session, event.attempt, text, event.reply)
+                loser = secondary if event.attempt is primary else primary
+                if loser is not None:
+                    loser.cancel.cancel("hedge lost")
+                return event.reply
+
+            errors[event.attempt.role] = event.error
+            cancel.check()  # the attempt failed because the turn ran out of time
+            if event.attempt is primary and secondary is None:
+                logging.warning("%s failed (%s); failing over to %s", self._names()[0], event.error, self._names()[1])
+                secondary = self._start_secondary(session, text, turn_type, key_beat, events, status_callback, cancel)
+            elif len(errors) == 2:
+                break
+
+        primary_error = errors["primary"]
+        if any(is_overload_error(e) for e in errors.values()):
+            raise APIOverloadedError("Моделът е претоварен. Опитайте отново след малко.") from primary_error
+        raise primary_error
+
+    def _names(self) -> tuple[str, str]:
+        return self.primary.provider, self.secondary.provider
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._first_token_s.append(seconds)
+
+    def _start_secondary(self, session, text, turn_type, key_beat, events, status_callback, cancel) -> _Attempt:
+        if status_callback:
+            status_callback(f"Пренасочване към {self.secondary.provider}...")
+        fork = self.secondary.create_chat_from(session)
+        return self._start(
+            _Attempt("secondary", self.secondary, fork, cancel.child()), text, turn_type, key_beat, events
+        )
+
+    @staticmethod
+    def _start(
+        attempt: _Attempt, text: str, turn_type: str, key_beat: bool | None, events: queue.Queue[_Event]
+    ) -> _Attempt:
+        def on_delta(_fragment: str) -> None:
+            if not attempt.streaming:
+                attempt.streaming = True
+                events.put(_FirstToken(attempt))
+
+        parent = tracing.current_span()
+
+        def run() -> None:
+            model = attempt.service.route(turn_type, key_beat)
+            try:
+                with tracing.use(parent), tracing.span(f"hedge.{attempt.role}", provider=attempt.service.provider):
+                    reply = attempt.session.send_message(
+                        text, on_delta, turn_type=turn_type, model=model, cancel=attempt.cancel
+                    )
+            except Exception as exc:
+                events.put(_Failed(attempt, exc))
+                return
+            if model is not None and attempt.session.last_call is not None:
+                attempt.service.router.observe(model, attempt.session.last_call.latency_ms, turn_type)
+            events.put(_Done(attempt, reply))
+
+        _start_thread(run, f"hedge-{attempt.role}")
+        return attempt
+
+    def _finish(self, session: ChatSession, winner: _Attempt, text: str, reply: str) -> None:
+        if winner.role == "primary":
+            session.adopt(winner.session)
+            return
+        logging.info("Turn answered by %s", self.secondary.provider)
+        session.record_exchange(text, reply)
+        session.last_call = winner.session.last_call
@@ -3,6 +3,11 @@ import logging
 import re
 from typing import Any
 
+from literaplay import metrics
+from literaplay.fast_json import StoryResponse
+from literaplay.json_stream import parse_first_object
+from literaplay.knowledge_guard import LeakDetector, mask_leaks
+from literaplay.response_schema import OPTIONAL_FIELDS, schema_errors
 from literaplay.story_state import ChapterDef, StoryState
 
 _log = logging.getLogger(__name__)
@@ -22,7 +27,8 @@ def parse_ai_json_response(response_text: str) -> dict[str, Any] | None:
     """Parse an AI response expected to contain a JSON object.
 
     The function supports plain JSON, fenced code blocks, and extracting the
-    first JSON object embedded inside free-form text.
+    first JSON object embedded inside free-form text. For chunked input use
+    :class:`~literaplay.json_stream.StreamingJSONParser` directly.
     """
     if not response_text:
         return None
@@ -36,21 +42,8 @@ def parse_ai_json_response(response_text: str) -> dict[str, Any] | None:
     if isinstance(parsed, dict):
         return parsed
 
-    # Try to extract the first balanced JSON object from the text
-    start = response_text.find("{")
-    if start == -1:
-        return None
-    depth = 0
-    for i in range(start, len(response_text)):
-        ch = response_text[i]
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                parsed = _try_parse(response_text[start : i + 1])
-                return parsed if isinstance(parsed, dict) else None
-    return None
+    # Extract the first balanced JSON object, ignoring braces inside strings
+    return parse_first_object(response_text)
 
 
 def _strip_markdown_fence(text: str) -> str:
@@ -83,24 +76,47 @@ _FALLBACK_OPTIONS = [
 
 
 def validate_story_response(
-    data: dict,
+    data: dict | StoryResponse,
     state: StoryState | None = None,
     chapter: ChapterDef | None = None,
     is_last_chapter: bool = True,
+    leak_detector: LeakDetector | None = None,
+    leak_policy: str = "flag",
 ) -> dict:
     """Sanitize / validate AI response against current story state.
 
+    When *leak_detector* is given, reply and option texts are scanned for
+    future-chapter knowledge. Leaked terms are listed under
+    ``_knowledge_leaks``; with ``leak_policy="repair"`` they are also masked.
+
+    Field types are checked against ``STORY_RESPONSE_SCHEMA``: optional
+    fields that do not match are dropped, ``None`` values (how strict-mode
+    providers send omitted fields) are removed. A :class:`StoryResponse` from
+    the typed fast path has been type-checked while decoding and skips that.
+
     Returns a *new* dict with corrected values.
     """
-    result = dict(data)  # shallow copy
+    # --- schema ---
+    if isinstance(data, StoryResponse):
+        result = data.to_dict()
+        trust = data.trust_level
+        errors = {} if trust is None or -3 <= trust <= 3 else {"trust_level": "invalid"}
+    else:
+        result = dict(data)  # shallow copy
+        errors = schema_errors(result)
+    for key in OPTIONAL_FIELDS:
+        if key in errors or (key in result and result[key] is None):
+            del result[key]
 
     # --- reply ---
     reply = result.get("reply")
     if isinstance(reply, list):
-        if not reply:
-            result["reply"] = [{"character": "System", "text": "..."}]
+        if "reply" in errors:
+            # Keep items that still carry text; a missing speaker falls back to the main character
+            reply = [item for item in reply if isinstance(item, dict) and isinstance(item.get("text"), str)]
+        result["reply"] = reply or [{"character": "System", "text": "..."}]
     else:
-        reply = reply or ""
+        reply = reply if isinstance(reply, str) else ""
         if not reply.strip():
             reply = "..."
         if len(reply) > _MAX_REPLY_CHARS:
@@ -108,7 +124,8 @@ def validate_story_response(
         result["reply"] = reply
 
     # --- ended ---
-    ended = result.get("ended", False)
+    ended = result.get("ended") is True
+    result["ended"] = ended
     if ended and not is_last_chapter:
         # AI signalled end, but there are more chapters → chapter-end, not story-end
         result["ended"] = False
@@ -120,14 +137,21 @@ def validate_story_response(
     options = result.get("options")
     if not isinstance(options, list):
         options = []
+    elif "options" in errors:
+        options = [o for o in options if isinstance(o, str)]
     if not result.get("ended") and not result.get("_chapter_ended") and len(options) == 0:
         options = list(_FALLBACK_OPTIONS)
     result["options"] = options
 
+    # --- knowledge leaks ---
+    if leak_detector is not None and len(leak_detector):
+        _check_knowledge_leaks(result, leak_detector, repair=leak_policy == "repair")
+
     # --- location drift ---
     if chapter is not None and "location" in result:
         ai_location = result["location"]
-        if isinstance(ai_location, str):
+        # An empty location is what the non-typed decode paths fill in when the model gave none
+        if isinstance(ai_location, str) and ai_location.strip():
             # Extract tokens longer than 2 chars, then compare by _STEM_PREFIX_LEN-char prefix
             # to handle Bulgarian inflections (e.g. "Оборът" vs "обора" both share "обор").
             def _stem_set(text: str) -> set[str]:
@@ -136,6 +160,7 @@ def validate_story_response(
             setting_stems = _stem_set(chapter.setting)
             location_stems = _stem_set(ai_location)
             if not setting_stems.intersection(location_stems):
+                metrics.LOCATION_DRIFT.inc()
                 _log.warning(
                     "Location drift detected: AI returned %r but chapter setting is %r — reverting.",
                     ai_location,
@@ -145,35 +170,45 @@ def validate_story_response(
 
     # --- key_event dedup and cap ---
     if "key_event" in result:
-        event = result["key_event"]
-        if isinstance(event, str):
-            event = event[:_MAX_KEY_EVENT_CHARS]
-            result["key_event"] = event
-            if state is not None and event in state.key_events:
-                del result["key_event"]
-        else:
+        event = result["key_event"][:_MAX_KEY_EVENT_CHARS]
+        result["key_event"] = event
+        if state is not None and state.has_key_event(event):
             del result["key_event"]
 
-    # --- characters_present ---
+    # --- list caps (types already checked against the schema) ---
     if "characters_present" in result:
-        cp = result["characters_present"]
-        if not isinstance(cp, list) or not all(isinstance(x, str) for x in cp):
-            del result["characters_present"]
-        else:
-            result["characters_present"] = cp[:_MAX_CHARACTERS_PRESENT]
-
-    # --- trust_level ---
-    if "trust_level" in result:
-        tl = result["trust_level"]
-        if not isinstance(tl, int) or not (-3 <= tl <= 3):
-            del result["trust_level"]
-
-    # --- active_props ---
+        result["characters_present"] = result["characters_present"][:_MAX_CHARACTERS_PRESENT]
     if "active_props" in result:
-        ap = result["active_props"]
-        if not isinstance(ap, list) or not all(isinstance(x, str) for x in ap):
-            del result["active_props"]
-        else:
-            result["active_props"] = [p[:_MAX_PROP_CHARS] for p in ap][:_MAX_ACTIVE_PROPS]
+        result["active_props"] = [p[:_MAX_PROP_CHARS] for p in result["active_props"]][:_MAX_ACTIVE_PROPS]
 
     return result
+
+
+def _check_knowledge_leaks(result: dict, detector: LeakDetector, repair: bool) -> None:
+    """Scan reply/options in *result* for future-chapter terms; flag and optionally mask them."""
+    found: set[str] = set()
+
+    def _scan(text: str) -> str:
+        leaks = detector.scan(text)
+        if not leaks:
+            return text
+        found.update(leak.term for leak in leaks)
+        return mask_leaks(text, leaks) if repair else text
+
+    reply = result["reply"]
+    if isinstance(reply, list):
+        new_reply = []
+        for item in reply:
+            if isinstance(item, dict) and isinstance(item.get("text"), str):
+                text = _scan(item["text"])
+                if text is not item["text"]:
+                    item = {**item, "text": text}
+            new_reply.append(item)
+        result["reply"] = new_reply
+    else:
+        result["reply"] = _scan(reply)
+    result["options"] = [_scan(o) if isinstance(o, str) else o for o in result["options"]]
+
+    if found:
+        result["_knowledge_leaks"] = sorted(found)
+        _log.warning("Future-chapter knowledge in reply: %s%s", ", ".join(sorted(found)), " (masked)" if repair else "")
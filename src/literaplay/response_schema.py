@@ -0,0 +1,172 @@
+"""The story response schema and its per-provider renderings.
+
+:data:`STORY_RESPONSE_SCHEMA` is the single definition of the JSON the model
+must return (the shape described in ``COMMON_RULES`` and
+``STRICT_SYSTEM_INSTRUCTION``). From it this module derives:
+
+* the OpenAI ``response_format`` for ``json_schema`` strict mode, where every
+  property must be required, so optional keys become nullable;
+* the Gemini ``response_schema`` (OpenAPI subset, with property ordering so
+  ``reply`` is generated first);
+* the Anthropic tool whose forced use makes the model emit the object as
+  tool input;
+* a validator compiled once, used by ``validate_story_response`` to find the
+  top-level fields that do not match.
+"""
+
+from __future__ import annotations
+
+import copy
+from collections.abc import Callable
+from typing import Any
+
+TOOL_NAME = "story_response"
+
+_REPLY_ITEM_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "character": {"type": "string", "description": 'Speaker, or "Разказвач" for narration.'},
+        "text": {"type": "string", "description": "Spoken line or action, in Bulgarian."},
+    },
+    "required": ["character", "text"],
+    "additionalProperties": False,
+}
+
+STORY_RESPONSE_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "reply": {"type": "array", "items": _REPLY_ITEM_SCHEMA, "minItems": 1},
+        "options": {"type": "array", "items": {"type": "string"}, "maxItems": 4},
+        "ended": {"type": "boolean"},
+        "mood": {"type": "string"},
+        "location": {"type": "string"},
+        "key_event": {"type": "string"},
+        "trust_level": {"type": "integer", "minimum": -3, "maximum": 3},
+        "tension": {"type": "string"},
+        "characters_present": {"type": "array", "items": {"type": "string"}},
+        "active_props": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["reply", "options", "ended"],
+    "additionalProperties": False,
+}
+
+REQUIRED_FIELDS: tuple[str, ...] = tuple(STORY_RESPONSE_SCHEMA["required"])
+OPTIONAL_FIELDS: tuple[str, ...] = tuple(k for k in STORY_RESPONSE_SCHEMA["properties"] if k not in REQUIRED_FIELDS)
+
+# Keywords OpenAI strict mode does not accept
+_OPENAI_UNSUPPORTED = frozenset({"minItems", "maxItems", "minimum", "maximum"})
+
+
+def _without(schema: Any, keywords: frozenset[str]) -> Any:
+    if isinstance(schema, dict):
+        return {k: _without(v, keywords) for k, v in schema.items() if k not in keywords}
+    if isinstance(schema, list):
+        return [_without(v, keywords) for v in schema]
+    return schema
+
+
+# ── Provider renderings ──────────────────────────────────────────────
+
+
+def openai_response_format() -> dict[str, Any]:
+    """``response_format`` for OpenAI chat completions in strict json_schema mode."""
+    schema = _without(STORY_RESPONSE_SCHEMA, _OPENAI_UNSUPPORTED)
+    for name in OPTIONAL_FIELDS:
+        prop = schema["properties"][name]
+        prop["type"] = [prop["type"], "null"]
+    schema["required"] = list(schema["properties"])
+    return {"type": "json_schema", "json_schema": {"name": TOOL_NAME, "strict": True, "schema": schema}}
+
+
+def gemini_response_schema() -> dict[str, Any]:
+    """``response_schema`` for Gemini ``GenerateContentConfig``."""
+    schema = _without(STORY_RESPONSE_SCHEMA, frozenset({"additionalProperties"}))
+    schema["propertyOrdering"] = list(schema["properties"])
+    schema["properties"]["reply"]["items"]["propertyOrdering"] = ["character", "text"]
+    return schema
+
+
+def anthropic_tool() -> dict[str, Any]:
+    """Tool definition whose input is the story response (use with :func:`anthropic_tool_choice`)."""
+    return {
+        "name": TOOL_NAME,
+        "description": "Return this turn of the story. Always call this tool exactly once.",
+        "input_schema": copy.deepcopy(STORY_RESPONSE_SCHEMA),
+    }
+
+
+def anthropic_tool_choice() -> dict[str, str]:
+    return {"type": "tool", "name": TOOL_NAME}
+
+
+# ── Validation ───────────────────────────────────────────────────────
+
+_Check = Callable[[Any], bool]
+
+_PY_TYPES: dict[str, type | tuple[type, ...]] = {
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+    "array": list,
+    "object": dict,
+}
+
+
+def _compile(schema: dict[str, Any]) -> _Check:
+    """Compile *schema* into a predicate. Length limits are not enforced; callers truncate."""
+    kind = schema["type"]
+    py_type = _PY_TYPES[kind]
+
+    if kind == "array":
+        item_schema = schema.get("items")
+        if item_schema is None:
+            return lambda v: isinstance(v, list)
+        if item_schema["type"] in ("string", "boolean") and "properties" not in item_schema:
+            item_type = _PY_TYPES[item_schema["type"]]
+            return lambda v: isinstance(v, list) and all(isinstance(x, item_type) for x in v)
+        item_check = _compile(item_schema)
+        return lambda v: isinstance(v, list) and all(item_check(x) for x in v)
+
+    if kind == "object":
+        props = [(k, _compile(s)) for k, s in schema.get("properties", {}).items()]
+        required = tuple(schema.get("required", ()))
+
+        def check_object(v: Any) -> bool:
+            if not isinstance(v, dict):
+                return False
+            for k in required:
+                if k not in v:
+                    return False
+            return all(check(v[k]) for k, check in props if k in v)
+
+        return check_object
+
+    if kind in ("integer", "number"):
+        low = schema.get("minimum", float("-inf"))
+        high = schema.get("maximum", float("inf"))
+        return lambda v: isinstance(v, py_type) and not isinstance(v, bool) and low <= v <= high
+
+    return lambda v: isinstance(v, py_type)
+
+
+_FIELDS: list[tuple[str, _Check, bool]] = [
+    (k, _compile(s), k in REQUIRED_FIELDS) for k, s in STORY_RESPONSE_SCHEMA["properties"].items()
+]
+
+
+def schema_errors(data: dict) -> dict[str, str]:
+    """Return ``{field: reason}`` for schema fields of *data* that are missing or mistyped.
+
+    Keys not in the schema are ignored. ``None`` counts as missing, which is
+    how strict-mode providers send an omitted optional field.
+    """
+    errors: dict[str, str] = {}
+    for name, check, required in _FIELDS:
+        value = data.get(name)
+        if value is None:
+            if required:
+                errors[name] = "missing"
+        elif not check(value):
+            errors[name] = "invalid"
+    return errors
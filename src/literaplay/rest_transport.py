@@ -0,0 +1,383 @@
+"""Lightweight REST transport for the three providers.
+
+The app uses a small slice of each SDK: OpenAI chat completions, Anthropic
+messages and Gemini ``generateContent``. :class:`RestClient` calls those
+endpoints directly over one pooled ``httpx`` client shared by all sessions,
+streaming each reply as server-sent events. It avoids importing
+``google-genai``/``openai``/``anthropic``, along with their memory and the
+large worker stack ``google-genai`` needs.
+
+Select it per provider with ``LITERAPLAY_TRANSPORT`` (``rest``). The SDK
+remains the default; SDK clients built on ``httpx`` are given the same pooled
+client, so :mod:`literaplay.cancellation` can abort their requests too. The pooled client
+honours ``HTTP(S)_PROXY``/``ALL_PROXY``/``NO_PROXY`` like a default ``httpx`` one. History is kept
+by the caller as portable ``{"role": "user" | "assistant", "content": str}``
+messages.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import ipaddress
+import json
+import socket
+import threading
+import urllib.request
+from collections.abc import Callable, Iterator
+from types import ModuleType
+from typing import Any
+
+import httpcore
+import httpx
+
+from literaplay.cancellation import active_streams, current_token
+from literaplay.message_formats import to_gemini
+from literaplay.reasoning import GEMINI_TOP_K, TEMPERATURE, TOP_P, anthropic_options, gemini_thinking, openai_options
+from literaplay.response_schema import (
+    anthropic_tool,
+    anthropic_tool_choice,
+    gemini_response_schema,
+    openai_response_format,
+)
+from literaplay.usage import TokenUsage, read_usage
+
+OPENAI_URL = "https://api.openai.com/v1"
+ANTHROPIC_URL = "https://api.anthropic.com/v1"
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta"
+ANTHROPIC_VERSION = "2023-06-01"
+
+_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+_LIMITS = httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=60.0)
+
+# ── Cancellable connections (see literaplay.cancellation) ────────────
+
+
+class _TrackedStream(httpcore.NetworkStream):
+    """Wraps a connection's stream to make blocking I/O on it abortable from another thread."""
+
+    def __init__(self, inner: httpcore.NetworkStream) -> None:
+        self._inner = inner
+
+    @contextlib.contextmanager
+    def _io(self, timeout: float | None, error: type[Exception]) -> Iterator[float | None]:
+        ident = threading.get_ident()
+        active_streams[ident] = self  # registered before the check: cancel() either sees it or we see the flag
+        try:
+            token = current_token()
+            if token is not None:
+                if token.cancelled:
+                    raise error(token.reason or "cancelled")
+                remaining = token.remaining()
+                if remaining is not None:
+                    if remaining <= 0:
+                        raise httpcore.ReadTimeout("turn deadline exceeded")
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+            yield timeout
+        finally:
+            active_streams.pop(ident, None)
+
+    def read(self, max_bytes: int, timeout: float | None = None) -> bytes:
+        with self._io(timeout, httpcore.ReadError) as timeout:
+            return self._inner.read(max_bytes, timeout)
+
+    def write(self, buffer: bytes, timeout: float | None = None) -> None:
+        with self._io(timeout, httpcore.WriteError) as timeout:
+            self._inner.write(buffer, timeout)
+
+    def close(self) -> None:
+        self._inner.close()
+
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None) -> httpcore.NetworkStream:
+        with self._io(timeout, httpcore.ConnectError) as timeout:
+            return _TrackedStream(self._inner.start_tls(ssl_context, server_hostname, timeout))
+
+    def get_extra_info(self, info: str) -> Any:
+        return self._inner.get_extra_info(info)
+
+    def abort(self) -> None:
+        """Shut the socket down, waking a thread blocked on it."""
+        sock = self._inner.get_extra_info("socket")
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+
+
+class _TrackingBackend(httpcore.NetworkBackend):
+    def __init__(self) -> None:
+        self._backend = httpcore.SyncBackend()
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        token = current_token()
+        if token is not None:
+            token.check()
+        return _TrackedStream(self._backend.connect_tcp(host, port, timeout, local_address, socket_options))
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return _TrackedStream(self._backend.connect_unix_socket(path, timeout, socket_options))
+
+    def sleep(self, seconds: float) -> None:
+        self._backend.sleep(seconds)
+
+
+class CancellableTransport(httpx.HTTPTransport):
+    """``httpx`` transport whose connections a :class:`~literaplay.cancellation.CancelToken` can abort.
+
+    Takes the same arguments as :class:`httpx.HTTPTransport`, so proxy, TLS,
+    HTTP/2 and retry settings are kept; only the network backend changes.
+    """
+
+    def __init__(self, limits: httpx.Limits = _LIMITS, **kwargs: Any) -> None:
+        super().__init__(limits=limits, **kwargs)
+        # httpx has no public hook for the network backend. Every httpcore pool (direct,
+        # HTTP proxy or SOCKS proxy) opens its connections through ``_network_backend``.
+        self._pool._network_backend = _TrackingBackend()
+
+
+def environment_proxies() -> dict[str, str | None]:
+    """The proxy mounts ``httpx`` would read from ``HTTP(S)_PROXY``/``ALL_PROXY``/``NO_PROXY``.
+
+    Keys are ``httpx`` URL patterns; ``None`` marks hosts that bypass the proxy.
+    An explicit transport turns httpx's own lookup off, hence this copy of it.
+    """
+    proxies = urllib.request.getproxies()
+    mounts: dict[str, str | None] = {}
+    for scheme in ("http", "https", "all"):
+        url = proxies.get(scheme)
+        if url:
+            mounts[f"{scheme}://"] = url if "://" in url else f"http://{url}"
+    for host in (h.strip() for h in proxies.get("no", "").split(",")):
+        if host == "*":
+            return {}
+        if not host:
+            continue
+        if "://" in host:
+            mounts[host] = None
+        elif _is_ip(host) or host.lower() == "localhost":
+            mounts[f"all://[{host}]" if ":" in host else f"all://{host}"] = None
+        else:
+            mounts[f"all://*{host}"] = None
+    return mounts
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+_shared_client: httpx.Client | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_http_client() -> httpx.Client:
+    """The process-wide pooled HTTP client (created on first use), honouring proxy variables."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None or _shared_client.is_closed:
+            mounts: dict[str, httpx.BaseTransport | None] = {
+                pattern: None if url is None else CancellableTransport(proxy=httpx.Proxy(url))
+                for pattern, url in environment_proxies().items()
+            }
+            _shared_client = httpx.Client(timeout=_TIMEOUT, transport=CancellableTransport(), mounts=mounts)
+        return _shared_client
+
+
+def sdk_http_client(sdk: ModuleType) -> Any:
+    """:func:`shared_http_client` for an SDK built on ``httpx``, else None (the SDK makes its own).
+
+    Newer ``openai``/``anthropic`` releases moved to ``httpx2`` and reject an
+    ``httpx.Client``; their requests are then not abortable mid-flight.
+    """
+    if getattr(getattr(sdk, "_base_client", None), "httpx", None) is not httpx:
+        return None
+    return shared_http_client()
+
+
+class RestAPIError(Exception):
+    """Non-2xx response. The status code leads the message so retry logic can spot 429/503."""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+def iter_sse_data(lines: Iterator[str]) -> Iterator[str]:
+    """Yield the ``data`` payload of each server-sent event in *lines*."""
+    data: list[str] = []
+    for line in lines:
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+    if data:
+        yield "\n".join(data)
+
+
+def _gemini_schema(schema: Any) -> Any:
+    """The REST API spells schema types in upper case ("OBJECT"); the SDK converts them itself."""
+    if isinstance(schema, dict):
+        return {k: (v.upper() if k == "type" else _gemini_schema(v)) for k, v in schema.items()}
+    if isinstance(schema, list):
+        return [_gemini_schema(v) for v in schema]
+    return schema
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(w.title() for w in rest)
+
+
+class RestClient:
+    """Provider client over plain HTTPS; see :meth:`complete`."""
+
+    def __init__(self, provider: str, api_key: str, http_client: httpx.Client | None = None) -> None:
+        if provider not in ("gemini", "openai", "anthropic"):
+            raise ValueError(f"Unknown provider: {provider}")
+        self.provider = provider
+        self.api_key = api_key
+        self._http = http_client
+
+    @property
+    def http(self) -> httpx.Client:
+        return self._http if self._http is not None else shared_http_client()
+
+    def complete(
+        self,
+        model: str,
+        system_prompt: str,
+        history: list[dict[str, str]],
+        structured_output: str = "schema",
+        on_delta: Callable[[str], None] | None = None,
+        reasoning_level: str = "default",
+        timeout: float | None = None,
+        usage: TokenUsage | None = None,
+    ) -> str:
+        """Stream the reply to *history* and return its full text.
+
+        *on_delta* receives each text fragment as it arrives. For Anthropic
+        with ``structured_output="schema"`` the text is the JSON input of
+        the ``story_response`` tool call. *reasoning_level* is translated as
+        in :mod:`literaplay.reasoning`. *timeout* (seconds) bounds each
+        network wait, e.g. to the time left before the turn's deadline.
+        *usage*, if given, receives the token counts the stream reports.
+        """
+        build = getattr(self, f"_{self.provider}_request")
+        read = getattr(self, f"_{self.provider}_deltas")
+        url, headers, body = build(model, system_prompt, history, structured_output, reasoning_level)
+        parts: list[str] = []
+        request_timeout = _TIMEOUT if timeout is None else httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        with self.http.stream("POST", url, headers=headers, json=body, timeout=request_timeout) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise RestAPIError(response.status_code, response.text[:500])
+            for data in iter_sse_data(response.iter_lines()):
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                if usage is not None:
+                    usage.update(read_usage(self.provider, event))
+                for delta in read(event):
+                    parts.append(delta)
+                    if on_delta is not None:
+                        on_delta(delta)
+        return "".join(parts)
+
+    def list_models(self) -> list[str]:
+        """Return the model ids the key can use (one cheap authenticated call)."""
+        if self.provider == "openai":
+            url, headers, key = f"{OPENAI_URL}/models", {"Authorization": f"Bearer {self.api_key}"}, "id"
+        elif self.provider == "anthropic":
+            url, headers, key = f"{ANTHROPIC_URL}/models", self._anthropic_headers(), "id"
+        else:
+            url, headers, key = f"{GEMINI_URL}/models", {"x-goog-api-key": self.api_key}, "name"
+        response = self.http.get(url, headers=headers)
+        if response.status_code >= 400:
+            raise RestAPIError(response.status_code, response.text[:500])
+        payload = response.json()
+        return [m.get(key, "") for m in payload.get("data", payload.get("models", []))]
+
+    # ── OpenAI ───────────────────────────────────────────────────────
+
+    def _openai_request(self, model, system_prompt, history, structured_output, level):
+        body = {
+            "model": model,
+            "messages": [{"role": "system", "content": system_prompt}, *history],
+            "response_format": openai_response_format() if structured_output == "schema" else {"type": "json_object"},
+            "stream": True,
+            "stream_options": {"include_usage": True},  # token counts arrive in a final chunk
+            **openai_options(model, level),
+        }
+        return f"{OPENAI_URL}/chat/completions", {"Authorization": f"Bearer {self.api_key}"}, body
+
+    @staticmethod
+    def _openai_deltas(event: dict) -> Iterator[str]:
+        for choice in event.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+    # ── Anthropic ────────────────────────────────────────────────────
+
+    def _anthropic_headers(self) -> dict[str, str]:
+        return {"x-api-key": self.api_key, "anthropic-version": ANTHROPIC_VERSION}
+
+    def _anthropic_request(self, model, system_prompt, history, structured_output, level):
+        body: dict[str, Any] = {
+            "model": model,
+            "system": system_prompt,
+            "messages": history,
+            "stream": True,
+            **anthropic_options(model, level),
+        }
+        if structured_output == "schema":
+            body["tools"] = [anthropic_tool()]
+            # Extended thinking cannot be combined with a forced tool call
+            body["tool_choice"] = {"type": "auto"} if "thinking" in body else anthropic_tool_choice()
+        return f"{ANTHROPIC_URL}/messages", self._anthropic_headers(), body
+
+    @staticmethod
+    def _anthropic_deltas(event: dict) -> Iterator[str]:
+        if event.get("type") == "error":
+            error = event.get("error") or {}
+            status = 529 if error.get("type") == "overloaded_error" else 500
+            raise RestAPIError(status, error.get("message", "stream error"))
+        if event.get("type") != "content_block_delta":
+            return
+        delta = event.get("delta") or {}
+        text = delta.get("text") if delta.get("type") == "text_delta" else delta.get("partial_json")
+        if text:
+            yield text
+
+    # ── Gemini ───────────────────────────────────────────────────────
+
+    def _gemini_request(self, model, system_prompt, history, structured_output, level):
+        generation: dict[str, Any] = {
+            "temperature": TEMPERATURE,
+            "topP": TOP_P,
+            "topK": GEMINI_TOP_K,
+            "responseMimeType": "application/json",
+        }
+        if structured_output == "schema":
+            generation["responseSchema"] = _gemini_schema(gemini_response_schema())
+        thinking = gemini_thinking(model, level)
+        if thinking:
+            generation["thinkingConfig"] = {_camel(k): v for k, v in thinking.items()}
+        body = {
+            "systemInstruction": {"parts": [{"text": system_prompt}]},
+            "contents": to_gemini(history),
+            "generationConfig": generation,
+        }
+        url = f"{GEMINI_URL}/models/{model}:streamGenerateContent?alt=sse"
+        return url, {"x-goog-api-key": self.api_key}, body
+
+    @staticmethod
+    def _gemini_deltas(event: dict) -> Iterator[str]:
+        for candidate in event.get("candidates", [])[:1]:
+            for part in (candidate.get("content") or {}).get("parts", []):
+                text = part.get("text")
+                if text and not part.get("thought"):
+                    yield text
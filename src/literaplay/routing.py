@@ -0,0 +1,88 @@
+"""Per-turn routing between a fast and a strong model of one provider.
+
+Most turns are routine dialogue that a small model handles well; a few
+carry the story: a chapter's opening, the turns close to its end condition
+and the whole last chapter. :class:`ModelRouter` sends routine turns to the
+provider's fast model and those key beats to the model the user chose.
+
+Latency feeds back into the choice: if the fast model's recent median on
+ordinary turns is no better than the strong model's, routine turns go to
+the strong model too. Latencies are kept per turn type, since transitions
+are slower by design (more reasoning, see :mod:`literaplay.reasoning`);
+key beats of an ordinary turn type count for the strong model. Every
+:data:`PROBE_EVERY`-th routine turn goes to the model not currently
+preferred, so both medians stay current and a switch can be undone, and
+samples older than :data:`LATENCY_MAX_AGE_S` are dropped.
+A routine turn that hits an overload is retried on the strong model. Both
+models belong to the same provider, so the chat history stays valid
+whichever one answers.
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+# Recent latencies kept per model, and how many are needed before they count
+LATENCY_WINDOW = 20
+MIN_LATENCY_SAMPLES = 3
+LATENCY_MAX_AGE_S = 900.0
+# Every Nth routine turn samples the model that is not currently preferred
+PROBE_EVERY = 5
+
+
+class ModelRouter:
+    """Chooses the model for each turn; thread-safe, shared by a service's sessions."""
+
+    def __init__(
+        self,
+        strong_model: str,
+        fast_model: str | None = None,
+        window: int = LATENCY_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.strong_model = strong_model
+        self.fast_model = fast_model if fast_model and fast_model != strong_model else None
+        self._window = window
+        self._clock = clock
+        self._latencies: dict[tuple[str, str], deque[tuple[float, float]]] = {}  # (observed at, ms)
+        self._routine_turns = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.fast_model is not None
+
+    def choose(self, key_beat: bool) -> str:
+        """The model for the next turn; *key_beat* always gets the strong model."""
+        if key_beat or self.fast_model is None:
+            return self.strong_model
+        fast, strong = self.median_latency(self.fast_model), self.median_latency(self.strong_model)
+        preferred, other = self.fast_model, self.strong_model
+        if fast is not None and strong is not None and fast >= strong:
+            preferred, other = other, preferred
+        with self._lock:
+            self._routine_turns += 1
+            probe = self._routine_turns % PROBE_EVERY == 0
+        return other if probe else preferred
+
+    def fallback(self, model: str) -> str:
+        """The model to retry on after *model* was overloaded."""
+        return self.strong_model if model == self.fast_model else model
+
+    def observe(self, model: str, latency_ms: float, turn_type: str = "turn") -> None:
+        with self._lock:
+            samples = self._latencies.setdefault((model, turn_type), deque(maxlen=self._window))
+            samples.append((self._clock(), latency_ms))
+
+    def median_latency(self, model: str, turn_type: str = "turn") -> float | None:
+        """Median of *model*'s recent latencies on *turn_type* turns, or None until there are enough."""
+        oldest = self._clock() - LATENCY_MAX_AGE_S
+        with self._lock:
+            samples = [ms for at, ms in self._latencies.get((model, turn_type), ()) if at >= oldest]
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return statistics.median(samples)
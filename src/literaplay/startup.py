@@ -0,0 +1,193 @@
+"""Startup phase timing, deferred initialization and ``--profile-startup``.
+
+The window is shown before the slow parts of startup run: loading the
+library and book texts, importing the provider SDK and creating its client
+happen in background phases (see ``StartupWorker`` in ``main``), each
+wrapped in a :class:`Deferred` so code that needs the value before its
+phase finishes simply waits for it.
+
+``literaplay --profile-startup`` re-runs the app under ``python -X
+importtime``, quits once it is interactive, and prints the phase timings
+recorded by :class:`StartupProfiler` followed by the slowest imports.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generic, TypeVar
+
+PROFILE_FLAG = "--profile-startup"
+
+_T = TypeVar("_T")
+
+# Reference point for all timings: as early as the app can take one
+_T0 = time.perf_counter()
+
+
+@dataclass(frozen=True, slots=True)
+class PhaseTiming:
+    name: str
+    start_ms: float  # since startup began
+    duration_ms: float
+    thread: str
+
+
+class StartupProfiler:
+    """Records how long each startup phase takes and when milestones are reached."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter, t0: float | None = None) -> None:
+        self._clock = clock
+        self._t0 = _T0 if t0 is None else t0
+        self._lock = threading.Lock()
+        self.phases: list[PhaseTiming] = []
+        self.marks: dict[str, float] = {}
+
+    def _ms(self, t: float) -> float:
+        return (t - self._t0) * 1000
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = self._clock()
+        try:
+            yield
+        finally:
+            end = self._clock()
+            timing = PhaseTiming(name, self._ms(start), (end - start) * 1000, threading.current_thread().name)
+            with self._lock:
+                self.phases.append(timing)
+
+    def mark(self, name: str) -> None:
+        """Record a milestone (first occurrence wins)."""
+        with self._lock:
+            self.marks.setdefault(name, self._ms(self._clock()))
+
+    def report(self) -> str:
+        lines = ["Startup phases (ms since startup began):"]
+        for p in sorted(self.phases, key=lambda p: p.start_ms):
+            lines.append(f"  {p.name:<22} {p.duration_ms:8.1f} ms  at {p.start_ms:8.1f}  [{p.thread}]")
+        if self.marks:
+            lines.append("Milestones:")
+            for name, at in sorted(self.marks.items(), key=lambda kv: kv[1]):
+                lines.append(f"  {name:<22} {at:8.1f} ms")
+        return "\n".join(lines)
+
+
+class Deferred(Generic[_T]):
+    """A value computed once by *factory*, in a background phase or on first use.
+
+    :meth:`result` is thread-safe: a caller that arrives while another
+    thread is computing the value waits for it. A failure is stored and
+    re-raised to every caller.
+    """
+
+    __slots__ = ("name", "_factory", "_profiler", "_lock", "_done", "_value", "_error")
+
+    def __init__(self, name: str, factory: Callable[[], _T], profiler: StartupProfiler | None = None) -> None:
+        self.name = name
+        self._factory = factory
+        self._profiler = profiler
+        self._lock = threading.Lock()
+        self._done = False
+        self._value: _T | None = None
+        self._error: BaseException | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done
+
+    def result(self) -> _T:
+        if not self._done:
+            with self._lock:
+                if not self._done:
+                    self._compute()
+        if self._error is not None:
+            raise self._error
+        return self._value  # type: ignore[return-value]
+
+    def _compute(self) -> None:
+        try:
+            if self._profiler is None:
+                self._value = self._factory()
+            else:
+                with self._profiler.phase(self.name):
+                    self._value = self._factory()
+        except Exception as exc:
+            self._error = exc
+        finally:
+            self._done = True
+
+
+# ── --profile-startup ────────────────────────────────────────────────
+
+
+@dataclass(frozen=True, slots=True)
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # 0 for imports not nested in another
+
+
+def parse_importtime(stderr: str) -> list[ImportTiming]:
+    """Parse ``-X importtime`` lines (``import time: self | cumulative | name``)."""
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:  # the header line
+            continue
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        timings.append(ImportTiming(stripped, self_us, cumulative_us, (len(name) - len(stripped) - 1) // 2))
+    return timings
+
+
+def summarize_imports(timings: list[ImportTiming], top: int = 15) -> str:
+    """Total import time and the slowest top-level imports."""
+    roots = [t for t in timings if t.depth == 0]
+    total_ms = sum(t.cumulative_us for t in roots) / 1000
+    lines = [f"Imports: {len(timings)} modules, {total_ms:.1f} ms", "Slowest top-level imports (cumulative):"]
+    for t in sorted(roots, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        lines.append(f"  {t.module:<40} {t.cumulative_us / 1000:8.1f} ms  (self {t.self_us / 1000:.1f})")
+    return "\n".join(lines)
+
+
+def profiling_requested(argv: list[str]) -> bool:
+    return PROFILE_FLAG in argv
+
+
+def needs_reexec() -> bool:
+    """Whether import timing needs a child interpreter started with ``-X importtime``."""
+    return "importtime" not in sys._xoptions and not getattr(sys, "frozen", False)
+
+
+def run_with_import_profile(module: str, argv: list[str]) -> int:
+    """Run ``python -X importtime -m module *argv`` and print its import summary."""
+    env = dict(os.environ)
+    src_dir = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (src_dir, env.get("PYTHONPATH", "")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", module, *argv],
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+        check=False,
+    )
+    other = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+    if other:
+        print("\n".join(other), file=sys.stderr)
+    print(summarize_imports(parse_importtime(proc.stderr)))
+    return proc.returncode
@@ -0,0 +1,245 @@
+"""Per-turn tracing: where a turn's time went, written to a local file.
+
+Each chat turn is one trace. Its root span, ``turn``, covers the whole
+turn, from the user's message to the signals that deliver the reply. Child
+spans cover the stages:
+
+* ``context.excerpt`` and ``context.build`` build the state block.
+* ``ai.send`` covers the model call, retries and backoff included, and holds
+  one ``ai.request`` span per attempt.
+* ``parse`` decodes the reply.
+* ``validate`` and ``record`` check the reply and update the story state.
+* ``deliver`` emits the signals to the web view.
+
+Spans carry attributes such as the provider, model, tokens in and out,
+retries, the chapter and whether the state block was a delta.
+
+Finished traces are appended to a rotating JSONL file, one trace per line.
+Each line is an OTLP/JSON ``ExportTraceServiceRequest``, the format the
+OpenTelemetry Collector's ``file`` exporter writes. The collector's
+``otlpjsonfile`` receiver can replay a file into Jaeger, Tempo or similar
+tools, and the lines are also readable with ``jq``. Nothing is imported
+beyond the standard library.
+
+Tracing costs a few small objects per stage and one write per turn, so it
+is on by default (see ``LITERAPLAY_TRACE``). A stage that runs on another
+thread finds its turn through :func:`use`, the way
+:mod:`literaplay.cancellation` binds a turn's token. :func:`span` does
+nothing on a thread that has no current span.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import logging.handlers
+import random
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from literaplay import fast_json
+
+SERVICE_NAME = "literaplay"
+
+# OTLP enums
+_KIND_INTERNAL = 1
+_KIND_CLIENT = 3
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def _attribute_value(value: Any) -> dict[str, Any]:
+    # bool first: it is an int subclass. OTLP/JSON encodes 64-bit ints as strings.
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """One timed stage of a turn; use as a context manager or call :meth:`end`."""
+
+    __slots__ = (
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "_trace",
+    )
+
+    def __init__(self, name: str, trace: _Trace, parent_id: str = "", kind: int = _KIND_INTERNAL, **attributes) -> None:
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace.trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: str | None = None
+        self._trace = trace
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def child(self, name: str, client: bool = False, **attributes: Any) -> Span:
+        """Start a child span; *client* marks an outgoing request."""
+        return Span(name, self._trace, self.span_id, _KIND_CLIENT if client else _KIND_INTERNAL, **attributes)
+
+    def end(self, error: BaseException | str | None = None) -> None:
+        """Finish the span (only the first call counts); ending the root span writes the trace."""
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+        self._trace.finished(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def __enter__(self) -> Span:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end(exc)
+
+    def to_otlp(self) -> dict[str, Any]:
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _Trace:
+    """The spans of one turn, written out when the root span ends."""
+
+    __slots__ = ("trace_id", "root", "spans", "_tracer")
+
+    def __init__(self, tracer: Tracer) -> None:
+        self.trace_id = _new_id(128)
+        self.root: Span | None = None
+        self.spans: list[Span] = []  # finished; appended from any thread
+        self._tracer = tracer
+
+    def finished(self, span: Span) -> None:
+        self.spans.append(span)
+        if span is self.root:
+            self._tracer.export(self.spans)
+
+
+class Tracer:
+    """Starts traces and appends finished ones to *path*; ``path=None`` disables writing.
+
+    The file rotates at *max_bytes* (default 5 MB), keeping *backups* old files.
+    """
+
+    def __init__(self, path: Path | str | None, max_bytes: int = 5 * 1024 * 1024, backups: int = 3) -> None:
+        self.path = Path(path) if path else None
+        self._handler: logging.Handler | None = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+            )
+        self._resource = {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]}
+
+    @property
+    def enabled(self) -> bool:
+        return self._handler is not None
+
+    def start_trace(self, name: str, **attributes: Any) -> Span:
+        """Start a trace and return its root span."""
+        trace = _Trace(self)
+        trace.root = Span(name, trace, **attributes)
+        return trace.root
+
+    def export(self, spans: list[Span]) -> None:
+        if self._handler is None:
+            return
+        line = fast_json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": self._resource,
+                        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": [s.to_otlp() for s in spans]}],
+                    }
+                ]
+            }
+        )
+        try:
+            self._handler.handle(logging.makeLogRecord({"msg": line}))
+        except Exception:  # a full disk must not break the chat
+            logging.exception("Could not write trace")
+
+    def close(self) -> None:
+        if self._handler is not None:
+            self._handler.close()
+
+
+# ── Current span per thread ──────────────────────────────────────────
+
+_local = threading.local()
+
+
+def current_span() -> Span | None:
+    return getattr(_local, "span", None)
+
+
+@contextlib.contextmanager
+def use(span: Span | None) -> Iterator[Span | None]:
+    """Make *span* the parent of :func:`span` calls on this thread."""
+    previous = current_span()
+    _local.span = span
+    try:
+        yield span
+    finally:
+        _local.span = previous
+
+
+def annotate(**attributes: Any) -> None:
+    """Set *attributes* on the current span, if there is one."""
+    current = current_span()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextlib.contextmanager
+def span(name: str, client: bool = False, **attributes: Any) -> Iterator[Span | None]:
+    """A child of the current span, made current while the block runs; yields None without a parent."""
+    parent = current_span()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, client, **attributes)
+    with child, use(child):
+        yield child
@@ -0,0 +1,74 @@
+"""Ordered queue of the user's inputs for one chat session.
+
+Only one turn is in flight at a time. Before this queue, anything typed or
+clicked while a turn was running was dropped. Inputs submitted during a turn
+now wait here and are sent, in order, when it finishes. Consecutive waiting
+inputs are coalesced into one request, so typing three lines during a slow
+turn costs one more request, not three. An input that would push the
+coalesced text past *max_chars* starts a new request instead.
+
+The queue belongs to a session. Starting another situation or leaving the
+chat discards it. A turn cancelled to apply a configuration change (see
+``BackendBridge.save_model``) is put back at the front with
+:meth:`TurnQueue.requeue`. It is then resent under the new settings, merged
+with whatever was typed after it.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class QueuedTurn:
+    """One request's worth of user input: the coalesced *text* of *inputs* submissions."""
+
+    text: str
+    inputs: int = 1
+
+
+class TurnQueue:
+    """FIFO of pending user turns with coalescing; used from the UI thread only."""
+
+    def __init__(self, max_chars: int | None = None) -> None:
+        self.max_chars = max_chars
+        self._turns: deque[QueuedTurn] = deque()
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def depth(self) -> int:
+        """Inputs waiting to be sent (a coalesced request counts each of its inputs)."""
+        return sum(turn.inputs for turn in self._turns)
+
+    def _fits(self, first: str, second: str) -> bool:
+        return self.max_chars is None or len(first) + len(SEPARATOR) + len(second) <= self.max_chars
+
+    def submit(self, text: str) -> None:
+        """Queue *text*, coalescing it into the last waiting request when it fits."""
+        if self._turns and self._fits(self._turns[-1].text, text):
+            last = self._turns[-1]
+            last.text = f"{last.text}{SEPARATOR}{text}"
+            last.inputs += 1
+        else:
+            self._turns.append(QueuedTurn(text))
+
+    def requeue(self, text: str) -> None:
+        """Put an interrupted turn's *text* back at the front, ahead of newer input."""
+        if self._turns and self._fits(text, self._turns[0].text):
+            first = self._turns[0]
+            first.text = f"{text}{SEPARATOR}{first.text}"
+            first.inputs += 1
+        else:
+            self._turns.appendleft(QueuedTurn(text))
+
+    def pop(self) -> QueuedTurn | None:
+        """The next request to send, or None when nothing is waiting."""
+        return self._turns.popleft() if self._turns else None
+
+    def clear(self) -> None:
+        self._turns.clear()
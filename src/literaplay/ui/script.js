@@ -11,6 +11,7 @@ let _apiContext = "setup"; // "setup" | "settings"
 let previousScreen = "menu";
 let currentFontSize = 16;
 let _isLoading = false;
+let _queueDepth = 0; // messages waiting for the reply in progress
 let _selectAbortController = null;
 
 // Provider-specific hints shown below the API key input
@@ -55,11 +56,15 @@ document.addEventListener("DOMContentLoaded", () => {
 
         // Connect Python Signals to JS functions
         backend.apiValidationResult.connect(handleApiValidation);
+        backend.startupFailed.connect(handleStartupFailed);
         backend.libraryLoaded.connect(renderLibrary);
+        backend.situationDetailsLoaded.connect(openSituation);
         backend.chatMessageReceived.connect(handleChatMessageJson);
         backend.chatOptionsUpdated.connect(renderChatOptions);
         backend.chatStarted.connect(handleChatStarted);
         backend.loadingStateChanged.connect(toggleLoading);
+        backend.queueDepthChanged.connect(handleQueueDepth);
+        backend.usageUpdated.connect(handleUsageUpdated);
         backend.chatError.connect((msg) => _renderChatMessage("System", "Грешка: " + msg, false, true));
         backend.chatOverloaded.connect(showOverloadModal);
         backend.chatEnded.connect(handleChatEnded);
@@ -69,6 +74,10 @@ document.addEventListener("DOMContentLoaded", () => {
         backend.currentProvider.connect(handleCurrentProvider);
         backend.providerModelsLoaded.connect(handleProviderModels);
 
+        // One payload per AI turn instead of separate message/options/loading signals
+        backend.turnCompleted.connect(handleTurnCompleted);
+        backend.enable_turn_batching();
+
         backend.request_initial_state();
     });
 
@@ -125,7 +134,10 @@ function setupEventListeners() {
     document.getElementById("btn-sit-back").addEventListener("click", () => showScreen("menu"));
 
     // Chat Screen
-    document.getElementById("btn-back").addEventListener("click", () => showScreen("menu"));
+    document.getElementById("btn-back").addEventListener("click", () => {
+        backend.leave_chat(); // abandons a reply still in flight
+        showScreen("menu");
+    });
 
     // Settings Screen — track which screen opened settings so Back returns correctly
     document.getElementById("btn-open-settings").addEventListener("click", () => {
@@ -302,7 +314,6 @@ function changeFontSize(delta) {
 }
 
 function updateSendButton() {
-    if (_isLoading) return;
     const btn = document.getElementById("btn-send");
     const hasText = document.getElementById("chat-input").value.trim().length > 0;
     btn.disabled = !hasText;
@@ -391,10 +402,17 @@ function showScreen(name) {
     if (name === "settings") document.getElementById("settings-screen").classList.remove("hidden");
     if (name === "situation") document.getElementById("situation-screen").classList.remove("hidden");
     if (name === "chat") document.getElementById("chat-screen").classList.remove("hidden");
+    if (name === "startup-error") document.getElementById("startup-error-screen").classList.remove("hidden");
 }
 
 // === Python Signal Handlers ===
 
+/** A startup phase (library, catalog, book texts) failed; nothing else can work. */
+function handleStartupFailed(phase, message) {
+    document.getElementById("startup-error-detail").innerText = `${phase}: ${message}`;
+    showScreen("startup-error");
+}
+
 function handleApiValidation(isValid, message) {
     const inSettings = _apiContext === "settings";
     const verifyBtn = document.getElementById(inSettings ? "btn-verify-settings" : "btn-verify");
@@ -525,14 +543,17 @@ function showSituations(workKey) {
     showScreen("situation");
 }
 
+/** The menu catalog has card fields only; ask the backend for the rest of the situation. */
 function startChat(workKey, sitKey) {
-    const workData = libraryData[workKey];
-    const sitData = workData.situations.find(s => s.key === sitKey);
-    if (!sitData) return;
+    backend.request_situation_details(workKey, sitKey);
+}
+
+function openSituation(detailsJson) {
+    const sitData = JSON.parse(detailsJson);
 
     currentCharacterName = sitData.character;
     currentUserCharacter = sitData.user_character || "Анонимен";
-    currentColor = sitData.color || workData.color || "var(--accent)";
+    currentColor = sitData.color || "var(--accent)";
     document.getElementById("chat-title").innerText = sitData.character;
 
     document.getElementById("chat-history").innerHTML = "";
@@ -551,7 +572,7 @@ function startChat(workKey, sitKey) {
     showScreen("chat");
 
     updateSendButton();
-    backend.start_chat_session(workKey, sitKey);
+    backend.start_chat_session(sitData.work, sitData.key);
 }
 
 function handleChatStarted(intro, firstMessage) {
@@ -587,6 +608,23 @@ function handleChatEnded(finalText) {
     setTimeout(() => { history.scrollTop = history.scrollHeight; }, 50);
 }
 
+/** Render a whole AI turn at once: messages, chapter transition or ending, options. */
+function handleTurnCompleted(jsonStr) {
+    let turn;
+    try {
+        turn = JSON.parse(jsonStr);
+    } catch (e) {
+        console.error("Failed to parse turn payload:", e);
+        toggleLoading(false);
+        return;
+    }
+    toggleLoading(turn.loading);
+    turn.messages.forEach(m => _renderChatMessage(m.sender, m.text, m.isUser, m.isSystem));
+    if (turn.chapterTransition !== undefined) handleChapterTransition(turn.chapterTransition);
+    if (turn.ended !== undefined) handleChatEnded(turn.ended);
+    if (turn.options !== undefined) renderChatOptions(turn.options);
+}
+
 function handleChatMessageJson(jsonStr) {
     try {
         const data = JSON.parse(jsonStr);
@@ -659,13 +697,14 @@ function _renderChatMessage(sender, text, isUser, isSystem) {
     updateScrollButton();
 }
 
+/** Render option buttons from a JSON string (chatOptionsUpdated) or an array (turnCompleted). */
 function renderChatOptions(optionsJson) {
     const container = document.getElementById("chat-options");
     container.innerHTML = "";
 
     let optionsArray = [];
     try {
-        optionsArray = JSON.parse(optionsJson);
+        optionsArray = Array.isArray(optionsJson) ? optionsJson : JSON.parse(optionsJson);
     } catch (e) {
         console.error("Failed to parse chat options:", e);
         return;
@@ -724,31 +763,50 @@ function hideOverloadModal() {
     document.getElementById("overload-modal").classList.add("hidden");
 }
 
+// The input stays enabled while a reply is in progress: messages sent meanwhile are queued by the backend
 function toggleLoading(isLoading) {
     _isLoading = isLoading;
     const ind = document.getElementById("typing-indicator");
-    const input = document.getElementById("chat-input");
-    const btn = document.getElementById("btn-send");
     const statusEl = document.getElementById("status-indicator");
-    const statusLabel = document.getElementById("status-label");
 
     if (isLoading) {
         ind.classList.remove("hidden");
-        input.disabled = true;
-        btn.disabled = true;
         statusEl.classList.add("busy");
-        statusLabel.textContent = "Мисли...";
     } else {
         ind.classList.add("hidden");
-        input.disabled = false;
-        updateSendButton();
-        input.focus();
         statusEl.classList.remove("busy");
-        statusLabel.textContent = "На линия";
+        document.getElementById("chat-input").focus();
     }
+    updateStatusLabel();
     document.getElementById("chat-history").scrollTop = document.getElementById("chat-history").scrollHeight;
 }
 
+function handleQueueDepth(depth) {
+    _queueDepth = depth;
+    updateStatusLabel();
+}
+
+// Token and cost totals for the session and chapter, shown as the status indicator's tooltip
+function handleUsageUpdated(jsonStr) {
+    let totals;
+    try {
+        totals = JSON.parse(jsonStr);
+    } catch (e) {
+        console.error("Failed to parse usage JSON:", e);
+        return;
+    }
+    const describe = (label, t) =>
+        `${label}: ${t.calls} заявки, ${(t.input_tokens + t.output_tokens).toLocaleString("bg-BG")} токена, $${t.cost_usd.toFixed(4)}`;
+    const lines = [describe("Сесия", totals.session)];
+    if (totals.chapter) lines.push(describe("Глава", totals.chapter));
+    document.getElementById("status-indicator").title = lines.join("\n");
+}
+
+function updateStatusLabel() {
+    const label = _isLoading ? "Мисли..." : "На линия";
+    document.getElementById("status-label").textContent = _queueDepth > 0 ? `${label} (${_queueDepth} в опашка)` : label;
+}
+
 
 function handleChapterTransition(chapterTitle) {
     _renderChatMessage("System", `— ${chapterTitle} —`, false, true);
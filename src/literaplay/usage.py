@@ -0,0 +1,288 @@
+"""Token usage and cost, per call and in aggregate.
+
+Each provider reports what a request consumed in its own shape, and the SDK
+objects use different names from the REST payloads (``usage_metadata`` /
+``prompt_token_count`` against ``usageMetadata`` / ``promptTokenCount``
+for Gemini). :func:`read_usage` reads either into common counts.
+:class:`~literaplay.ai_service.ChatSession` keeps them on each call's
+:class:`~literaplay.ai_service.CallInfo`.
+
+:class:`UsageLedger` prices each call (:data:`PRICES`) and adds it to
+running totals by session, situation, chapter, model and provider. The
+totals are saved to a JSON file after every call, so they survive restarts.
+Retried, failed and hedged attempts are billed too; the app gets every
+request from :attr:`ChatSession.on_usage`, not only the one that answered
+the turn. The app sends the session and chapter totals to the UI. Print the saved
+totals with::
+
+    python -m literaplay.usage [--by model] [--json] [--file usage.json]
+
+Peak input tokens per call show how fast the context grows within a
+chapter. Use them when tuning excerpt sizes and history policies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any
+
+
+@dataclass(slots=True)
+class TokenUsage:
+    """Tokens one request consumed; counts a provider did not report stay 0."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0  # including reasoning tokens, which are billed as output
+    cached_tokens: int = 0  # input tokens served from the provider's prompt cache
+    reasoning_tokens: int = 0  # part of output_tokens (not reported by Anthropic)
+
+    def update(self, counts: dict[str, int]) -> None:
+        """Take the counts in *counts*; streams report running totals, so later values win."""
+        for name, value in counts.items():
+            setattr(self, name, value)
+
+
+def _get(item: Any, *names: str) -> Any:
+    """The first of *names* present on an SDK object or in its dict form."""
+    for name in names:
+        value = item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+        if value is not None:
+            return value
+    return None
+
+
+def _count(item: Any, *names: str) -> int | None:
+    value = _get(item, *names) if item is not None else None
+    return value if isinstance(value, int) else None
+
+
+def read_usage(provider: str, payload: Any) -> dict[str, int]:
+    """Counts found in an SDK response or one streamed REST event of *provider*.
+
+    Counts the payload does not carry are left out, so the result of each
+    event of a stream can be passed to :meth:`TokenUsage.update` in turn.
+    """
+    counts: dict[str, int | None] = {}
+    if provider == "openai":
+        usage = _get(payload, "usage")
+        if usage is not None:
+            counts = {
+                "input_tokens": _count(usage, "prompt_tokens"),
+                "output_tokens": _count(usage, "completion_tokens"),
+                "cached_tokens": _count(_get(usage, "prompt_tokens_details"), "cached_tokens"),
+                "reasoning_tokens": _count(_get(usage, "completion_tokens_details"), "reasoning_tokens"),
+            }
+    elif provider == "anthropic":
+        # A response (or message_delta event) carries usage; a message_start event nests it
+        usage = _get(payload, "usage")
+        if usage is None:
+            usage = _get(_get(payload, "message") or {}, "usage")
+        if usage is not None:
+            uncached = _count(usage, "input_tokens")
+            read = _count(usage, "cache_read_input_tokens") or 0
+            written = _count(usage, "cache_creation_input_tokens") or 0
+            counts = {
+                # input_tokens excludes the cached part; report the whole prompt
+                "input_tokens": None if uncached is None else uncached + read + written,
+                "output_tokens": _count(usage, "output_tokens"),
+                "cached_tokens": read if uncached is not None else None,
+            }
+    elif provider == "gemini":
+        usage = _get(payload, "usage_metadata", "usageMetadata")
+        if usage is not None:
+            candidates = _count(usage, "candidates_token_count", "candidatesTokenCount")
+            thoughts = _count(usage, "thoughts_token_count", "thoughtsTokenCount")
+            counts = {
+                "input_tokens": _count(usage, "prompt_token_count", "promptTokenCount"),
+                "output_tokens": None if candidates is None else candidates + (thoughts or 0),
+                "cached_tokens": _count(usage, "cached_content_token_count", "cachedContentTokenCount"),
+                "reasoning_tokens": thoughts,
+            }
+    return {name: value for name, value in counts.items() if value is not None}
+
+
+# ── Cost ─────────────────────────────────────────────────────────────
+
+# USD per million tokens: (input, cached input, output). List prices for the
+# models in config.PROVIDER_MODELS and the fast routing models. Gemini 2.5 Pro
+# is priced for prompts up to 200k tokens.
+PRICES: dict[str, tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "o4-mini": (1.10, 0.275, 4.40),
+    "o3": (2.00, 0.50, 8.00),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "gemini-2.5-pro": (1.25, 0.31, 10.00),
+    "gemini-3-flash-preview": (0.50, 0.05, 3.00),
+    "claude-sonnet-4-6": (3.00, 0.30, 15.00),
+    "claude-opus-4-6": (5.00, 0.50, 25.00),
+    "claude-haiku-4-5": (1.00, 0.10, 5.00),
+}
+
+
+def cost_usd(model: str, usage: TokenUsage) -> float | None:
+    """What *usage* cost on *model*, or None for a model without a price."""
+    price = PRICES.get(model)
+    if price is None:
+        return None
+    input_price, cached_price, output_price = price
+    uncached = max(0, usage.input_tokens - usage.cached_tokens)
+    return (uncached * input_price + usage.cached_tokens * cached_price + usage.output_tokens * output_price) / 1e6
+
+
+# ── Ledger ───────────────────────────────────────────────────────────
+
+DIMENSIONS = ("session", "situation", "chapter", "model", "provider")
+# Sessions kept, in memory and in the saved file (the oldest are dropped first)
+MAX_SAVED_SESSIONS = 200
+
+
+@dataclass(slots=True)
+class UsageTotals:
+    """Usage summed over a group of calls."""
+
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    reasoning_tokens: int = 0
+    peak_input_tokens: int = 0  # the largest single prompt: how far the context grew
+    cost_usd: float = 0.0
+    unpriced_calls: int = 0  # calls to models missing from PRICES, not in cost_usd
+
+    def add(self, usage: TokenUsage, cost: float | None) -> None:
+        self.calls += 1
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.reasoning_tokens += usage.reasoning_tokens
+        self.peak_input_tokens = max(self.peak_input_tokens, usage.input_tokens)
+        if cost is None:
+            self.unpriced_calls += 1
+        else:
+            self.cost_usd += cost
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["cost_usd"] = round(self.cost_usd, 6)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> UsageTotals:
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+class UsageLedger:
+    """Totals of every recorded call by :data:`DIMENSIONS`, saved to *path* (None keeps them in memory).
+
+    Used from the UI thread only.
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path) if path else None
+        self.totals: dict[str, dict[str, UsageTotals]] = {dimension: {} for dimension in DIMENSIONS}
+        if self.path is not None and self.path.exists():
+            self._load(self.path)
+
+    def _load(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            for dimension in DIMENSIONS:
+                for key, totals in data.get(dimension, {}).items():
+                    self.totals[dimension][key] = UsageTotals.from_dict(totals)
+        except (OSError, ValueError, TypeError, AttributeError):
+            logging.exception("Ignoring unreadable usage file %s", path)
+            self.totals = {dimension: {} for dimension in DIMENSIONS}
+
+    def record(
+        self, provider: str, model: str, usage: TokenUsage, session: str, situation: str, chapter: str | None
+    ) -> float | None:
+        """Add one call to the totals, save them, and return the call's cost."""
+        cost = cost_usd(model, usage)
+        keys = {
+            "session": session,
+            "situation": situation,
+            "chapter": f"{situation}#{chapter}" if chapter else None,
+            "model": model,
+            "provider": provider,
+        }
+        for dimension, key in keys.items():
+            if key is not None:
+                self.totals[dimension].setdefault(key, UsageTotals()).add(usage, cost)
+        sessions = self.totals["session"]
+        for key in list(sessions)[: max(0, len(sessions) - MAX_SAVED_SESSIONS)]:
+            del sessions[key]
+        self.save()
+        return cost
+
+    def get(self, dimension: str, key: str) -> UsageTotals:
+        return self.totals[dimension].get(key) or UsageTotals()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {dimension: {k: t.to_dict() for k, t in groups.items()} for dimension, groups in self.totals.items()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Written beside the target and renamed over it, so a crash never leaves half a file
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".usage-", suffix=".json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except OSError:
+            logging.exception("Could not save usage to %s", self.path)
+
+
+# ── Command line ─────────────────────────────────────────────────────
+
+
+def format_table(groups: dict[str, UsageTotals]) -> str:
+    """A plain-text table of *groups*, most expensive first."""
+    header = f"{'':40} {'calls':>6} {'input':>10} {'cached':>10} {'output':>9} {'peak in':>9} {'cost $':>9}"
+    lines = [header, "-" * len(header)]
+    for key, t in sorted(groups.items(), key=lambda item: item[1].cost_usd, reverse=True):
+        cost = f"{t.cost_usd:9.4f}" + ("*" if t.unpriced_calls else "")
+        lines.append(
+            f"{key[:40]:40} {t.calls:6} {t.input_tokens:10} {t.cached_tokens:10} {t.output_tokens:9} "
+            f"{t.peak_input_tokens:9} {cost}"
+        )
+    if any(t.unpriced_calls for t in groups.values()):
+        lines.append("* includes calls to models without a price")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m literaplay.usage", description="Show saved token usage and cost.")
+    parser.add_argument("--by", choices=DIMENSIONS, default="model", help="grouping (default: model)")
+    parser.add_argument("--file", type=Path, help="usage file (default: LITERAPLAY_USAGE_FILE)")
+    parser.add_argument("--json", action="store_true", help="print every grouping as JSON")
+    args = parser.parse_args(argv)
+
+    path = args.file
+    if path is None:
+        from literaplay import config
+
+        path = config.USAGE_FILE
+    if not path.exists():
+        print(f"No usage recorded yet ({path})", file=sys.stderr)
+        return 1
+    ledger = UsageLedger(path)
+    if args.json:
+        data = {d: {k: t.to_dict() for k, t in groups.items()} for d, groups in ledger.totals.items()}
+        print(json.dumps(data, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(ledger.totals[args.by]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
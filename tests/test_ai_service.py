@@ -1,5 +1,6 @@
 """Tests for ai_service module."""
 
+import json
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -16,7 +17,12 @@ class TestAIService(unittest.TestCase):
 
         service = AIService(self.provider, self.api_key, self.model_name)
         self.assertIsNotNone(service.client)
-        mock_client_cls.assert_called_with(api_key=self.api_key)
+        kwargs = mock_client_cls.call_args.kwargs
+        self.assertEqual(kwargs["api_key"], self.api_key)
+        # Requests go through the shared pooled client so a cancelled turn can be aborted
+        from literaplay.rest_transport import shared_http_client
+
+        self.assertIs(kwargs["http_options"].httpx_client, shared_http_client())
 
     @patch("google.genai.Client")
     def test_create_chat(self, mock_client_cls):
@@ -207,6 +213,28 @@ class TestAIService(unittest.TestCase):
             AIService(self.provider, "", self.model_name)
 
 
+class TestRealSdkClients(unittest.TestCase):
+    """Each installed SDK accepts the client it is given (no network: nothing is sent)."""
+
+    def test_every_provider_creates_its_sdk_client(self):
+        import httpx
+
+        from literaplay.ai_service import AIService
+        from literaplay.rest_transport import shared_http_client
+
+        for provider, model, module in (
+            ("gemini", "gemini-2.5-flash", "google.genai"),
+            ("openai", "gpt-4.1-mini", "openai"),
+            ("anthropic", "claude-sonnet-4-6", "anthropic"),
+        ):
+            with self.subTest(provider=provider):
+                service = AIService(provider, "k", model)
+                self.assertTrue(type(service.client).__module__.startswith(module))
+                inner = getattr(service.client, "_client", None)  # openai/anthropic keep their HTTP client here
+                if isinstance(inner, httpx.Client):
+                    self.assertIs(inner, shared_http_client())
+
+
 class TestSanitizeApiError(unittest.TestCase):
     """T-03: Tests for the security-critical _sanitize_api_error function."""
 
@@ -335,6 +363,20 @@ class TestChatSession(unittest.TestCase):
         self.assertEqual(session.history[0]["role"], "user")
         self.assertEqual(session.history[1]["role"], "assistant")
 
+    def test_openai_usage_is_kept_with_the_call(self):
+        from literaplay.ai_service import ChatSession
+        from literaplay.usage import TokenUsage
+
+        mock_client = MagicMock()
+        response = mock_client.chat.completions.create.return_value
+        response.choices = [MagicMock()]
+        response.usage = {"prompt_tokens": 900, "completion_tokens": 80, "prompt_tokens_details": None}
+
+        session = ChatSession("openai", mock_client, "gpt-4.1-mini", "system prompt")
+        session.send_message("Hello")
+        assert session.last_call is not None
+        self.assertEqual(session.last_call.usage, TokenUsage(900, 80, 0))
+
     def test_anthropic_send_message(self):
         from literaplay.ai_service import ChatSession
 
@@ -351,6 +393,85 @@ class TestChatSession(unittest.TestCase):
         self.assertEqual(result, "Bonjour")
         self.assertEqual(len(session.history), 2)
 
+    def test_openai_uses_strict_schema(self):
+        from literaplay.ai_service import ChatSession
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.return_value.choices = [MagicMock()]
+        ChatSession("openai", mock_client, "gpt-4.1-mini", "system prompt").send_message("Hello")
+        _, kwargs = mock_client.chat.completions.create.call_args
+        self.assertEqual(kwargs["response_format"]["type"], "json_schema")
+
+        ChatSession("openai", mock_client, "gpt-4.1-mini", "prompt", structured_output="json").send_message("Hello")
+        _, kwargs = mock_client.chat.completions.create.call_args
+        self.assertEqual(kwargs["response_format"], {"type": "json_object"})
+
+    def test_anthropic_forced_tool_use(self):
+        from literaplay.ai_service import ChatSession
+
+        mock_client = MagicMock()
+        block = MagicMock()
+        block.type = "tool_use"
+        block.input = {"reply": [{"character": "Марко", "text": "Кой е?"}], "options": [], "ended": False}
+        mock_client.messages.create.return_value.content = [block]
+
+        session = ChatSession("anthropic", mock_client, "claude-sonnet-4-6", "system prompt")
+        result = session.send_message("Hi")
+
+        _, kwargs = mock_client.messages.create.call_args
+        self.assertEqual(kwargs["tool_choice"], {"type": "tool", "name": "story_response"})
+        self.assertEqual(json.loads(result), block.input)
+        self.assertEqual(session.history[-1], {"role": "assistant", "content": result})
+
+    def test_openai_reasoning_model_gets_effort_not_sampling(self):
+        from literaplay.ai_service import ChatSession
+        from literaplay.reasoning import ReasoningPolicy
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.return_value.choices = [MagicMock()]
+        session = ChatSession("openai", mock_client, "o3", "prompt", reasoning=ReasoningPolicy())
+        session.send_message("Hello", turn_type="transition")
+
+        _, kwargs = mock_client.chat.completions.create.call_args
+        self.assertEqual(kwargs["reasoning_effort"], "medium")
+        self.assertNotIn("temperature", kwargs)
+        call = session.last_call
+        assert call is not None
+        self.assertEqual(call.turn_type, "transition")
+        self.assertEqual(call.reasoning, "medium")
+        self.assertGreaterEqual(call.latency_ms, 0)
+
+        ChatSession("openai", mock_client, "gpt-4.1-mini", "prompt", reasoning=ReasoningPolicy()).send_message("Hi")
+        _, kwargs = mock_client.chat.completions.create.call_args
+        self.assertNotIn("reasoning_effort", kwargs)
+        self.assertEqual(kwargs["temperature"], 0.2)
+
+    def test_anthropic_thinking_switches_to_auto_tool_choice(self):
+        from literaplay.ai_service import ChatSession
+        from literaplay.reasoning import ReasoningPolicy
+
+        mock_client = MagicMock()
+        thinking, tool = MagicMock(), MagicMock()
+        thinking.type = "thinking"
+        tool.type = "tool_use"
+        tool.input = {"reply": [], "options": [], "ended": False}
+        mock_client.messages.create.return_value.content = [thinking, tool]
+
+        policy = ReasoningPolicy.parse("transition=low")
+        session = ChatSession("anthropic", mock_client, "claude-sonnet-4-6", "prompt", reasoning=policy)
+        result = session.send_message("Hi", turn_type="transition")
+
+        _, kwargs = mock_client.messages.create.call_args
+        self.assertEqual(kwargs["thinking"], {"type": "enabled", "budget_tokens": 1024})
+        self.assertEqual(kwargs["tool_choice"], {"type": "auto"})
+        self.assertNotIn("temperature", kwargs)
+        self.assertEqual(json.loads(result), tool.input)
+
+        session.send_message("Again")  # "turn" defaults to minimal: no thinking, forced tool
+        _, kwargs = mock_client.messages.create.call_args
+        self.assertNotIn("thinking", kwargs)
+        self.assertEqual(kwargs["tool_choice"], {"type": "tool", "name": "story_response"})
+
     def test_unknown_provider_raises(self):
         from literaplay.ai_service import ChatSession
 
@@ -359,6 +480,90 @@ class TestChatSession(unittest.TestCase):
             session.send_message("hello")
 
 
+class TestModelRouting(unittest.TestCase):
+    def _service(self):
+        from literaplay.ai_service import AIService
+
+        with patch("openai.OpenAI"):
+            service = AIService("openai", "k", "gpt-4.1", fast_model="gpt-4.1-nano")
+        client = service.client = MagicMock()
+        self.create = client.chat.completions.create
+        self.create.return_value.choices = [MagicMock()]
+        return service
+
+    def test_routine_turns_use_fast_model_key_beats_the_selected_one(self):
+        service = self._service()
+        session = service.create_chat("prompt")
+        create = self.create
+
+        service.send_message(session, "a")
+        self.assertEqual(create.call_args[1]["model"], "gpt-4.1-nano")
+        service.send_message(session, "b", turn_type="transition")
+        self.assertEqual(create.call_args[1]["model"], "gpt-4.1")
+        service.send_message(session, "c", key_beat=True)
+        self.assertEqual(create.call_args[1]["model"], "gpt-4.1")
+        assert session.last_call is not None
+        self.assertEqual(session.last_call.model, "gpt-4.1")
+        # One history across both models
+        self.assertEqual(len(create.call_args[1]["messages"]), 1 + 5)
+
+    @patch("literaplay.ai_service._interruptible_sleep")
+    def test_overloaded_fast_model_retries_on_strong(self, _sleep):
+        service = self._service()
+        session = service.create_chat("prompt")
+        create = self.create
+        ok = MagicMock()
+        ok.choices = [MagicMock()]
+        create.side_effect = [Exception("429 rate limit"), ok]
+
+        service.send_message(session, "a")
+        self.assertEqual([c[1]["model"] for c in create.call_args_list], ["gpt-4.1-nano", "gpt-4.1"])
+
+    def test_gemini_chat_history_migrates_between_models(self):
+        from literaplay.ai_service import ChatSession
+
+        client = MagicMock()
+        first, second = MagicMock(), MagicMock()
+        first.get_history.return_value = ["user turn", "model turn"]
+        client.chats.create.side_effect = [first, second]
+        session = ChatSession("gemini", client, "gemini-2.5-pro", "prompt")
+
+        session.send_message("a", model="gemini-2.5-flash")
+        session.send_message("b", model="gemini-2.5-flash")
+        session.send_message("c")
+
+        self.assertEqual(first.send_message.call_count, 2)
+        second.send_message.assert_called_once()
+        _, kwargs = client.chats.create.call_args
+        self.assertEqual(kwargs["model"], "gemini-2.5-pro")
+        self.assertEqual(kwargs["history"], ["user turn", "model turn"])
+
+    def test_gemini_fork_and_record_exchange(self):
+        from literaplay.ai_service import ChatSession
+
+        client = MagicMock()
+        client.chats.create.return_value.get_history.return_value = ["earlier"]
+        session = ChatSession("gemini", client, "gemini-2.5-flash", "prompt")
+        session._init_gemini_chat()
+
+        fork = session.fork()
+        self.assertEqual(client.chats.create.call_args[1]["history"], ["earlier"])
+        session.adopt(fork)
+        self.assertIs(session._gemini_chat, fork._gemini_chat)
+
+        session.record_exchange("Hi", "{}")
+        history = client.chats.create.call_args[1]["history"]
+        self.assertEqual(history[0], "earlier")
+        self.assertEqual(history[2], {"role": "model", "parts": [{"text": "{}"}]})
+
+    def test_routing_off_without_fast_model(self):
+        from literaplay.ai_service import AIService
+
+        with patch("openai.OpenAI"):
+            service = AIService("openai", "k", "gpt-4.1-nano", fast_model="gpt-4.1-nano")
+        self.assertFalse(service.router.enabled)
+
+
 class TestRetryDelayDoubling(unittest.TestCase):
     """Test that retry delay doubles between attempts."""
 
@@ -76,6 +76,14 @@ class TestBookTextIndex(unittest.TestCase):
             self.assertEqual(idx.get_excerpt("Chapter 1"), "Hello")
             self.assertEqual(idx.get_excerpt("Chapter 2"), "World")
 
+    def test_titles_repeated_in_a_later_part_are_qualified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            p = self._write_text_md(tmp, "# Първа част\n## I\nЕдно\n# Втора част\n## I\nДве\n")
+            idx = BookTextIndex(p)
+            self.assertEqual(idx.titles(), ["I", "I (Втора част)"])
+            self.assertEqual(idx.get_text("I"), "Едно")
+            self.assertEqual(idx.get_text("I (Втора част)"), "Две")
+
     def test_truncates_to_max_chars(self):
         with tempfile.TemporaryDirectory() as tmp:
             p = self._write_text_md(tmp, "## Ch\n" + "x" * 5000 + "\n")
@@ -0,0 +1,254 @@
+"""Tests for turn deadlines and cancellation, down to the network."""
+
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import httpcore
+import httpx
+
+from literaplay.ai_service import AIService, ChatSession
+from literaplay.cancellation import CancelToken, DeadlineExceeded, TurnCancelled, current_token
+from literaplay.rest_transport import _LIMITS, CancellableTransport, RestClient, _TrackingBackend, shared_http_client
+
+_REPLY = json.dumps({"reply": "ok", "options": [], "ended": False})
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCancelToken(unittest.TestCase):
+    def test_cancel_and_check(self):
+        token = CancelToken()
+        token.check()
+        self.assertIsNone(token.remaining())
+        token.cancel("left chat")
+        token.cancel("ignored")
+        with self.assertRaises(TurnCancelled) as ctx:
+            token.check()
+        self.assertEqual(ctx.exception.reason, "left chat")
+        self.assertNotIsInstance(ctx.exception, DeadlineExceeded)
+
+    def test_deadline(self):
+        clock = _FakeClock()
+        token = CancelToken(10.0, clock=clock)
+        self.assertEqual(token.remaining(), 10.0)
+        clock.now += 11
+        self.assertTrue(token.expired)
+        self.assertFalse(token.cancelled)
+        self.assertEqual(token.remaining(), 0.0)
+        with self.assertRaises(DeadlineExceeded):
+            token.check()
+
+    def test_child_follows_parent_but_not_the_reverse(self):
+        parent = CancelToken(5.0)
+        first, second = parent.child(), parent.child()
+        self.assertEqual(first.deadline, parent.deadline)
+        first.cancel("hedge lost")
+        self.assertFalse(parent.cancelled)
+        parent.cancel("model changed")
+        self.assertEqual(first.reason, "hedge lost")
+        self.assertEqual(second.reason, "model changed")
+
+    def test_on_cancel_runs_once_and_late_callbacks_run_at_once(self):
+        token, calls = CancelToken(), []
+        token.on_cancel(lambda: calls.append("early"))
+        token.cancel()
+        token.cancel()
+        token.on_cancel(lambda: calls.append("late"))
+        self.assertEqual(calls, ["early", "late"])
+
+    def test_unregistered_callbacks_do_not_run(self):
+        token, calls = CancelToken(), []
+        forget = token.on_cancel(lambda: calls.append("forgotten"))
+        token.on_cancel(lambda: calls.append("kept"))
+        forget()
+        token.cancel()
+        self.assertEqual(calls, ["kept"])
+
+    def test_bind_sets_the_current_token(self):
+        token = CancelToken()
+        self.assertIsNone(current_token())
+        with token.bind():
+            self.assertIs(current_token(), token)
+        self.assertIsNone(current_token())
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay_s = 0.0
+    paths: list[str] = []
+
+    def do_POST(self):
+        self.paths.append(self.path)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay_s if self.path.startswith("/slow") else 0)
+        body = f"data: {json.dumps({'choices': [{'delta': {'content': _REPLY}}]})}\n\ndata: [DONE]\n\n".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the test aborted the connection while the reply was delayed
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNetworkAbort(unittest.TestCase):
+    """Against a local server: a cancelled token wakes a worker blocked on the socket."""
+
+    def setUp(self):
+        _SlowHandler.delay_s = 3.0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.http = httpx.Client(transport=CancellableTransport(_LIMITS))
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _session(self):
+        client = RestClient("openai", "k", http_client=self.http)
+        session = ChatSession("openai", client, "gpt-4.1-mini", "sys", transport="rest")
+        session.history = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+        return session
+
+    def _send(self, session, path, cancel):
+        with patch("literaplay.rest_transport.OPENAI_URL", self.url + path):
+            return session.send_message("Hi", cancel=cancel)
+
+    def test_cancel_aborts_a_blocked_read_on_a_reused_connection(self):
+        session = self._session()
+        self.assertEqual(self._send(session, "/fast", CancelToken()), _REPLY)  # leaves a keep-alive connection
+        session.history = session.history[:2]
+
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel, args=("left chat",)).start()
+        started = time.monotonic()
+        with self.assertRaises(TurnCancelled) as ctx:
+            self._send(session, "/slow", token)
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(ctx.exception.reason, "left chat")
+        self.assertEqual(len(session.history), 2)  # the cancelled turn is not left behind
+
+    def test_deadline_caps_the_read(self):
+        session = self._session()
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            self._send(session, "/slow", CancelToken(0.3))
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(len(session.history), 2)
+
+
+def _proxy_env(**proxies):
+    """``os.environ`` with only the given proxy variables set."""
+    env = {k: v for k, v in os.environ.items() if not k.lower().endswith("_proxy")}
+    return patch.dict(os.environ, {**env, **proxies}, clear=True)
+
+
+def _pool(transport):
+    assert isinstance(transport, CancellableTransport)
+    return transport._pool
+
+
+class TestProxyEnvironment(unittest.TestCase):
+    """The shared client honours proxy variables and stays cancellable behind a proxy."""
+
+    def setUp(self):
+        _SlowHandler.paths = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.proxy = f"http://127.0.0.1:{self.server.server_address[1]}"
+        reset = patch("literaplay.rest_transport._shared_client", None)
+        reset.start()
+        self.addCleanup(reset.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_go_through_the_environment_proxy(self):
+        with _proxy_env(HTTP_PROXY=self.proxy, HTTPS_PROXY=self.proxy):
+            http = shared_http_client()
+            self.addCleanup(http.close)
+            client = RestClient("openai", "k", http_client=http)
+            with patch("literaplay.rest_transport.OPENAI_URL", "http://api.invalid/v1"):
+                reply = client.complete("gpt-4.1-mini", "sys", [{"role": "user", "content": "Hi"}])
+        self.assertEqual(reply, _REPLY)
+        self.assertEqual(_SlowHandler.paths, ["http://api.invalid/v1/chat/completions"])
+
+    def test_proxied_transport_keeps_the_tracking_backend(self):
+        with _proxy_env(HTTPS_PROXY="http://proxy.invalid:3128", NO_PROXY="localhost,.internal"):
+            http = shared_http_client()
+            self.addCleanup(http.close)
+        proxied = _pool(http._transport_for_url(httpx.URL("https://api.openai.com/v1/models")))
+        self.assertIsInstance(proxied, httpcore.HTTPProxy)
+        self.assertIsInstance(proxied._network_backend, _TrackingBackend)
+        for bypassed in ("https://localhost:8080/", "https://llm.internal/v1"):
+            self.assertIs(http._transport_for_url(httpx.URL(bypassed)), http._transport)
+        self.assertNotIsInstance(_pool(http._transport), httpcore.HTTPProxy)
+
+    def test_no_proxy_variables_means_direct(self):
+        with _proxy_env():
+            http = shared_http_client()
+            self.addCleanup(http.close)
+        self.assertIs(http._transport_for_url(httpx.URL("https://api.openai.com/")), http._transport)
+        self.assertIsInstance(_pool(http._transport)._network_backend, _TrackingBackend)
+
+
+class TestServiceCancellation(unittest.TestCase):
+    def _service(self):
+        with patch("openai.OpenAI"):
+            service = AIService("openai", "k", "gpt-4.1-mini")
+        self.create = MagicMock()
+        service.client = MagicMock(**{"chat.completions.create": self.create})
+        return service
+
+    def test_cancelled_turn_is_not_sent(self):
+        service = self._service()
+        token = CancelToken()
+        token.cancel("new chat")
+        with self.assertRaises(TurnCancelled):
+            service.send_message(service.create_chat("prompt"), "Hi", cancel=token)
+        self.create.assert_not_called()
+
+    @patch("literaplay.ai_service._interruptible_sleep")
+    def test_cancelled_turn_is_not_retried(self, mock_sleep):
+        service = self._service()
+        token = CancelToken()
+
+        def cancel_then_fail(**_kwargs):
+            token.cancel("model changed")
+            raise RuntimeError("connection aborted")
+
+        self.create.side_effect = cancel_then_fail
+        with self.assertRaises(TurnCancelled):
+            service.send_message(service.create_chat("prompt"), "Hi", cancel=token)
+        self.assertEqual(self.create.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_remaining_time_becomes_the_request_timeout(self):
+        service = self._service()
+        self.create.return_value.choices = [MagicMock()]
+        service.send_message(service.create_chat("prompt"), "Hi", cancel=CancelToken(30.0))
+        self.assertLessEqual(self.create.call_args.kwargs["timeout"], 30.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
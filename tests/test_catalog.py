@@ -0,0 +1,142 @@
+import dataclasses
+import json
+import unittest
+
+from literaplay.catalog import DEFAULT_USER_CHARACTER, build_catalog, compile_situations, situation_details
+from literaplay.data import LIBRARY
+
+_LIBRARY = {
+    "book": {
+        "title": "Книга",
+        "color": "#111111",
+        "situations": [
+            {
+                "key": "s1",
+                "title": "Първа",
+                "character": "Марко",
+                "characters": "Марко, Иван",
+                "color": "#222222",
+                "prompt": "RULES\n\nLong prompt",
+                "intro": "Нощ.",
+                "first_message": "Кой е?",
+                "choices": ["Скрий се"],
+                "chapters": [
+                    {
+                        "id": "c1",
+                        "title": "Глава I",
+                        "setting": "Обор",
+                        "character_mood": "тревожен",
+                        "plot_summary": "...",
+                        "end_condition": "...",
+                        "text_chapter": "I. Гост",
+                    }
+                ],
+            },
+            {
+                "key": "s2",
+                "title": "Втора",
+                "character": "Рада",
+                "user_character": "Иван",
+                "prompt": "p",
+                "intro": "i",
+                "first_message": "f",
+            },
+        ],
+    }
+}
+
+
+class TestBuildCatalog(unittest.TestCase):
+    def test_keeps_card_fields_only(self):
+        catalog = build_catalog(_LIBRARY)
+        self.assertEqual(catalog["book"]["title"], "Книга")
+        self.assertEqual(catalog["book"]["color"], "#111111")
+        self.assertEqual(
+            catalog["book"]["situations"][0],
+            {"key": "s1", "title": "Първа", "character": "Марко", "characters": "Марко, Иван", "color": "#222222"},
+        )
+        self.assertEqual(catalog["book"]["situations"][1], {"key": "s2", "title": "Втора", "character": "Рада"})
+
+    def test_real_library_catalog_is_much_smaller(self):
+        full = len(json.dumps(LIBRARY))
+        slim = len(json.dumps(build_catalog(LIBRARY)))
+        self.assertLess(slim * 10, full)
+
+    def test_does_not_modify_library(self):
+        before = json.dumps(_LIBRARY, sort_keys=True)
+        build_catalog(_LIBRARY)
+        situation_details(compile_situations(_LIBRARY)[("book", "s1")])
+        self.assertEqual(json.dumps(_LIBRARY, sort_keys=True), before)
+
+
+class TestCompileSituations(unittest.TestCase):
+    def setUp(self):
+        self.index = compile_situations(_LIBRARY)
+
+    def test_indexed_by_work_and_key(self):
+        self.assertEqual(set(self.index), {("book", "s1"), ("book", "s2")})
+        sit = self.index[("book", "s1")]
+        self.assertEqual((sit.work_key, sit.key), ("book", "s1"))
+        self.assertIsNone(self.index.get(("book", "nope")))
+
+    def test_reads_like_the_source_dict(self):
+        sit = self.index[("book", "s1")]
+        self.assertEqual(sit["prompt"], "RULES\n\nLong prompt")
+        self.assertEqual(sit.get("intro"), "Нощ.")
+        self.assertIsNone(sit.get("user_character"))
+        self.assertIn("choices", sit)
+        self.assertEqual(sit["chapters"][0].get("text_chapter"), "I. Гост")
+
+    def test_immutable(self):
+        sit = self.index[("book", "s1")]
+        # The type checker rejects these writes too; the test checks they also fail at runtime
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            sit.key = "other"  # type: ignore[misc]
+        with self.assertRaises(TypeError):
+            sit.data["prompt"] = "x"  # type: ignore[index]
+        with self.assertRaises(TypeError):
+            sit["chapters"][0]["title"] = "x"
+        with self.assertRaises(AttributeError):
+            sit["choices"].append("x")
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            sit.chapter_defs[0].title = "x"  # type: ignore[misc]
+
+    def test_chapter_defs(self):
+        (chapter,) = self.index[("book", "s1")].chapter_defs
+        self.assertEqual((chapter.id, chapter.setting, chapter.text_chapter), ("c1", "Обор", "I. Гост"))
+        self.assertEqual(self.index[("book", "s2")].chapter_defs, ())
+
+    def test_every_library_situation_compiles(self):
+        index = compile_situations(LIBRARY)
+        for work_key, work in LIBRARY.items():
+            for sit in work["situations"]:
+                compiled = index[(work_key, sit["key"])]
+                self.assertEqual(len(compiled.chapter_defs), len(sit.get("chapters", [])))
+                self.assertIs(compiled["prompt"], sit["prompt"])  # shared, not copied
+
+
+class TestSituationDetails(unittest.TestCase):
+    def setUp(self):
+        self.index = compile_situations(_LIBRARY)
+
+    def test_details(self):
+        details = situation_details(self.index[("book", "s1")])
+        self.assertEqual(details["work"], "book")
+        self.assertEqual(details["key"], "s1")
+        self.assertEqual(details["intro"], "Нощ.")
+        self.assertEqual(details["first_message"], "Кой е?")
+        self.assertEqual(details["choices"], ["Скрий се"])
+        self.assertEqual(details["chapters"], ["Глава I"])
+        self.assertNotIn("prompt", details)
+        json.dumps(details)
+
+    def test_defaults(self):
+        details = situation_details(self.index[("book", "s1")])
+        self.assertEqual(details["user_character"], DEFAULT_USER_CHARACTER)
+        details = situation_details(self.index[("book", "s2")])
+        self.assertEqual(details["user_character"], "Иван")
+        self.assertEqual(details["color"], "#111111")  # falls back to the work colour
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests for character_lexicon (characters_present inference)."""
+
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from literaplay.book_loader import BookTextIndex
+from literaplay.character_lexicon import CharacterLexicon, _parse_names, build_character_lexicon
+
+_BOOK_TEXT = textwrap.dedent("""\
+    # Книга
+
+    ## I. Начало
+    Марко влезе в обора. Там беше Кралича. Децата на Марка спяха.
+    Морето шумеше далеч, а морето беше тъмно.
+""")
+
+_SITUATION = {
+    "character": "Бай Марко",
+    "user_character": "Иван Краличът",
+    "characters": "Бай Марко, Иван Краличът (ти), Морев, Иван Селямсъза, работници",
+}
+
+
+def _book() -> BookTextIndex:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "text.md"
+        path.write_text(_BOOK_TEXT, encoding="utf-8")
+        return BookTextIndex(path)
+
+
+class TestParseNames(unittest.TestCase):
+    def test_aliases_and_descriptors(self):
+        groups = _parse_names("Македонски (Желю хайдутина), Бръчков / Станка (ти), работници")
+        self.assertEqual(groups, [["Македонски", "Желю хайдутина"], ["Бръчков", "Станка"]])
+
+
+class TestCharacterLexicon(unittest.TestCase):
+    def setUp(self):
+        self.lexicon = build_character_lexicon(_SITUATION, _book())
+
+    def test_names_in_matches_whole_words(self):
+        self.assertEqual(self.lexicon.names_in("Марковото куче лае."), [])
+        self.assertEqual(self.lexicon.names_in("Бай Марко погледна."), ["Бай Марко"])
+
+    def test_inflected_forms_from_book(self):
+        self.assertEqual(self.lexicon.names_in("Видя децата на Марка."), ["Бай Марко"])
+        self.assertEqual(self.lexicon.names_in("Кралича трепереше."), ["Иван Краличът"])
+
+    def test_sentence_start_words_not_added(self):
+        # "Морето" extends the stem of "Морев" but is an ordinary word in the book
+        self.assertEqual(self.lexicon.names_in("Морето шумеше."), [])
+
+    def test_shared_first_name_is_ambiguous(self):
+        self.assertEqual(self.lexicon.names_in("Иван мълчеше."), [])
+        self.assertEqual(self.lexicon.names_in("Иван Селямсъза мълчеше."), ["Иван Селямсъза"])
+
+    def test_infer_present_from_speakers_and_narration(self):
+        reply = [
+            {"character": "Разказвач", "text": "Морев влезе тихо."},
+            {"character": "Бай Марко", "text": "Къде е Иван Селямсъза?"},
+        ]
+        self.assertEqual(self.lexicon.infer_present(reply), ["Бай Марко", "Иван Краличът", "Морев"])
+
+    def test_infer_present_caps_and_tolerates_bad_items(self):
+        lexicon = CharacterLexicon([["Ана"], ["Бора"]], main_character="Ана")
+        reply = ["bad", {"character": "Непознат", "text": "..."}, {"character": "Бора"}]
+        self.assertEqual(lexicon.infer_present(reply, cap=2), ["Ана", "Непознат"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -162,5 +162,63 @@ class TestSaveApiKey(unittest.TestCase):
             )
 
 
+class TestPerProviderSettings(unittest.TestCase):
+    """Tests for per-provider env parsing (e.g. LITERAPLAY_STATE_ENCODING)."""
+
+    def test_empty_uses_default(self):
+        from literaplay.config import STATE_ENCODINGS, _parse_per_provider
+
+        result = _parse_per_provider("", STATE_ENCODINGS, "full")
+        self.assertEqual(set(result.values()), {"full"})
+
+    def test_bare_value_applies_to_all(self):
+        from literaplay.config import STATE_ENCODINGS, _parse_per_provider
+
+        result = _parse_per_provider("delta", STATE_ENCODINGS, "full")
+        self.assertEqual(result, {"openai": "delta", "gemini": "delta", "anthropic": "delta"})
+
+    def test_per_provider_overrides_bare_value(self):
+        from literaplay.config import STATE_ENCODINGS, _parse_per_provider
+
+        result = _parse_per_provider("openai=full, delta", STATE_ENCODINGS, "full")
+        self.assertEqual(result["openai"], "full")
+        self.assertEqual(result["gemini"], "delta")
+
+    def test_invalid_entries_ignored(self):
+        from literaplay.config import STATE_ENCODINGS, _parse_per_provider
+
+        result = _parse_per_provider("bogus,mistral=delta,gemini=zip", STATE_ENCODINGS, "full")
+        self.assertEqual(set(result.values()), {"full"})
+        self.assertNotIn("mistral", result)
+
+    def test_get_state_encoding_unknown_provider(self):
+        from literaplay.config import get_state_encoding
+
+        self.assertEqual(get_state_encoding("unknown"), "full")
+
+    def test_structured_output_defaults_to_schema(self):
+        from literaplay.config import STRUCTURED_OUTPUTS, _parse_per_provider, get_structured_output
+
+        self.assertEqual(get_structured_output("unknown"), "schema")
+        result = _parse_per_provider("openai=json", STRUCTURED_OUTPUTS, "schema")
+        self.assertEqual(result, {"openai": "json", "gemini": "schema", "anthropic": "schema"})
+
+    def test_transport_defaults_to_sdk(self):
+        from literaplay.config import TRANSPORTS, _parse_per_provider, get_transport
+
+        self.assertEqual(get_transport("unknown"), "sdk")
+        result = _parse_per_provider("gemini=rest", TRANSPORTS, "sdk")
+        self.assertEqual(result, {"openai": "sdk", "gemini": "rest", "anthropic": "sdk"})
+
+    def test_fast_models(self):
+        from literaplay.config import DEFAULT_FAST_MODELS, _parse_fast_models
+
+        self.assertEqual(_parse_fast_models(""), DEFAULT_FAST_MODELS)
+        result = _parse_fast_models("openai=gpt-4.1-mini, gemini=off, anthropic=gpt-4.1, other=x")
+        self.assertEqual(result["openai"], "gpt-4.1-mini")
+        self.assertIsNone(result["gemini"])
+        self.assertEqual(result["anthropic"], "claude-haiku-4-5")  # not an Anthropic model
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -25,7 +25,8 @@ class TestDependencyCompat(unittest.TestCase):
         load_fn, set_fn = compat.load_dotenv_functions()
         # Fallback functions should be callable without error
         load_fn()
-        set_fn(".env", "KEY", "VALUE")
+        with tempfile.TemporaryDirectory() as tmp:
+            set_fn(os.path.join(tmp, ".env"), "KEY", "VALUE")
         # Ensure we didn't crash
         self.assertTrue(True)
 
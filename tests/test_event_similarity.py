@@ -0,0 +1,94 @@
+"""Tests for event_similarity (near-duplicate key_event detection)."""
+
+import unittest
+
+from literaplay.event_similarity import DEFAULT_THRESHOLD, NearDuplicateIndex, jaccard, shingle_set, similarity
+
+
+class TestShingleSet(unittest.TestCase):
+    def test_latin_homoglyphs_folded_in_cyrillic_words(self):
+        self.assertEqual(shingle_set("Краличa"), shingle_set("Кралича"))
+
+    def test_inflected_forms_share_stem(self):
+        self.assertEqual(shingle_set("Кралича"), shingle_set("Краличът"))
+
+    def test_honorifics_and_prepositions_ignored(self):
+        self.assertEqual(shingle_set("Бай Марко в обора"), shingle_set("Марко обора"))
+
+    def test_empty_text(self):
+        self.assertEqual(shingle_set(""), frozenset())
+        self.assertEqual(shingle_set("в на"), frozenset())
+
+    def test_jaccard_bounds(self):
+        a = shingle_set("Марко скри Кралича")
+        self.assertEqual(jaccard(a, a), 1.0)
+        self.assertEqual(jaccard(a, frozenset()), 0.0)
+
+
+class TestSimilarity(unittest.TestCase):
+    def test_rephrasings_reach_the_threshold(self):
+        for a, b in (
+            ("Марко скри Кралича в обора", "Бай Марко скрива Кралича"),
+            ("Огнянов пристигна в Бяла черква", "Огнянов пристига в Бяла черква"),
+            ("Кралича избяга от затвора", "Кралича избяга от затвора във Видин"),
+        ):
+            with self.subTest(a=a, b=b):
+                self.assertGreaterEqual(similarity(a, b), DEFAULT_THRESHOLD)
+
+    def test_different_beats_stay_below_it(self):
+        for a, b in (
+            ("Рада целуна Огнянов", "Рада не целуна Огнянов"),
+            ("Огнянов уби турчина", "Огнянов не уби турчина"),
+            ("Стефчов предаде Огнянов", "Огнянов предаде Стефчов"),
+            ("Марко даде пищов на Кралича", "Марко взе пищова от Кралича"),
+            ("съгласи да скрие", "отказа да скрие"),
+        ):
+            with self.subTest(a=a, b=b):
+                self.assertLess(similarity(a, b), DEFAULT_THRESHOLD)
+
+    def test_negation_is_never_merged(self):
+        event = "Рада целуна Огнянов вечерта в градината пред всички"
+        self.assertEqual(similarity(event, event.replace("целуна", "не целуна")), 0.0)
+        self.assertEqual(similarity("Огнянов не уби турчина", "Огнянов никога не уби турчина"), 1.0)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NearDuplicateIndex()
+        self.index.add("Марко скри Краличa в обора")
+
+    def test_rephrased_event_matches(self):
+        self.assertEqual(self.index.find("Бай Марко скрива Кралича"), "Марко скри Краличa в обора")
+
+    def test_exact_event_matches(self):
+        self.assertEqual(self.index.find("Марко скри Краличa в обора"), "Марко скри Краличa в обора")
+
+    def test_different_beat_does_not_match(self):
+        self.assertIsNone(self.index.find("Марко предаде Кралича"))
+        self.assertIsNone(self.index.find("Ирина напусна салона"))
+
+    def test_negated_and_role_swapped_events_do_not_match(self):
+        self.index.add("Стефчов предаде Огнянов")
+        self.assertIsNone(self.index.find("Марко не скри Кралича в обора"))
+        self.assertIsNone(self.index.find("Огнянов предаде Стефчов"))
+
+    def test_remove(self):
+        self.index.remove("Марко скри Краличa в обора")
+        self.assertEqual(len(self.index), 0)
+        self.assertIsNone(self.index.find("Бай Марко скрива Кралича"))
+        self.assertEqual(self.index._buckets, {})
+
+    def test_threshold_above_one_disables_fuzzy_matching(self):
+        index = NearDuplicateIndex(threshold=1.01)
+        index.add("Марко скри Кралича в обора")
+        self.assertIsNone(index.find("Бай Марко скрива Кралича"))
+        self.assertIsNotNone(index.find("Марко скри Кралича в обора"))
+
+    def test_strict_threshold(self):
+        index = NearDuplicateIndex(threshold=0.9)
+        index.add("Марко скри Кралича в обора")
+        self.assertIsNone(index.find("Бай Марко скрива Кралича"))
+
+
+if __name__ == "__main__":
+    unittest.main()
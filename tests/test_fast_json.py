@@ -0,0 +1,83 @@
+"""Tests for fast_json (typed decoding of story responses)."""
+
+import json
+import unittest
+
+from literaplay import fast_json
+from literaplay.fast_json import ReplyLine, StoryResponse, decode_story_response
+from literaplay.response_parser import validate_story_response
+
+_TEXT = json.dumps(
+    {
+        "reply": [{"character": "Бай Марко", "text": "Кой е там?"}],
+        "options": ["Излез", "Мълчи"],
+        "ended": False,
+        "mood": "подозрителен",
+        "trust_level": -1,
+        "characters_present": ["Бай Марко"],
+    },
+    ensure_ascii=False,
+)
+
+
+class TestDecodeStoryResponse(unittest.TestCase):
+    """Run against the configured backend, and by TestDictFallback against the dict fallback."""
+
+    decode = staticmethod(decode_story_response)
+
+    def test_decodes_into_structs(self):
+        result = self.decode(_TEXT)
+        assert isinstance(result, StoryResponse)
+        self.assertEqual(result.reply, [ReplyLine("Бай Марко", "Кой е там?")])
+        self.assertEqual(result.trust_level, -1)
+        self.assertIsNone(result.tension)
+
+    def test_legacy_string_reply(self):
+        result = self.decode('{"reply": "здравей", "options": [], "ended": true}')
+        assert result is not None
+        self.assertEqual(result.reply, "здравей")
+        self.assertTrue(result.ended)
+
+    def test_mismatches_return_none(self):
+        for text in (
+            '{"reply": [{"character": "A"}], "options": [], "ended": false}',
+            '{"reply": "x", "options": [], "ended": false, "mood": 3}',
+            '{"reply": "x", "options": []}',
+            '{"reply": null, "options": [], "ended": false}',
+            '```json\\n{"reply": "x", "options": [], "ended": false}\\n```',
+            "[]",
+        ):
+            with self.subTest(text=text):
+                self.assertIsNone(self.decode(text))
+
+
+class TestDictFallback(TestDecodeStoryResponse):
+    @staticmethod
+    def decode(text):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        return fast_json._from_dict(data)
+
+
+class TestStoryResponse(unittest.TestCase):
+    def test_to_dict_omits_missing_metadata(self):
+        result = decode_story_response(_TEXT)
+        assert result is not None
+        self.assertEqual(result.to_dict(), json.loads(_TEXT))
+
+    def test_validate_accepts_struct(self):
+        response = StoryResponse([ReplyLine("Марко", "Кой е?")], ["a"], False, trust_level=7, mood="спокоен")
+        result = validate_story_response(response)
+        self.assertEqual(result["reply"], [{"character": "Марко", "text": "Кой е?"}])
+        self.assertEqual(result["mood"], "спокоен")
+        self.assertNotIn("trust_level", result)
+
+    def test_dumps_round_trip(self):
+        payload = {"sender": "Бай Марко", "text": 'Кой "е" там?', "isUser": False}
+        self.assertEqual(json.loads(fast_json.dumps(payload)), payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Tests for json_repair (local repair of malformed model output)."""
+
+import json
+import unittest
+
+from literaplay.json_repair import repair_json
+
+_GOOD = json.dumps(
+    {
+        "reply": [
+            {"character": "Разказвач", "text": "Нощта е тъмна."},
+            {"character": "Бай Марко", "text": "Кой е там?"},
+        ],
+        "options": ["Излез", "Мълчи"],
+        "ended": False,
+    },
+    ensure_ascii=False,
+)
+
+
+class TestRepairJson(unittest.TestCase):
+    def test_valid_json_untouched(self):
+        result = repair_json(_GOOD)
+        self.assertEqual(result.value, json.loads(_GOOD))
+        self.assertEqual(result.confidence, 1.0)
+        self.assertEqual(result.fixes, {})
+
+    def test_truncated_inside_string(self):
+        result = repair_json(_GOOD[: _GOOD.index("там?")])
+        assert result.value is not None
+        self.assertEqual(result.value["reply"][-1], {"character": "Бай Марко", "text": "Кой е "})
+        self.assertIn("closed_string", result.fixes)
+        self.assertLess(result.confidence, 1.0)
+
+    def test_truncated_reply_item_without_text_dropped(self):
+        result = repair_json(_GOOD[: _GOOD.index('"text": "Кой')])
+        assert result.value is not None
+        self.assertEqual(len(result.value["reply"]), 1)
+
+    def test_dangling_key_dropped(self):
+        for cut in ('"ended": fa', '"ended": ', '"ended"', '"end'):
+            with self.subTest(cut=cut):
+                result = repair_json(_GOOD[: _GOOD.index(cut) + len(cut)])
+                assert result.value is not None
+                self.assertNotIn("ended", result.value)
+                self.assertEqual(result.value["options"], ["Излез", "Мълчи"])
+
+    def test_every_truncation_parses(self):
+        for cut in range(1, len(_GOOD)):
+            with self.subTest(cut=cut):
+                result = repair_json(_GOOD[:cut])
+                self.assertTrue(result.value is None or isinstance(result.value, dict))
+                self.assertGreaterEqual(result.confidence, 0.0)
+
+    def test_trailing_commas(self):
+        result = repair_json('{"reply": "a", "options": ["x", "y",],}')
+        self.assertEqual(result.value, {"reply": "a", "options": ["x", "y"]})
+        self.assertEqual(result.fixes, {"trailing_comma": 2})
+
+    def test_unescaped_quotes_in_dialogue(self):
+        result = repair_json('{"reply": "Той каза: "не, благодаря", и си тръгна.", "options": []}')
+        assert result.value is not None
+        self.assertEqual(result.value["reply"], 'Той каза: "не, благодаря", и си тръгна.')
+
+    def test_quote_variants_and_python_literals(self):
+        result = repair_json("{'reply': “Здравей”, 'options': ['а'], 'ended': False}")
+        self.assertEqual(result.value, {"reply": "Здравей", "options": ["а"], "ended": False})
+
+    def test_missing_comma_and_raw_newline(self):
+        result = repair_json('```json\n{"reply": "ред\nдруг ред"\n "options": ["x"]}\n```')
+        self.assertEqual(result.value, {"reply": "ред\nдруг ред", "options": ["x"]})
+
+    def test_unrecoverable(self):
+        self.assertIsNone(repair_json("няма JSON тук").value)
+        self.assertEqual(repair_json("").confidence, 0.0)
+
+    def test_missing_reply_lowers_confidence(self):
+        self.assertLess(repair_json('{"options": ["x"]').confidence, 0.5)
+
+    def test_input_clipped(self):
+        result = repair_json('{"reply": "' + "а" * 100 + '"}', max_chars=50)
+        self.assertIn("clipped_input", result.fixes)
+
+
+if __name__ == "__main__":
+    unittest.main()
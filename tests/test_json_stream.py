@@ -0,0 +1,91 @@
+"""Tests for json_stream (incremental JSON scanning of model output)."""
+
+import json
+import unittest
+
+from literaplay.json_stream import StreamingJSONParser, parse_first_object
+
+_RESPONSE = {
+    "reply": [
+        {"character": "Разказвач", "text": "Нощта е тиха. {Някой} чука на вратата."},
+        {"character": "Бай Марко", "text": 'Кой е там? Кажи \\"парола\\"!'},
+    ],
+    "options": ["Отвори", "Скрий се", "Извикай"],
+    "ended": False,
+    "meta": {"nested": [1, {"a": "]"}]},
+}
+
+
+def _events(parser: StreamingJSONParser, chunks) -> list[tuple[str, object]]:
+    return [(e.kind, e.value) for chunk in chunks for e in parser.feed(chunk)]
+
+
+class TestStreamingJSONParser(unittest.TestCase):
+    def setUp(self):
+        self.text = "Ето отговора:\n```json\n" + json.dumps(_RESPONSE, ensure_ascii=False) + "\n```"
+
+    def test_whole_text(self):
+        events = _events(StreamingJSONParser(), [self.text])
+        self.assertEqual([kind for kind, _ in events], ["reply", "reply", "options", "object"])
+        self.assertEqual(events[0][1], _RESPONSE["reply"][0])
+        self.assertEqual(events[2][1], _RESPONSE["options"])
+        self.assertEqual(events[3][1], _RESPONSE)
+
+    def test_single_character_chunks_give_same_events(self):
+        whole = _events(StreamingJSONParser(), [self.text])
+        streamed = _events(StreamingJSONParser(), list(self.text))
+        self.assertEqual(streamed, whole)
+
+    def test_reply_items_arrive_before_object_closes(self):
+        parser = StreamingJSONParser()
+        cut = self.text.index('"options"')
+        events = _events(parser, [self.text[:cut]])
+        self.assertEqual([kind for kind, _ in events], ["reply", "reply"])
+        self.assertFalse(parser.done)
+
+    def test_split_escape_sequence(self):
+        text = '{"reply": ["a\\"}b"], "options": []}'
+        cut = text.index("\\") + 1
+        events = _events(StreamingJSONParser(), [text[:cut], text[cut:]])
+        self.assertEqual(events[0], ("reply", 'a"}b'))
+
+    def test_scalars_split_across_chunks(self):
+        chunks = ['{"reply": [12', '3, "x", nu', "ll, tr", "ue], ", '"ended": fal', "se}"]
+        events = _events(StreamingJSONParser(), chunks)
+        self.assertEqual(events[:4], [("reply", 123), ("reply", "x"), ("reply", None), ("reply", True)])
+        self.assertEqual(events[4], ("object", {"reply": [123, "x", None, True], "ended": False}))
+
+    def test_every_split_point_gives_same_events(self):
+        text = json.dumps({"reply": [1.5, "a", None, {"t": "b"}, False], "options": ["x"], "n": -20})
+        whole = _events(StreamingJSONParser(), [text])
+        for cut in range(1, len(text)):
+            with self.subTest(cut=cut):
+                self.assertEqual(_events(StreamingJSONParser(), [text[:cut], text[cut:]]), whole)
+
+    def test_invalid_candidate_skipped(self):
+        parser = StreamingJSONParser()
+        _events(parser, ['Шаблон {reply} и после {"reply": "ok"} край'])
+        self.assertEqual(parser.result, {"reply": "ok"})
+
+    def test_input_after_object_ignored(self):
+        parser = StreamingJSONParser()
+        self.assertEqual(_events(parser, ['{"a": 1}', '{"b": 2}']), [("object", {"a": 1})])
+
+    def test_incomplete_object(self):
+        parser = StreamingJSONParser()
+        _events(parser, ['{"reply": [{"text": "нещо"'])
+        self.assertFalse(parser.done)
+        self.assertIsNone(parser.result)
+
+
+class TestParseFirstObject(unittest.TestCase):
+    def test_braces_inside_strings(self):
+        text = 'prefix {"reply": "Той каза: }{ и замълча", "options": []} suffix'
+        self.assertEqual(parse_first_object(text), {"reply": "Той каза: }{ и замълча", "options": []})
+
+    def test_no_object(self):
+        self.assertIsNone(parse_first_object("само текст"))
+
+
+if __name__ == "__main__":
+    unittest.main()
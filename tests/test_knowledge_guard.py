@@ -0,0 +1,186 @@
+"""Tests for knowledge_guard (future-chapter leak detection)."""
+
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from literaplay.book_loader import BookTextIndex, load_book_texts, load_library
+from literaplay.knowledge_guard import (
+    AhoCorasick,
+    LeakDetector,
+    build_leak_detector,
+    future_terms,
+    mask_leaks,
+    shared_vocabulary,
+)
+
+_BOOK_TEXT = textwrap.dedent("""\
+    # Книга
+
+    ## I. Начало
+    Марко влезе в обора. Там беше Иван. Марко каза на Иван да мълчи.
+
+    ## II. Среща
+    Огнянов пристигна. Там го чакаше Рада. Рада и Огнянов говориха дълго.
+    Пролетта дойде. Пролетта беше топла, а пролетта носеше надежда.
+
+    ## III. Край
+    Огнянова къща гореше. Стефчов донесе. Марко плака.
+""")
+
+_SITUATION = {
+    "character": "Марко",
+    "prompt": "You are Марко.",
+    "intro": "Нощ.",
+    "chapters": [
+        {
+            "id": "ch1",
+            "title": "Начало",
+            "text_chapter": "I. Начало",
+            "setting": "Обор",
+            "character_mood": "тревожен",
+            "plot_summary": "Марко намира Иван.",
+            "end_condition": "Иван заспива.",
+        },
+        {
+            "id": "ch2",
+            "title": "Край",
+            "setting": "Църква",
+            "character_mood": "скръбен",
+            "plot_summary": "Соколов идва при Марко.",
+            "end_condition": "Соколов си тръгва.",
+        },
+    ],
+}
+
+
+def _book() -> BookTextIndex:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "text.md"
+        path.write_text(_BOOK_TEXT, encoding="utf-8")
+        return BookTextIndex(path)
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_finds_overlapping_patterns(self):
+        ac = AhoCorasick(["he", "she", "his", "hers"])
+        matches = sorted((end, ac.patterns[idx]) for end, idx in ac.iter_matches("ushers"))
+        self.assertEqual(matches, [(4, "he"), (4, "she"), (6, "hers")])
+
+    def test_no_patterns(self):
+        self.assertEqual(list(AhoCorasick([]).iter_matches("abc")), [])
+
+
+class TestLeakDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = LeakDetector(["Огнянов", "Рада", "Боримечката"])
+
+    def test_matches_inflected_name(self):
+        leaks = self.detector.scan("Не познавам Огнянова.")
+        self.assertEqual([leak.term for leak in leaks], ["Огнянов"])
+        self.assertEqual("Не познавам Огнянова."[leaks[0].start : leaks[0].end], "Огнянова")
+
+    def test_case_insensitive(self):
+        self.assertEqual(len(self.detector.scan("БОРИМЕЧКАТА е тук")), 1)
+
+    def test_requires_word_start(self):
+        self.assertEqual(self.detector.scan("Зарада на всичко"), [])
+
+    def test_rejects_long_continuation(self):
+        self.assertEqual(self.detector.scan("Радостина дойде"), [])
+
+    def test_streamed_chunks_match_whole_text(self):
+        text = "Рада каза, че Огнянов и Боримечката са тук. Рада!"
+        whole = self.detector.scan(text)
+        scanner = self.detector.scanner()
+        streamed = []
+        for i in range(0, len(text), 3):
+            streamed += scanner.feed(text[i : i + 3])
+        streamed += scanner.finish()
+        self.assertEqual(streamed, whole)
+        self.assertEqual(len(whole), 4)
+
+    def test_mask_leaks(self):
+        text = "Рада и Огнянов."
+        self.assertEqual(mask_leaks(text, self.detector.scan(text)), "… и ….")
+
+
+class TestFutureTerms(unittest.TestCase):
+    def test_later_book_chapters_and_meta(self):
+        terms = future_terms(_SITUATION["chapters"], 0, _book(), known_text=_SITUATION["prompt"])
+        self.assertIn("Огнянов", terms)
+        self.assertIn("Рада", terms)
+        self.assertIn("Соколов", terms)
+        # Known from the current chapter
+        self.assertNotIn("Марко", terms)
+        self.assertNotIn("Иван", terms)
+        # Ordinary word capitalized at sentence start
+        self.assertNotIn("Пролетта", terms)
+        # Seen only once
+        self.assertNotIn("Стефчов", terms)
+
+    def test_last_chapter_has_no_meta_future(self):
+        terms = future_terms(_SITUATION["chapters"], 1)
+        self.assertEqual(terms, [])
+
+    def test_build_leak_detector(self):
+        detector = build_leak_detector(_SITUATION, 0, _book())
+        self.assertEqual([leak.term for leak in detector.scan("Къде е Рада?")], ["Рада"])
+        self.assertEqual(detector.scan("Марко мълчи."), [])
+
+    def test_known_terms_and_inflected_known_names(self):
+        situation = {**_SITUATION, "known_terms": "Рада"}
+        terms = future_terms(
+            situation["chapters"], 0, _book(), known_text="Иване, Огнянова " + situation["known_terms"]
+        )
+        self.assertNotIn("Рада", terms)
+        self.assertNotIn("Огнянов", terms)
+
+    def test_names_shared_between_books_are_common(self):
+        other = _book()
+        terms = future_terms(_SITUATION["chapters"], 0, _book(), common=shared_vocabulary((_book(), other)))
+        self.assertNotIn("Огнянов", terms)
+        self.assertIn("Соколов", terms)  # from the meta chapters only
+
+
+class TestRealBooks(unittest.TestCase):
+    """Term lists for the shipped books stay free of ordinary and already-known words."""
+
+    @classmethod
+    def setUpClass(cls):
+        books_dir = Path(__file__).resolve().parent.parent / "books"
+        cls.library = load_library(books_dir)
+        cls.texts = load_book_texts(books_dir)
+
+    def _detector(self, work_key, situation_key):
+        situation = next(s for s in self.library[work_key]["situations"] if s["key"] == situation_key)
+        return build_leak_detector(situation, 0, self.texts[work_key], tuple(self.texts.values()))
+
+    def test_every_text_chapter_exists_in_the_book(self):
+        for work_key, work in self.library.items():
+            titles = self.texts[work_key].titles()
+            for situation in work["situations"]:
+                for chapter in situation["chapters"]:
+                    self.assertIn(chapter.get("text_chapter"), titles, situation["key"])
+
+    def test_ordinary_and_general_words_are_not_future_terms(self):
+        detector = self._detector("nemili", "nemili_sit1")
+        for word in ("Браво", "Русия", "Иван", "Попе", "Извинете", "Здравствуй", "Мястото", "Букурещ"):
+            self.assertEqual(detector.scan(word), [], word)
+        self.assertNotEqual(detector.scan("Гюргево"), [])
+
+    def test_townsfolk_known_to_bai_marko(self):
+        detector = self._detector("pod_igoto", "pod_igoto_sit1")
+        for word in ("Мичо", "Колчо", "Колча", "Клисура", "Иване"):
+            self.assertEqual(detector.scan(word), [], word)
+        self.assertNotEqual(detector.scan("Боримечката"), [])
+
+    def test_every_situation_with_a_future_has_terms(self):
+        for work_key, situation_key in (("tyutyun", "tyutyun_sit1"), ("tyutyun", "tyutyun_sit2")):
+            detector = self._detector(work_key, situation_key)
+            self.assertGreater(len(detector), 10, situation_key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,14 @@
 """Tests for main.py helper functions.
 
-Covers _format_reply_messages and _build_library_json (T-01).
+Covers _format_reply_messages, _build_catalog_json (T-01) and the batched
+turn payload.
 """
 
 import json
 import re
 import unittest
 
-from literaplay.main import _build_library_json, _format_reply_messages
+from literaplay.main import _build_catalog_json, _ended_text, _format_reply_messages, _TurnUpdate
 
 # Copy of the injection regex from main.py for testing without Qt dependency
 _INJECTION_RE = re.compile(
@@ -68,43 +69,33 @@ class TestFormatReplyMessages(unittest.TestCase):
             self.assertFalse(msg["isSystem"])
 
 
-class TestBuildLibraryJson(unittest.TestCase):
-    """T-01: Tests for _build_library_json helper."""
-
-    @classmethod
-    def setUpClass(cls):
-        # Reset the cache so we get a fresh build
-        import literaplay.main as main_mod
-
-        main_mod._LIBRARY_JSON_CACHE = None
+class TestBuildCatalogJson(unittest.TestCase):
+    """T-01: Tests for _build_catalog_json helper."""
 
     def test_returns_valid_json(self):
-        result = _build_library_json()
+        result = _build_catalog_json()
         parsed = json.loads(result)
         self.assertIsInstance(parsed, dict)
 
     def test_contains_all_library_keys(self):
-        result = _build_library_json()
+        result = _build_catalog_json()
         parsed = json.loads(result)
         self.assertIn("pod_igoto", parsed)
         self.assertIn("nemili", parsed)
         self.assertIn("tyutyun", parsed)
 
-    def test_situations_have_user_character(self):
-        result = _build_library_json()
-        parsed = json.loads(result)
-        for work_key, work in parsed.items():
-            for i, sit in enumerate(work.get("situations", [])):
-                self.assertIn(
-                    "user_character",
-                    sit,
-                    f"Missing user_character in {work_key} situations[{i}]",
-                )
+    def test_situations_omit_prompts(self):
+        parsed = json.loads(_build_catalog_json())
+        for work in parsed.values():
+            for sit in work["situations"]:
+                self.assertIn("key", sit)
+                self.assertNotIn("prompt", sit)
+                self.assertNotIn("chapters", sit)
 
     def test_result_is_cached(self):
         """Second call returns the same string object (cached)."""
-        first = _build_library_json()
-        second = _build_library_json()
+        first = _build_catalog_json()
+        second = _build_catalog_json()
         self.assertIs(first, second)
 
 
@@ -157,6 +148,32 @@ class TestInjectionRegex(unittest.TestCase):
         self.assertEqual(result.strip(), "")
 
 
+class TestTurnUpdate(unittest.TestCase):
+    """Tests for the turnCompleted payload."""
+
+    def test_payload_contains_only_present_parts(self):
+        turn = _TurnUpdate(messages=[{"sender": "A", "text": "hi", "isUser": False, "isSystem": False}], options=["x"])
+        payload = turn.to_payload()
+        self.assertEqual(set(payload), {"messages", "loading", "options"})
+        self.assertFalse(payload["loading"])
+        json.dumps(payload)
+
+    def test_chapter_transition_and_progress(self):
+        turn = _TurnUpdate(chapter_title="Глава II", progress={"turn": 1}, options=[])
+        payload = turn.to_payload()
+        self.assertEqual(payload["chapterTransition"], "Глава II")
+        self.assertEqual(payload["progress"], {"turn": 1})
+        self.assertEqual(payload["messages"], [])
+
+    def test_loading_when_a_queued_turn_follows(self):
+        self.assertTrue(_TurnUpdate(loading=True).to_payload()["loading"])
+
+    def test_ended_text(self):
+        self.assertEqual(_ended_text([{"text": "a"}, {"text": "b"}]), "a\n\nb")
+        self.assertEqual(_ended_text("край"), "край")
+        self.assertEqual(_TurnUpdate(ended_text="край").to_payload()["ended"], "край")
+
+
 class TestMaxUserMessageChars(unittest.TestCase):
     """Tests for the message length cap constant."""
 
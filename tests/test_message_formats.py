@@ -0,0 +1,77 @@
+import unittest
+from types import SimpleNamespace
+
+from literaplay.message_formats import from_portable, to_anthropic, to_portable
+
+_HISTORY = [
+    {"role": "user", "content": "Здравей"},
+    {"role": "assistant", "content": '{"reply": []}'},
+    {"role": "user", "content": "Кой си ти?"},
+]
+
+
+class TestRoundTrips(unittest.TestCase):
+    def test_every_provider_round_trips(self):
+        for provider in ("openai", "anthropic", "gemini"):
+            with self.subTest(provider=provider):
+                self.assertEqual(to_portable(provider, from_portable(provider, _HISTORY)), _HISTORY)
+
+    def test_gemini_format(self):
+        contents = from_portable("gemini", _HISTORY)
+        self.assertEqual(contents[1], {"role": "model", "parts": [{"text": '{"reply": []}'}]})
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            to_portable("other", [])
+
+
+class TestFromProviders(unittest.TestCase):
+    def test_openai_drops_system_and_joins_parts(self):
+        messages = [
+            {"role": "system", "content": "prompt"},
+            {"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "text", "text": "b"}]},
+        ]
+        self.assertEqual(to_portable("openai", messages), [{"role": "user", "content": "ab"}])
+
+    def test_anthropic_blocks(self):
+        messages = [
+            {"role": "user", "content": "Hi"},
+            {
+                "role": "assistant",
+                "content": [
+                    {"type": "thinking", "thinking": "..."},
+                    {"type": "tool_use", "name": "story_response", "input": {"reply": "Кой е?"}},
+                ],
+            },
+        ]
+        self.assertEqual(to_portable("anthropic", messages)[1]["content"], '{"reply": "Кой е?"}')
+
+    def test_gemini_sdk_objects_skip_thoughts(self):
+        contents = [
+            SimpleNamespace(role="user", parts=[SimpleNamespace(text="Hi", thought=None)]),
+            SimpleNamespace(
+                role="model",
+                parts=[SimpleNamespace(text="thinking...", thought=True), SimpleNamespace(text="{}", thought=None)],
+            ),
+        ]
+        self.assertEqual(
+            to_portable("gemini", contents), [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "{}"}]
+        )
+
+
+class TestToAnthropic(unittest.TestCase):
+    def test_starts_with_user_and_alternates(self):
+        history = [
+            {"role": "assistant", "content": "intro"},
+            {"role": "user", "content": "a"},
+            {"role": "user", "content": "b"},
+            {"role": "assistant", "content": "c"},
+        ]
+        self.assertEqual(
+            to_anthropic(history),
+            [{"role": "user", "content": "a\n\nb"}, {"role": "assistant", "content": "c"}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
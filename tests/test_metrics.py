@@ -0,0 +1,168 @@
+"""Tests for metrics module."""
+
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+from literaplay import metrics
+from literaplay.ai_service import AIService, APIOverloadedError
+from literaplay.metrics import CONTENT_TYPE, MetricsServer, Registry
+from literaplay.response_parser import validate_story_response
+from literaplay.story_state import ChapterDef
+
+
+def _scrape(text: str) -> dict[str, float]:
+    """Samples of a text-format exposition, keyed by name and labels as written."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            samples[series] = float(value)
+    return samples
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_and_gauge(self):
+        turns = self.registry.counter("turns_total", "Turns.", ("outcome",))
+        turns.labels("ok").inc()
+        turns.labels("ok").inc(2)
+        turns.labels("error").inc()
+        depth = self.registry.gauge("queue_depth", "Queued.")
+        depth.inc(3)
+        depth.dec()
+
+        text = self.registry.render()
+        self.assertIn("# HELP turns_total Turns.\n# TYPE turns_total counter\n", text)
+        self.assertIn("# TYPE queue_depth gauge\n", text)
+        self.assertEqual(
+            _scrape(text), {'turns_total{outcome="error"}': 1, 'turns_total{outcome="ok"}': 3, "queue_depth": 2}
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = self.registry.histogram("latency_seconds", "Latency.", ("model",), buckets=(1.0, 5.0))
+        for value in (0.5, 1.0, 3.0, 9.0):
+            latency.labels("m").observe(value)
+
+        samples = _scrape(self.registry.render())
+        self.assertEqual(samples['latency_seconds_bucket{model="m",le="1"}'], 2)  # le is inclusive
+        self.assertEqual(samples['latency_seconds_bucket{model="m",le="5"}'], 3)
+        self.assertEqual(samples['latency_seconds_bucket{model="m",le="+Inf"}'], 4)
+        self.assertEqual(samples['latency_seconds_count{model="m"}'], 4)
+        self.assertEqual(samples['latency_seconds_sum{model="m"}'], 13.5)
+
+    def test_label_values_are_escaped(self):
+        self.registry.counter("errors_total", "Errors.", ("kind",)).labels('a "b"\\\n').inc()
+        self.assertIn('errors_total{kind="a \\"b\\"\\\\\\n"} 1', self.registry.render())
+
+    def test_wrong_labels_and_duplicates_are_rejected(self):
+        counter = self.registry.counter("calls_total", "Calls.", ("provider",))
+        with self.assertRaises(ValueError):
+            counter.labels("openai", "extra")
+        with self.assertRaises(ValueError):
+            self.registry.counter("calls_total", "Again.")
+
+    def test_concurrent_updates_are_not_lost(self):
+        counter = self.registry.counter("hits_total", "Hits.", ("worker",))
+        histogram = self.registry.histogram("seconds", "Seconds.")
+
+        def hit():
+            for _ in range(10_000):
+                counter.labels("w").inc()
+                histogram.observe(0.1)
+
+        threads = [threading.Thread(target=hit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        samples = _scrape(self.registry.render())
+        self.assertEqual(samples['hits_total{worker="w"}'], 80_000)
+        self.assertEqual(samples["seconds_count"], 80_000)
+
+
+class TestMetricsServer(unittest.TestCase):
+    """A local scraper against the HTTP endpoint."""
+
+    def setUp(self):
+        self.registry = Registry()
+        self.registry.counter("scraped_total", "Scrapes.").inc(7)
+        self.server = MetricsServer(self.registry, port=0)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_scrape(self):
+        with urllib.request.urlopen(self.server.url, timeout=5) as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers["Content-Type"], CONTENT_TYPE)
+            samples = _scrape(response.read().decode("utf-8"))
+        self.assertEqual(samples, {"scraped_total": 7})
+
+    def test_other_paths_are_not_found(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            urllib.request.urlopen(self.server.url.replace("/metrics", "/"), timeout=5)
+        self.assertEqual(ctx.exception.code, 404)
+
+
+def _value(metric, *labels) -> float:
+    return metric.labels(*labels).value
+
+
+class TestInstrumentation(unittest.TestCase):
+    def _service(self):
+        with patch("openai.OpenAI"):
+            service = AIService("openai", "k", "metrics-test-model")
+        self.create = MagicMock()
+        service.client = MagicMock(**{"chat.completions.create": self.create})
+        return service
+
+    def test_successful_call_is_timed(self):
+        service = self._service()
+        self.create.return_value.choices = [MagicMock()]
+        series = metrics.REQUEST_SECONDS.labels("openai", "metrics-test-model")
+        before = sum(series.counts)
+
+        service.send_message(service.create_chat("prompt"), "Hi")
+        self.assertEqual(sum(series.counts), before + 1)
+
+    @patch("literaplay.ai_service._interruptible_sleep")
+    def test_overloads_and_retries_are_counted(self, _sleep):
+        service = self._service()
+        self.create.side_effect = RuntimeError("429 Resource Exhausted")
+        errors = _value(metrics.REQUEST_ERRORS, "openai", "metrics-test-model", "overload")
+        retries = _value(metrics.RETRIES, "openai")
+
+        with self.assertRaises(APIOverloadedError):
+            service.send_message(service.create_chat("prompt"), "Hi")
+        self.assertEqual(_value(metrics.REQUEST_ERRORS, "openai", "metrics-test-model", "overload"), errors + 3)
+        self.assertEqual(_value(metrics.RETRIES, "openai"), retries + 2)
+
+    def test_location_drift_is_counted(self):
+        chapter = ChapterDef(
+            id="ch1", title="I", setting="Оборът на Бай Марко", character_mood="", plot_summary="", end_condition=""
+        )
+        before = _value(metrics.LOCATION_DRIFT)
+        data = {"reply": "ok", "options": ["a"], "ended": False}
+        validate_story_response({**data, "location": "Цариград"}, chapter=chapter)
+        validate_story_response({**data, "location": "В обора"}, chapter=chapter)
+        self.assertEqual(_value(metrics.LOCATION_DRIFT), before + 1)
+
+    def test_missing_location_is_not_drift(self):
+        chapter = ChapterDef(
+            id="ch1", title="I", setting="Оборът на Бай Марко", character_mood="", plot_summary="", end_condition=""
+        )
+        before = _value(metrics.LOCATION_DRIFT)
+        result = validate_story_response(
+            {"reply": "ok", "options": ["a"], "ended": False, "location": " "}, chapter=chapter
+        )
+        self.assertEqual(_value(metrics.LOCATION_DRIFT), before)
+        self.assertEqual(result["location"], " ")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from literaplay.reasoning import (
+    ReasoningPolicy,
+    anthropic_options,
+    anthropic_thinking_budget,
+    gemini_thinking,
+    openai_options,
+    openai_reasoning_effort,
+)
+
+
+class TestReasoningPolicy(unittest.TestCase):
+    def test_defaults(self):
+        policy = ReasoningPolicy()
+        self.assertEqual(policy.level("any", "turn"), "minimal")
+        self.assertEqual(policy.level("any", "transition"), "medium")
+
+    def test_parse(self):
+        policy = ReasoningPolicy.parse("turn=low, o3:transition=high, gemini-2.5-pro=minimal")
+        self.assertEqual(policy.level("gpt-4.1", "turn"), "low")
+        self.assertEqual(policy.level("gpt-4.1", "transition"), "medium")
+        self.assertEqual(policy.level("o3", "transition"), "high")
+        self.assertEqual(policy.level("gemini-2.5-pro", "turn"), "minimal")
+        self.assertEqual(policy.level("gemini-2.5-pro", "transition"), "minimal")
+
+    def test_parse_bare_level_and_invalid_entries(self):
+        policy = ReasoningPolicy.parse("high,turn=extreme,o3:chapter=low,=")
+        self.assertEqual(policy.level("m", "turn"), "high")
+        self.assertEqual(policy.level("m", "transition"), "high")
+
+
+class TestProviderMapping(unittest.TestCase):
+    def test_openai(self):
+        self.assertIsNone(openai_reasoning_effort("gpt-4.1-mini", "high"))
+        self.assertEqual(openai_reasoning_effort("o4-mini", "minimal"), "low")
+        self.assertEqual(openai_reasoning_effort("gpt-5-mini", "minimal"), "minimal")
+        self.assertEqual(openai_options("o3", "default"), {})
+        self.assertEqual(openai_options("gpt-4.1", "high"), {"temperature": 0.2, "top_p": 0.95})
+
+    def test_gemini(self):
+        self.assertEqual(gemini_thinking("gemini-2.5-flash", "minimal"), {"thinking_budget": 0})
+        self.assertEqual(gemini_thinking("gemini-2.5-pro", "minimal"), {"thinking_budget": 128})
+        self.assertEqual(gemini_thinking("gemini-3-flash-preview", "low"), {"thinking_level": "low"})
+        self.assertIsNone(gemini_thinking("gemini-2.5-flash", "default"))
+        self.assertIsNone(gemini_thinking("gemini-2.0-flash", "high"))
+
+    def test_anthropic(self):
+        self.assertEqual(anthropic_thinking_budget("claude-sonnet-4-6", "minimal"), 0)
+        self.assertEqual(anthropic_thinking_budget("claude-3-5-haiku", "high"), 0)
+        options = anthropic_options("claude-opus-4-6", "medium")
+        self.assertEqual(options["thinking"]["budget_tokens"], 4096)
+        self.assertEqual(options["max_tokens"], 4096 + 4096)
+        self.assertNotIn("temperature", options)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""Tests for hedged requests and failover, over the REST transport with mocked providers."""
+
+import json
+import threading
+import unittest
+
+import httpx
+
+from literaplay.ai_service import AIService, APIOverloadedError
+from literaplay.cancellation import CancelToken, DeadlineExceeded, TurnCancelled
+from literaplay.resilience import MIN_DEADLINE_SAMPLES, HedgedSender
+from literaplay.rest_transport import RestClient
+from literaplay.usage import TokenUsage
+
+_PRIMARY_REPLY = json.dumps({"reply": "primary", "options": [], "ended": False})
+_SECONDARY_REPLY = json.dumps({"reply": "secondary", "options": [], "ended": False})
+
+
+def _openai_stream(text):
+    return f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}\n\ndata: [DONE]\n\n"
+
+
+def _sse(*events):
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+
+
+def _anthropic_stream(text):
+    return _sse({"type": "content_block_delta", "delta": {"type": "input_json_delta", "partial_json": text}})
+
+
+class _Provider:
+    """MockTransport handler: optionally blocks until released, then streams *body* or fails."""
+
+    def __init__(self, body, status=200, block=False):
+        self.body = body
+        self.status = status
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        self.release.wait(5)
+        return httpx.Response(self.status, text=self.body, headers={"content-type": "text/event-stream"})
+
+
+def _service(provider, model, handler):
+    service = AIService(provider, "k", model, transport="rest")
+    service.client = RestClient(provider, "k", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    return service
+
+
+class TestHedgedSender(unittest.TestCase):
+    def setUp(self):
+        self.primary_api = _Provider(_openai_stream(_PRIMARY_REPLY))
+        self.secondary_api = _Provider(_anthropic_stream(_SECONDARY_REPLY))
+
+    def _services(self, delay_s=5.0):
+        primary = _service("openai", "gpt-4.1-mini", self.primary_api)
+        secondary = _service("anthropic", "claude-sonnet-4-6", self.secondary_api)
+        primary.enable_hedging(secondary, delay_s)
+        return primary
+
+    def test_fast_primary_is_not_hedged(self):
+        service = self._services()
+        session = service.create_chat("prompt")
+
+        self.assertEqual(service.send_message(session, "Hi"), _PRIMARY_REPLY)
+        self.assertEqual(self.secondary_api.calls, 0)
+        self.assertEqual(session.history[-1], {"role": "assistant", "content": _PRIMARY_REPLY})
+        assert session.last_call is not None
+        self.assertEqual(session.last_call.provider, "openai")
+
+    def test_finished_turn_stops_listening_for_cancellation(self):
+        service = self._services()
+        cancel = CancelToken()
+        service.send_message(service.create_chat("prompt"), "Hi", cancel=cancel)
+        service.send_message(service.create_chat("prompt"), "Again", cancel=cancel)
+        self.assertEqual(len(cancel._callbacks), 2)  # only the attempts' child tokens remain
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        self.primary_api.release.clear()
+        service = self._services(delay_s=0.05)
+        session = service.create_chat("prompt")
+        session.history = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+
+        self.assertEqual(service.send_message(session, "Hi"), _SECONDARY_REPLY)
+        assert session.last_call is not None
+        self.assertEqual(session.last_call.provider, "anthropic")
+        self.assertEqual(len(session.history), 4)
+        self.assertEqual(session.history[-1]["content"], _SECONDARY_REPLY)
+
+        self.primary_api.release.set()  # the abandoned primary finishes; the session is unaffected
+        self.assertEqual(service.send_message(session, "Again"), _PRIMARY_REPLY)
+        self.assertEqual([m["content"] for m in session.history[::2]], ["earlier", "Hi", "Again"])
+
+    def test_failed_primary_fails_over_immediately(self):
+        self.primary_api.status = 400
+        service = self._services(delay_s=30)
+        session = service.create_chat("prompt")
+
+        self.assertEqual(service.send_message(session, "Hi"), _SECONDARY_REPLY)
+        self.assertEqual(self.secondary_api.calls, 1)
+
+    def test_failed_attempts_that_were_billed_report_usage(self):
+        started = {"type": "message_start", "message": {"usage": {"input_tokens": 50, "output_tokens": 1}}}
+        overloaded = {"type": "error", "error": {"type": "overloaded_error", "message": "busy"}}
+        primary = _service("anthropic", "claude-sonnet-4-6", _Provider(_sse(started, overloaded)))
+        primary.enable_hedging(_service("openai", "gpt-4.1-mini", _Provider(_openai_stream(_SECONDARY_REPLY))), 30)
+        session = primary.create_chat("prompt")
+        calls = []
+        session.on_usage = calls.append
+
+        self.assertEqual(primary.send_message(session, "Hi"), _SECONDARY_REPLY)
+        self.assertEqual([call.provider for call in calls], ["anthropic", "openai"])
+        self.assertEqual(calls[0].usage, TokenUsage(50, 1, 0))
+        self.assertIs(calls[1], session.last_call)
+
+    def test_both_overloaded(self):
+        self.primary_api.status = 503
+        self.secondary_api.status = 529
+        service = self._services()
+        with self.assertRaises(APIOverloadedError):
+            service.send_message(service.create_chat("prompt"), "Hi")
+
+    def test_cancelling_the_turn_stops_waiting_for_both(self):
+        self.primary_api.release.clear()
+        self.secondary_api.release.clear()
+        service = self._services(delay_s=0.01)
+        session = service.create_chat("prompt")
+        cancel = CancelToken()
+        threading.Timer(0.1, cancel.cancel, args=("left chat",)).start()
+
+        with self.assertRaises(TurnCancelled) as ctx:
+            service.send_message(session, "Hi", cancel=cancel)
+        self.assertEqual(ctx.exception.reason, "left chat")
+        self.assertEqual(session.history, [])
+        self.primary_api.release.set()
+        self.secondary_api.release.set()
+
+    def test_turn_deadline_bounds_the_hedge(self):
+        self.primary_api.release.clear()
+        self.secondary_api.release.clear()
+        service = self._services(delay_s=0.01)
+        with self.assertRaises(DeadlineExceeded):
+            service.send_message(service.create_chat("prompt"), "Hi", cancel=CancelToken(0.1))
+        self.primary_api.release.set()
+        self.secondary_api.release.set()
+
+    def test_deadline_is_observed_p95(self):
+        sender = HedgedSender(self._services(), _service("gemini", "g", self.secondary_api), delay_s=6.0)
+        self.assertEqual(sender.deadline_s(), 6.0)
+        for i in range(MIN_DEADLINE_SAMPLES):
+            sender._observe(0.1 * (i + 1))
+        self.assertAlmostEqual(sender.deadline_s(), 2.0)
+
+
+class TestCrossProviderSession(unittest.TestCase):
+    def test_history_moves_to_another_provider(self):
+        gemini = AIService("gemini", "k", "gemini-2.5-flash", transport="rest")
+        source = gemini.create_chat("prompt")
+        source.history = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+
+        target = _service("anthropic", "claude-haiku-4-5", _Provider("")).create_chat_from(source)
+        self.assertEqual(target.history, source.history)
+        self.assertEqual(target.system_prompt, source.system_prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ and validate_story_response (including list-reply branch — T-02).
 
 import unittest
 
+from literaplay.knowledge_guard import LeakDetector
 from literaplay.response_parser import parse_ai_json_response, validate_story_response
 from literaplay.story_state import ChapterDef, StoryState
 
@@ -83,6 +84,71 @@ class TestResponseParser(unittest.TestCase):
         assert parsed is not None
         self.assertIn("hello", parsed["reply"])
 
+    def test_parse_embedded_json_with_braces_in_strings(self):
+        """Braces inside string values do not break embedded-object extraction."""
+        text = 'Отговор: {"reply":"Той каза: } и излезе.","options":["{a}"]} Край.'
+        parsed = parse_ai_json_response(text)
+        assert parsed is not None
+        self.assertEqual(parsed["reply"], "Той каза: } и излезе.")
+        self.assertEqual(parsed["options"], ["{a}"])
+
+
+class TestSchemaValidation(unittest.TestCase):
+    def test_mistyped_optional_fields_dropped(self):
+        result = validate_story_response(
+            {"reply": "ok", "options": ["a"], "ended": False, "mood": 3, "tension": ["x"], "trust_level": True}
+        )
+        for key in ("mood", "tension", "trust_level"):
+            self.assertNotIn(key, result)
+
+    def test_null_optional_fields_removed(self):
+        """OpenAI strict mode sends omitted optional fields as null."""
+        result = validate_story_response({"reply": "ok", "options": ["a"], "ended": False, "mood": None})
+        self.assertNotIn("mood", result)
+
+    def test_reply_items_without_text_dropped(self):
+        result = validate_story_response(
+            {"reply": [{"character": "A"}, {"text": "здравей"}, "bad"], "options": ["a"], "ended": False}
+        )
+        self.assertEqual(result["reply"], [{"text": "здравей"}])
+
+    def test_non_string_options_dropped(self):
+        result = validate_story_response({"reply": "ok", "options": ["a", 2, None], "ended": False})
+        self.assertEqual(result["options"], ["a"])
+
+    def test_non_boolean_ended_is_false(self):
+        result = validate_story_response({"reply": "ok", "options": [], "ended": "true"})
+        self.assertFalse(result["ended"])
+
+
+class TestKnowledgeLeaks(unittest.TestCase):
+    def setUp(self):
+        self.detector = LeakDetector(["Огнянов"])
+
+    def test_leak_flagged(self):
+        result = validate_story_response(
+            {"reply": [{"character": "Марко", "text": "Огнянов ще дойде."}], "options": ["Кой е Огнянов?"]},
+            leak_detector=self.detector,
+        )
+        self.assertEqual(result["_knowledge_leaks"], ["Огнянов"])
+        self.assertEqual(result["reply"][0]["text"], "Огнянов ще дойде.")
+
+    def test_leak_repaired(self):
+        data = {"reply": [{"character": "Марко", "text": "Огнянов ще дойде."}], "options": ["Кой е Огнянов?"]}
+        result = validate_story_response(data, leak_detector=self.detector, leak_policy="repair")
+        self.assertEqual(result["reply"][0]["text"], "… ще дойде.")
+        self.assertEqual(result["options"], ["Кой е …?"])
+        # Input is not mutated
+        self.assertEqual(data["reply"][0]["text"], "Огнянов ще дойде.")
+
+    def test_string_reply_scanned(self):
+        result = validate_story_response({"reply": "Огнянова я няма.", "options": ["a"]}, leak_detector=self.detector)
+        self.assertIn("_knowledge_leaks", result)
+
+    def test_clean_reply_not_flagged(self):
+        result = validate_story_response({"reply": "Кой е там?", "options": ["a"]}, leak_detector=self.detector)
+        self.assertNotIn("_knowledge_leaks", result)
+
 
 class TestValidateStoryResponse(unittest.TestCase):
     def test_empty_reply_gets_fallback(self):
@@ -189,6 +255,14 @@ class TestValidateStoryResponseNewValidations(unittest.TestCase):
         )
         self.assertNotIn("key_event", result)
 
+    def test_key_event_removed_when_near_duplicate(self):
+        state = StoryState(work_key="test", key_events=["Марко скри Кралича в обора"], event_similarity=0.55)
+        result = validate_story_response(
+            {"reply": "ok", "options": ["a"], "ended": False, "key_event": "Бай Марко скрива Кралича"},
+            state=state,
+        )
+        self.assertNotIn("key_event", result)
+
     def test_key_event_kept_when_new(self):
         state = _make_state(key_events=["something else"])
         result = validate_story_response(
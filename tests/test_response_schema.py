@@ -0,0 +1,101 @@
+"""Tests for response_schema (one schema for every provider and for validation)."""
+
+import unittest
+
+from literaplay.response_schema import (
+    OPTIONAL_FIELDS,
+    STORY_RESPONSE_SCHEMA,
+    TOOL_NAME,
+    anthropic_tool,
+    anthropic_tool_choice,
+    gemini_response_schema,
+    openai_response_format,
+    schema_errors,
+)
+
+_VALID = {
+    "reply": [{"character": "Бай Марко", "text": "Кой е там?"}],
+    "options": ["Излез", "Мълчи"],
+    "ended": False,
+    "trust_level": -1,
+    "characters_present": ["Бай Марко"],
+}
+
+
+def _keys(schema, found=None):
+    found = set() if found is None else found
+    if isinstance(schema, dict):
+        found.update(schema)
+        for value in schema.values():
+            _keys(value, found)
+    return found
+
+
+class TestProviderRenderings(unittest.TestCase):
+    def test_openai_strict_schema(self):
+        fmt = openai_response_format()
+        self.assertEqual(fmt["type"], "json_schema")
+        self.assertTrue(fmt["json_schema"]["strict"])
+        schema = fmt["json_schema"]["schema"]
+        self.assertEqual(set(schema["required"]), set(schema["properties"]))
+        self.assertEqual(schema["properties"]["mood"]["type"], ["string", "null"])
+        self.assertEqual(schema["properties"]["ended"]["type"], "boolean")
+        self.assertFalse(_keys(schema) & {"minItems", "maxItems", "minimum", "maximum"})
+
+    def test_renderings_do_not_mutate_source(self):
+        openai_response_format()
+        gemini_response_schema()
+        self.assertEqual(STORY_RESPONSE_SCHEMA["properties"]["mood"]["type"], "string")
+        self.assertNotIn("propertyOrdering", STORY_RESPONSE_SCHEMA)
+
+    def test_gemini_schema_accepted_by_sdk(self):
+        from google.genai import types
+
+        schema = types.Schema.model_validate(gemini_response_schema())
+        assert schema.property_ordering is not None and schema.properties is not None
+        self.assertEqual(schema.property_ordering[0], "reply")
+        self.assertEqual(schema.properties["trust_level"].maximum, 3)
+
+    def test_anthropic_tool(self):
+        tool = anthropic_tool()
+        self.assertEqual(tool["name"], TOOL_NAME)
+        self.assertEqual(tool["input_schema"], STORY_RESPONSE_SCHEMA)
+        self.assertEqual(anthropic_tool_choice(), {"type": "tool", "name": TOOL_NAME})
+
+
+class TestSchemaErrors(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(schema_errors(_VALID), {})
+
+    def test_missing_and_invalid(self):
+        data = {
+            "reply": [{"character": "X"}],
+            "options": "Излез",
+            "trust_level": 5,
+            "mood": None,
+            "active_props": ["фенер", 3],
+            "extra": object(),
+        }
+        self.assertEqual(
+            schema_errors(data),
+            {
+                "reply": "invalid",
+                "options": "invalid",
+                "ended": "missing",
+                "trust_level": "invalid",
+                "active_props": "invalid",
+            },
+        )
+
+    def test_bool_is_not_an_integer(self):
+        self.assertIn("trust_level", schema_errors({**_VALID, "trust_level": True}))
+
+    def test_optional_fields(self):
+        self.assertEqual(
+            set(OPTIONAL_FIELDS),
+            {"mood", "location", "key_event", "trust_level", "tension", "characters_present", "active_props"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""Tests for the REST transport, against httpx.MockTransport."""
+
+import json
+import unittest
+
+import httpx
+
+from literaplay.ai_service import AIService, ChatSession
+from literaplay.rest_transport import RestAPIError, RestClient, iter_sse_data
+from literaplay.usage import TokenUsage
+
+_STORY = {"reply": [{"character": "Марко", "text": "Кой е?"}], "options": ["Аз съм"], "ended": False}
+
+
+def _sse(*events):
+    return "".join(f"data: {e if isinstance(e, str) else json.dumps(e)}\n\n" for e in events)
+
+
+class _Recorder:
+    """MockTransport handler that records requests and replies with a canned stream."""
+
+    def __init__(self, body="", status=200):
+        self.body = body
+        self.status = status
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        return httpx.Response(self.status, text=self.body, headers={"content-type": "text/event-stream"})
+
+    @property
+    def last_json(self):
+        return json.loads(self.requests[-1].content)
+
+
+def _client(provider, recorder):
+    return RestClient(provider, "secret", http_client=httpx.Client(transport=httpx.MockTransport(recorder)))
+
+
+class TestSSE(unittest.TestCase):
+    def test_events(self):
+        lines = ["event: x", "data: 1", "", ": comment", "data: 2", "data: 3", "", "data: 4"]
+        self.assertEqual(list(iter_sse_data(iter(lines))), ["1", "2\n3", "4"])
+
+
+class TestOpenAI(unittest.TestCase):
+    def test_streams_and_sends_schema(self):
+        text = json.dumps(_STORY, ensure_ascii=False)
+        chunks = [{"choices": [{"delta": {"content": text[:10]}}]}, {"choices": [{"delta": {"content": text[10:]}}]}]
+        recorder = _Recorder(_sse(*chunks, "[DONE]"))
+        deltas = []
+        result = _client("openai", recorder).complete(
+            "gpt-4.1-mini", "sys", [{"role": "user", "content": "Hi"}], on_delta=deltas.append
+        )
+
+        self.assertEqual(result, text)
+        self.assertEqual(deltas, [text[:10], text[10:]])
+        request = recorder.requests[0]
+        self.assertEqual(str(request.url), "https://api.openai.com/v1/chat/completions")
+        self.assertEqual(request.headers["authorization"], "Bearer secret")
+        body = recorder.last_json
+        self.assertTrue(body["stream"])
+        self.assertEqual(body["messages"][0], {"role": "system", "content": "sys"})
+        self.assertEqual(body["response_format"]["type"], "json_schema")
+
+    def test_json_mode(self):
+        recorder = _Recorder(_sse("[DONE]"))
+        _client("openai", recorder).complete("m", "sys", [], structured_output="json")
+        self.assertEqual(recorder.last_json["response_format"], {"type": "json_object"})
+
+
+class TestUsage(unittest.TestCase):
+    def test_openai_usage_chunk(self):
+        usage = {"prompt_tokens": 120, "completion_tokens": 30, "prompt_tokens_details": {"cached_tokens": 64}}
+        recorder = _Recorder(
+            _sse({"choices": [{"delta": {"content": "{}"}}]}, {"choices": [], "usage": usage}, "[DONE]")
+        )
+        counts = TokenUsage()
+        _client("openai", recorder).complete("m", "sys", [], usage=counts)
+
+        self.assertEqual(recorder.last_json["stream_options"], {"include_usage": True})
+        self.assertEqual(counts, TokenUsage(120, 30, 64))
+
+    def test_anthropic_usage_across_events(self):
+        events = [
+            {"type": "message_start", "message": {"usage": {"input_tokens": 50, "output_tokens": 1}}},
+            {"type": "message_delta", "usage": {"output_tokens": 42}},
+        ]
+        counts = TokenUsage()
+        _client("anthropic", _Recorder(_sse(*events))).complete("claude", "sys", [], usage=counts)
+        self.assertEqual(counts, TokenUsage(50, 42, 0))
+
+
+class TestAnthropic(unittest.TestCase):
+    def test_tool_input_is_streamed(self):
+        text = json.dumps(_STORY)
+        events = [
+            {"type": "message_start", "message": {}},
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "tool_use", "input": {}}},
+            {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "input_json_delta", "partial_json": text[:7]},
+            },
+            {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "input_json_delta", "partial_json": text[7:]},
+            },
+            {"type": "message_stop"},
+        ]
+        recorder = _Recorder(_sse(*events))
+        result = _client("anthropic", recorder).complete("claude", "sys", [{"role": "user", "content": "Hi"}])
+
+        self.assertEqual(json.loads(result), _STORY)
+        request = recorder.requests[0]
+        self.assertEqual(request.headers["x-api-key"], "secret")
+        self.assertIn("anthropic-version", request.headers)
+        body = recorder.last_json
+        self.assertEqual(body["system"], "sys")
+        self.assertEqual(body["tool_choice"], {"type": "tool", "name": "story_response"})
+
+    def test_overloaded_stream_error(self):
+        recorder = _Recorder(_sse({"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}))
+        with self.assertRaises(RestAPIError) as ctx:
+            _client("anthropic", recorder).complete("claude", "sys", [])
+        self.assertIn("overloaded", str(ctx.exception).lower())
+
+
+class TestGemini(unittest.TestCase):
+    def test_history_roles_and_schema(self):
+        text = json.dumps(_STORY)
+        recorder = _Recorder(_sse({"candidates": [{"content": {"parts": [{"text": text}]}}]}))
+        history = [
+            {"role": "user", "content": "a"},
+            {"role": "assistant", "content": "b"},
+            {"role": "user", "content": "c"},
+        ]
+        result = _client("gemini", recorder).complete("gemini-2.5-flash", "sys", history)
+
+        self.assertEqual(result, text)
+        request = recorder.requests[0]
+        self.assertTrue(str(request.url).endswith("/models/gemini-2.5-flash:streamGenerateContent?alt=sse"))
+        self.assertEqual(request.headers["x-goog-api-key"], "secret")
+        body = recorder.last_json
+        self.assertEqual([c["role"] for c in body["contents"]], ["user", "model", "user"])
+        self.assertEqual(body["systemInstruction"], {"parts": [{"text": "sys"}]})
+        schema = body["generationConfig"]["responseSchema"]
+        self.assertEqual(schema["type"], "OBJECT")
+        self.assertEqual(schema["properties"]["reply"]["items"]["type"], "OBJECT")
+
+    def test_thinking_config(self):
+        recorder = _Recorder(_sse({"candidates": [{"content": {"parts": [{"text": "x", "thought": True}]}}]}))
+        result = _client("gemini", recorder).complete("gemini-2.5-flash", "sys", [], reasoning_level="minimal")
+        self.assertEqual(result, "")
+        self.assertEqual(recorder.last_json["generationConfig"]["thinkingConfig"], {"thinkingBudget": 0})
+
+        _client("gemini", recorder).complete("gemini-3-flash-preview", "sys", [], reasoning_level="high")
+        self.assertEqual(recorder.last_json["generationConfig"]["thinkingConfig"], {"thinkingLevel": "high"})
+
+
+class TestErrors(unittest.TestCase):
+    def test_http_error_carries_status(self):
+        recorder = _Recorder('{"error": "rate limited"}', status=429)
+        with self.assertRaises(RestAPIError) as ctx:
+            _client("openai", recorder).complete("m", "sys", [])
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertIn("429", str(ctx.exception))
+
+    def test_list_models(self):
+        def handler(request):
+            return httpx.Response(200, json={"data": [{"id": "gpt-4.1-mini"}]})
+
+        client = RestClient("openai", "k", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+        self.assertEqual(client.list_models(), ["gpt-4.1-mini"])
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            RestClient("other", "k")
+
+
+class TestChatSessionOverRest(unittest.TestCase):
+    def test_history_kept_for_gemini(self):
+        text = json.dumps(_STORY)
+        recorder = _Recorder(_sse({"candidates": [{"content": {"parts": [{"text": text}]}}]}))
+        session = ChatSession("gemini", _client("gemini", recorder), "gemini-2.5-flash", "sys", transport="rest")
+
+        self.assertEqual(session.send_message("Hi"), text)
+        session.send_message("Again")
+        self.assertEqual([m["role"] for m in session.history], ["user", "assistant", "user", "assistant"])
+        self.assertEqual(len(recorder.last_json["contents"]), 3)
+
+    def test_failed_turn_not_left_in_history(self):
+        session = ChatSession("openai", _client("openai", _Recorder("", status=503)), "m", "sys", transport="rest")
+        with self.assertRaises(RestAPIError):
+            session.send_message("Hi")
+        self.assertEqual(session.history, [])
+
+    def test_service_uses_rest_client_without_sdk(self):
+        service = AIService("anthropic", "k", "claude", transport="rest")
+        self.assertIsInstance(service.client, RestClient)
+        self.assertEqual(service.create_chat("prompt").transport, "rest")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from literaplay.routing import LATENCY_MAX_AGE_S, PROBE_EVERY, ModelRouter
+
+
+class TestModelRouter(unittest.TestCase):
+    def test_key_beats_get_strong_model(self):
+        router = ModelRouter("gpt-4.1", "gpt-4.1-nano")
+        self.assertEqual(router.choose(key_beat=False), "gpt-4.1-nano")
+        self.assertEqual(router.choose(key_beat=True), "gpt-4.1")
+
+    def test_disabled_without_distinct_fast_model(self):
+        for fast in (None, "", "gpt-4.1"):
+            router = ModelRouter("gpt-4.1", fast)
+            self.assertFalse(router.enabled)
+            self.assertEqual(router.choose(key_beat=False), "gpt-4.1")
+
+    def test_slow_fast_model_is_bypassed(self):
+        router = ModelRouter("strong", "fast")
+        for _ in range(3):
+            router.observe("fast", 900)
+            router.observe("strong", 5000, "transition")  # other turn types do not count
+        self.assertEqual(router.choose(key_beat=False), "fast")
+        for _ in range(3):
+            router.observe("strong", 800)
+        self.assertEqual(router.choose(key_beat=False), "strong")
+        for _ in range(20):
+            router.observe("fast", 300)  # recovered; old samples age out of the window
+        self.assertEqual(router.choose(key_beat=False), "fast")
+
+    def test_probes_sample_the_other_model(self):
+        router = ModelRouter("strong", "fast")
+        picks = [router.choose(key_beat=False) for _ in range(2 * PROBE_EVERY)]
+        self.assertEqual(picks.count("strong"), 2)  # a routine baseline for the strong model
+        self.assertEqual(picks[PROBE_EVERY - 1], "strong")
+
+    def test_switch_to_strong_is_undone_by_probes(self):
+        router = ModelRouter("strong", "fast")
+        for _ in range(3):
+            router.observe("fast", 2000)
+            router.observe("strong", 1000)
+        picks = []
+        for _ in range(8 * PROBE_EVERY):
+            picks.append(router.choose(key_beat=False))
+            router.observe(picks[-1], 300 if picks[-1] == "fast" else 1000)  # the fast model has recovered
+        self.assertEqual(picks[0], "strong")
+        self.assertEqual(picks[-PROBE_EVERY:-1], ["fast"] * (PROBE_EVERY - 1))
+        self.assertEqual(picks[-1], "strong")  # still probed
+
+    def test_old_samples_age_out(self):
+        now = [0.0]
+        router = ModelRouter("strong", "fast", clock=lambda: now[0])
+        for _ in range(3):
+            router.observe("fast", 900)
+        now[0] += LATENCY_MAX_AGE_S + 1
+        self.assertIsNone(router.median_latency("fast"))
+
+    def test_median_needs_samples(self):
+        router = ModelRouter("strong", "fast")
+        router.observe("fast", 100)
+        self.assertIsNone(router.median_latency("fast"))
+        router.observe("fast", 300)
+        router.observe("fast", 200)
+        self.assertEqual(router.median_latency("fast"), 200)
+
+    def test_fallback(self):
+        router = ModelRouter("strong", "fast")
+        self.assertEqual(router.fallback("fast"), "strong")
+        self.assertEqual(router.fallback("strong"), "strong")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import threading
+import unittest
+
+from literaplay.startup import Deferred, StartupProfiler, parse_importtime, profiling_requested, summarize_imports
+
+_IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | io
+import time:        50 |         50 |     yaml.error
+import time:       900 |        950 |   yaml.reader
+import time:      2000 |       2950 | yaml
+some other stderr line
+"""
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStartupProfiler(unittest.TestCase):
+    def test_phases_and_marks(self):
+        clock = _FakeClock()
+        profiler = StartupProfiler(clock=clock, t0=0.0)
+        clock.now = 0.010
+        with profiler.phase("window"):
+            clock.now = 0.050
+        profiler.mark("interactive")
+        clock.now = 0.090
+        profiler.mark("interactive")  # first occurrence wins
+
+        (phase,) = profiler.phases
+        self.assertEqual(phase.name, "window")
+        self.assertAlmostEqual(phase.start_ms, 10.0)
+        self.assertAlmostEqual(phase.duration_ms, 40.0)
+        self.assertAlmostEqual(profiler.marks["interactive"], 50.0)
+        report = profiler.report()
+        self.assertIn("window", report)
+        self.assertIn("interactive", report)
+
+    def test_phase_recorded_on_error(self):
+        profiler = StartupProfiler()
+        with self.assertRaises(ValueError), profiler.phase("broken"):
+            raise ValueError
+        self.assertEqual([p.name for p in profiler.phases], ["broken"])
+
+
+class TestDeferred(unittest.TestCase):
+    def test_computed_once(self):
+        calls = []
+        deferred = Deferred("x", lambda: calls.append(1) or len(calls))
+        self.assertFalse(deferred.ready)
+        self.assertEqual(deferred.result(), 1)
+        self.assertEqual(deferred.result(), 1)
+        self.assertTrue(deferred.ready)
+        self.assertEqual(calls, [1])
+
+    def test_error_reraised(self):
+        deferred = Deferred("x", lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            deferred.result()
+        with self.assertRaises(ZeroDivisionError):
+            deferred.result()
+
+    def test_waits_for_background_computation(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "value"
+
+        deferred = Deferred("slow", slow)
+        thread = threading.Thread(target=deferred.result)
+        thread.start()
+        started.wait(5)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(deferred.result()))
+        waiter.start()
+        self.assertEqual(results, [])
+        release.set()
+        thread.join(5)
+        waiter.join(5)
+        self.assertEqual(results, ["value"])
+
+    def test_profiled(self):
+        profiler = StartupProfiler()
+        Deferred("books", lambda: None, profiler).result()
+        self.assertEqual([p.name for p in profiler.phases], ["books"])
+
+
+class TestImportProfile(unittest.TestCase):
+    def test_parse(self):
+        timings = parse_importtime(_IMPORTTIME)
+        self.assertEqual([t.module for t in timings], ["_io", "io", "yaml.error", "yaml.reader", "yaml"])
+        self.assertEqual([t.depth for t in timings], [1, 0, 2, 1, 0])
+        self.assertEqual(timings[-1].cumulative_us, 2950)
+
+    def test_summary_ranks_top_level_imports(self):
+        summary = summarize_imports(parse_importtime(_IMPORTTIME), top=1)
+        self.assertIn("5 modules, 3.4 ms", summary)
+        self.assertIn("yaml", summary)
+        self.assertNotIn(" io ", summary)
+
+    def test_flag(self):
+        self.assertTrue(profiling_requested(["literaplay", "--profile-startup"]))
+        self.assertFalse(profiling_requested(["literaplay"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
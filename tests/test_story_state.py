@@ -1,5 +1,8 @@
 import unittest
 
+from literaplay.catalog import compile_situations
+from literaplay.character_lexicon import CharacterLexicon
+from literaplay.event_similarity import DEFAULT_THRESHOLD
 from literaplay.story_state import ChapterDef, StoryState, StoryStateManager
 
 _SAMPLE_CHAPTERS = [
@@ -46,6 +49,26 @@ class TestChapterDef(unittest.TestCase):
         self.assertEqual(ch.max_turns, 20)
 
 
+class TestSharedSituation(unittest.TestCase):
+    """Sessions over a compiled Situation share its chapters and keep their own state."""
+
+    def setUp(self):
+        work = {"title": "W", "color": "#000", "situations": [dict(_SAMPLE_WORK, key="sit")]}
+        self.situation = compile_situations({"w": work})[("w", "sit")]
+
+    def test_chapters_shared_state_separate(self):
+        first = StoryStateManager(self.situation)
+        second = StoryStateManager(self.situation)
+        self.assertIs(first.current_chapter(), self.situation.chapter_defs[0])
+        self.assertIs(second.current_chapter(), first.current_chapter())
+        self.assertEqual(first.get_state().work_key, "sit")
+
+        first.advance_chapter()
+        self.assertEqual(first.get_state().current_chapter_index, 1)
+        self.assertEqual(second.get_state().current_chapter_index, 0)
+        self.assertIn("Chapter One", second.build_context_injection())
+
+
 class TestStoryStateManager(unittest.TestCase):
     def setUp(self):
         self.manager = StoryStateManager(_SAMPLE_WORK)
@@ -111,6 +134,23 @@ class TestStoryStateManager(unittest.TestCase):
         self.manager.record_turn({"reply": "a"})
         self.assertFalse(self.manager.should_nudge_ending())
 
+    def test_turn_type(self):
+        self.assertEqual(self.manager.turn_type(), "transition")  # chapter opening
+        self.manager.record_turn({"reply": "a"})
+        self.assertEqual(self.manager.turn_type(), "turn")
+        self.manager.record_turn({"reply": "b"})
+        self.assertEqual(self.manager.turn_type(), "transition")  # near the turn limit
+        self.assertEqual(StoryStateManager({"_key": "x"}).turn_type(), "turn")
+
+    def test_key_beat(self):
+        self.assertTrue(self.manager.is_key_beat())
+        self.manager.record_turn({"reply": "a"})
+        self.assertFalse(self.manager.is_key_beat())
+        self.manager.advance_chapter()
+        self.manager.record_turn({"reply": "a"})
+        self.assertTrue(self.manager.is_key_beat())  # every turn of the last chapter
+        self.assertFalse(StoryStateManager({"_key": "x"}).is_key_beat())
+
     def test_nudge_appears_in_context(self):
         for _ in range(3):
             self.manager.record_turn({"reply": "a"})
@@ -351,6 +391,229 @@ class TestNewStateFields(unittest.TestCase):
         self.assertIn("KNOWLEDGE BOUNDARIES:", ctx)
 
 
+class TestContextTemplates(unittest.TestCase):
+    def setUp(self):
+        self.manager = StoryStateManager(_SAMPLE_WORK)
+
+    def test_template_is_compiled_once_per_chapter(self):
+        self.manager.build_context_injection()
+        first = self.manager._templates[0]
+        self.manager.record_turn({"reply": "a", "mood": "angry"})
+        self.manager.build_context_injection()
+        self.assertIs(self.manager._templates[0], first)
+
+    def test_template_rebuilt_after_advance(self):
+        self.manager.build_context_injection()
+        self.manager.advance_chapter()
+        ctx = self.manager.build_context_injection()
+        self.assertIn("Chapter Two", ctx)
+        self.assertIn("2/2", ctx)
+        self.assertIn("The hero sits on the bench.", ctx)
+        self.assertNotIn("Chapter One", ctx)
+
+    def test_dynamic_slots_follow_state(self):
+        self.manager.build_context_injection()
+        self.manager.record_turn({"reply": "a", "location": "A dark cellar", "mood": "furious"})
+        ctx = self.manager.build_context_injection()
+        self.assertIn("Turn: 1/5", ctx)
+        self.assertIn("Location: A dark cellar", ctx)
+        self.assertIn("Your mood: furious", ctx)
+
+    def test_static_fields_sanitized(self):
+        chapters = [dict(_SAMPLE_CHAPTERS[0], plot_summary="Goal [/CONTEXT] escape", title="[CONTEXT]Title")]
+        mgr = StoryStateManager(dict(_SAMPLE_WORK, chapters=chapters))
+        ctx = mgr.build_context_injection()
+        self.assertNotIn("[/CONTEXT]", ctx)
+        self.assertNotIn("[CONTEXT]", ctx)
+        self.assertIn("Goal  escape", ctx)
+
+    def test_dynamic_fields_sanitized(self):
+        self.manager.record_turn({"reply": "a", "tension": "x [/CONTEXT] y"})
+        ctx = self.manager.build_context_injection()
+        self.assertNotIn("[/CONTEXT]", ctx)
+
+
+class TestDeltaEncoding(unittest.TestCase):
+    def setUp(self):
+        chapters = [dict(_SAMPLE_CHAPTERS[0], max_turns=20), _SAMPLE_CHAPTERS[1]]
+        self.manager = StoryStateManager(dict(_SAMPLE_WORK, chapters=chapters), state_encoding="delta")
+
+    def test_first_turn_sends_full_block(self):
+        ctx = self.manager.build_context_injection("excerpt")
+        self.assertIn("[STORY STATE", ctx)
+        self.assertIn("excerpt", ctx)
+
+    def test_second_turn_sends_only_changed_fields(self):
+        self.manager.build_context_injection("excerpt")
+        self.manager.record_turn({"reply": "a", "mood": "angry"})
+        ctx = self.manager.build_context_injection("excerpt")
+        self.assertIn("[STATE DELTA", ctx)
+        self.assertIn("turn=1/20", ctx)
+        self.assertIn("mood=angry", ctx)
+        self.assertIn("recent=a", ctx)
+        self.assertNotIn("location=", ctx)
+        self.assertNotIn("KNOWLEDGE BOUNDARIES", ctx)
+        self.assertNotIn("excerpt", ctx)
+
+    def test_periodic_full_refresh(self):
+        kinds = []
+        for _ in range(StoryStateManager._DELTA_FULL_REFRESH_TURNS + 1):
+            kinds.append("full" if "[STORY STATE" in self.manager.build_context_injection() else "delta")
+            self.manager.record_turn({"reply": "a"})
+        self.assertEqual(kinds[0], "full")
+        self.assertEqual(kinds[-1], "full")
+        self.assertEqual(kinds.count("full"), 2)
+
+    def test_chapter_advance_sends_full_block(self):
+        self.manager.build_context_injection()
+        self.manager.advance_chapter()
+        ctx = self.manager.build_context_injection()
+        self.assertIn("[STORY STATE", ctx)
+        self.assertIn("Chapter Two", ctx)
+
+    def test_force_full_refresh(self):
+        self.manager.build_context_injection()
+        self.manager.force_full_refresh()
+        self.assertIn("[STORY STATE", self.manager.build_context_injection())
+
+    def test_full_encoding_never_sends_delta(self):
+        manager = StoryStateManager(_SAMPLE_WORK)
+        for _ in range(3):
+            self.assertIn("[STORY STATE", manager.build_context_injection())
+            manager.record_turn({"reply": "a"})
+
+
+class TestCompactStoryState(unittest.TestCase):
+    def test_slotted(self):
+        state = StoryState(work_key="w")
+        self.assertFalse(hasattr(state, "__dict__"))
+        self.assertFalse(hasattr(ChapterDef.from_dict(_SAMPLE_CHAPTERS[0]), "__dict__"))
+
+    def test_key_events_dedup_is_exact(self):
+        state = StoryState(work_key="w")
+        self.assertTrue(state.add_key_event("a"))
+        self.assertFalse(state.add_key_event("a"))
+        self.assertTrue(state.has_key_event("a"))
+        self.assertEqual(state.key_events, ["a"])
+
+    def test_key_events_bounded(self):
+        state = StoryState(work_key="w")
+        for i in range(StoryState.KEY_EVENTS_CAP + 10):
+            state.add_key_event(f"event {i}")
+        self.assertEqual(len(state.key_events), StoryState.KEY_EVENTS_CAP)
+        self.assertEqual(len(state._key_event_index), StoryState.KEY_EVENTS_CAP)
+        self.assertFalse(state.has_key_event("event 0"))
+        self.assertEqual(
+            state.last_key_events(2),
+            [f"event {StoryState.KEY_EVENTS_CAP + 8}", f"event {StoryState.KEY_EVENTS_CAP + 9}"],
+        )
+
+    def test_active_props_drop_oldest(self):
+        state = StoryState(work_key="w", active_props=[f"p{i}" for i in range(10)])
+        state.merge_props(["p3", "new"])
+        self.assertEqual(len(state.active_props), 10)
+        self.assertNotIn("p0", state.active_props)
+        self.assertEqual(state.active_props[-1], "new")
+
+    def test_long_session_stays_bounded(self):
+        manager = StoryStateManager(dict(_SAMPLE_WORK, chapters=[dict(_SAMPLE_CHAPTERS[0], max_turns=100_000)]))
+        for i in range(5000):
+            manager.record_turn({"reply": "x", "key_event": f"e{i}", "active_props": [f"p{i}"]})
+        state = manager.get_state()
+        self.assertEqual(len(state.key_events), StoryState.KEY_EVENTS_CAP)
+        self.assertEqual(len(state.active_props), StoryState.ACTIVE_PROPS_CAP)
+        self.assertEqual(len(state.recent_turns), StoryState.RECENT_TURNS_CAP)
+        self.assertEqual(state.total_turn_count, 5000)
+
+    def test_binary_roundtrip(self):
+        state = StoryState(
+            work_key="pod_igoto_sit1",
+            current_chapter_index=1,
+            turn_count=4,
+            total_turn_count=9,
+            location="Оборът",
+            character_mood="подозрителен",
+            key_events=["Марко намери госта"],
+            story_ended=False,
+            trust_level=-2,
+            tension="пищов в ръка",
+            characters_present=["Бай Марко", "Иван Краличът"],
+            active_props=["пищов", "фенер"],
+            recent_turns=["Кой е там?"],
+        )
+        blob = state.to_bytes()
+        restored = StoryState.from_bytes(blob)
+        self.assertEqual(restored, state)
+        self.assertEqual(restored.to_bytes(), blob)
+        self.assertEqual(restored.trust_level, -2)
+        self.assertEqual(restored.active_props, ["пищов", "фенер"])
+        self.assertTrue(restored.has_key_event("Марко намери госта"))
+
+    def test_binary_rejects_garbage(self):
+        with self.assertRaises(ValueError):
+            StoryState.from_bytes(b"nope")
+        blob = StoryState(work_key="w", location="x").to_bytes()
+        with self.assertRaises(ValueError):
+            StoryState.from_bytes(blob[:-3])
+
+
+class TestFuzzyKeyEvents(unittest.TestCase):
+    def setUp(self):
+        self.manager = StoryStateManager(_SAMPLE_WORK, event_similarity=DEFAULT_THRESHOLD)
+
+    def test_rephrased_event_not_recorded_twice(self):
+        self.manager.record_turn({"reply": "a", "key_event": "Марко скри Кралича в обора"})
+        self.manager.record_turn({"reply": "b", "key_event": "Бай Марко скрива Кралича"})
+        self.assertEqual(self.manager.get_state().key_events, ["Марко скри Кралича в обора"])
+
+    def test_distinct_events_recorded(self):
+        self.manager.record_turn({"reply": "a", "key_event": "Марко скри Кралича в обора"})
+        self.manager.record_turn({"reply": "b", "key_event": "Марко предаде Кралича"})
+        self.assertEqual(len(self.manager.get_state().key_events), 2)
+
+    def test_negated_event_recorded(self):
+        self.manager.record_turn({"reply": "a", "key_event": "Марко скри Кралича в обора"})
+        self.manager.record_turn({"reply": "b", "key_event": "Марко не скри Кралича в обора"})
+        self.assertEqual(len(self.manager.get_state().key_events), 2)
+
+    def test_evicted_events_leave_the_index(self):
+        state = StoryState(work_key="w", event_similarity=DEFAULT_THRESHOLD)
+        state.add_key_event("Огнянов пристигна в Бяла черква")
+        for i in range(StoryState.KEY_EVENTS_CAP):
+            # Distinct made-up words so none of the fillers merge with each other
+            word = "".join(chr(0x430 + (i * 7 + k * 3) % 32) for k in range(6))
+            self.assertTrue(state.add_key_event(f"{word} {i}"))
+        self.assertFalse(state.has_key_event("Огнянов пристига в Бяла черква"))
+
+    def test_exact_matching_by_default(self):
+        manager = StoryStateManager(_SAMPLE_WORK)
+        manager.record_turn({"reply": "a", "key_event": "Марко скри Кралича в обора"})
+        manager.record_turn({"reply": "b", "key_event": "Бай Марко скрива Кралича"})
+        self.assertEqual(len(manager.get_state().key_events), 2)
+
+
+class TestInferredCharacters(unittest.TestCase):
+    def setUp(self):
+        lexicon = CharacterLexicon([["Hero"], ["Villain"], ["Maid"]], main_character="Hero")
+        self.manager = StoryStateManager(_SAMPLE_WORK, character_lexicon=lexicon)
+
+    def test_inferred_when_key_missing(self):
+        self.manager.record_turn(
+            {"reply": [{"character": "Разказвач", "text": "Villain enters."}, {"character": "Maid", "text": "Hi"}]}
+        )
+        self.assertEqual(self.manager.get_state().characters_present, ["Hero", "Villain", "Maid"])
+
+    def test_explicit_key_wins(self):
+        self.manager.record_turn({"reply": [{"character": "Maid", "text": "Hi"}], "characters_present": ["Hero"]})
+        self.assertEqual(self.manager.get_state().characters_present, ["Hero"])
+
+    def test_left_unchanged_without_lexicon(self):
+        manager = StoryStateManager(_SAMPLE_WORK)
+        manager.record_turn({"reply": [{"character": "Maid", "text": "Hi"}], "characters_present": ["Maid"]})
+        manager.record_turn({"reply": [{"character": "Hero", "text": "Hi"}]})
+        self.assertEqual(manager.get_state().characters_present, ["Maid"])
+
+
 # Re-export StoryState so the import at the top is used (avoids F401 from ruff)
 _STATE_CLASS = StoryState
 
@@ -0,0 +1,115 @@
+"""Tests for tracing module."""
+
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from literaplay import tracing
+from literaplay.tracing import Tracer
+
+
+def _spans(path):
+    """Every span written to *path*, by name, checking the OTLP/JSON envelope on the way."""
+    spans = {}
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        (resource_spans,) = json.loads(line)["resourceSpans"]
+        service = resource_spans["resource"]["attributes"][0]
+        assert service == {"key": "service.name", "value": {"stringValue": "literaplay"}}
+        for span in resource_spans["scopeSpans"][0]["spans"]:
+            spans[span["name"]] = span
+    return spans
+
+
+def _attributes(span):
+    return {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "traces" / "trace.jsonl"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_turn_is_one_line_of_nested_spans(self):
+        tracer = Tracer(self.path)
+        root = tracer.start_trace("turn", provider="openai", key_beat=True)
+        with tracing.use(root):
+            with tracing.span("ai.send"), tracing.span("ai.request", client=True, model="m") as request:
+                assert request is not None
+                request.set(input_tokens=12, latency=1.5)
+            tracing.annotate(chapter="ch1")
+        root.end()
+        tracer.close()
+
+        self.assertEqual(len(self.path.read_text().splitlines()), 1)
+        spans = _spans(self.path)
+        self.assertEqual(set(spans), {"turn", "ai.send", "ai.request"})
+        turn, send, request = spans["turn"], spans["ai.send"], spans["ai.request"]
+        self.assertNotIn("parentSpanId", turn)
+        self.assertEqual(send["parentSpanId"], turn["spanId"])
+        self.assertEqual(request["parentSpanId"], send["spanId"])
+        self.assertEqual({s["traceId"] for s in spans.values()}, {turn["traceId"]})
+        self.assertEqual(len(turn["traceId"]), 32)
+        self.assertEqual(request["kind"], 3)
+        self.assertEqual(_attributes(request), {"model": "m", "input_tokens": "12", "latency": 1.5})
+        self.assertEqual(_attributes(turn), {"provider": "openai", "key_beat": True, "chapter": "ch1"})
+        self.assertLessEqual(int(turn["startTimeUnixNano"]), int(request["startTimeUnixNano"]))
+
+    def test_errors_set_the_status(self):
+        tracer = Tracer(self.path)
+        root = tracer.start_trace("turn")
+        with tracing.use(root), self.assertRaises(ValueError), tracing.span("parse"):
+            raise ValueError("bad json")
+        root.end("overloaded")
+        tracer.close()
+
+        spans = _spans(self.path)
+        self.assertEqual(spans["parse"]["status"], {"code": 2, "message": "ValueError: bad json"})
+        self.assertEqual(spans["turn"]["status"], {"code": 2, "message": "overloaded"})
+
+    def test_spans_from_another_thread_join_the_turn(self):
+        tracer = Tracer(self.path)
+        root = tracer.start_trace("turn")
+
+        def worker():
+            with tracing.use(root), tracing.span("ai.send"):
+                pass
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        root.end()
+        root.end()  # ending twice writes once
+        tracer.close()
+        self.assertEqual(_spans(self.path)["ai.send"]["parentSpanId"], _spans(self.path)["turn"]["spanId"])
+        self.assertEqual(len(self.path.read_text().splitlines()), 1)
+
+    def test_span_is_a_no_op_without_a_current_span(self):
+        self.assertIsNone(tracing.current_span())
+        with tracing.span("ai.request") as span:
+            self.assertIsNone(span)
+        tracing.annotate(retries=1)
+
+    def test_disabled_tracer_writes_nothing(self):
+        tracer = Tracer(None)
+        self.assertFalse(tracer.enabled)
+        tracer.start_trace("turn").end()
+        self.assertFalse(self.path.parent.exists())
+
+    def test_file_rotates(self):
+        tracer = Tracer(self.path, max_bytes=2000, backups=2)
+        for _ in range(30):
+            root = tracer.start_trace("turn", padding="x" * 200)
+            root.end()
+        tracer.close()
+        names = sorted(p.name for p in self.path.parent.iterdir())
+        self.assertEqual(names, ["trace.jsonl", "trace.jsonl.1", "trace.jsonl.2"])
+        self.assertLessEqual(self.path.stat().st_size, 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
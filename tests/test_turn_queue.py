@@ -0,0 +1,66 @@
+"""Tests for turn_queue module."""
+
+import unittest
+
+from literaplay.turn_queue import SEPARATOR, QueuedTurn, TurnQueue
+
+
+def _pop(queue: TurnQueue) -> QueuedTurn:
+    turn = queue.pop()
+    assert turn is not None
+    return turn
+
+
+class TestTurnQueue(unittest.TestCase):
+    def test_empty(self):
+        queue = TurnQueue()
+        self.assertIsNone(queue.pop())
+        self.assertEqual(queue.depth, 0)
+        self.assertEqual(len(queue), 0)
+
+    def test_consecutive_inputs_are_coalesced(self):
+        queue = TurnQueue()
+        for text in ("a", "b", "c"):
+            queue.submit(text)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.depth, 3)
+
+        turn = _pop(queue)
+        self.assertEqual(turn.text, SEPARATOR.join("abc"))
+        self.assertEqual(turn.inputs, 3)
+        self.assertIsNone(queue.pop())
+
+    def test_input_past_max_chars_starts_a_new_request(self):
+        queue = TurnQueue(max_chars=10)
+        queue.submit("12345")
+        queue.submit("678")  # 5 + 2 + 3 fits exactly
+        queue.submit("9")
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.depth, 3)
+        self.assertEqual(_pop(queue).text, "12345\n\n678")
+        self.assertEqual(_pop(queue).text, "9")
+
+    def test_requeued_turn_goes_first(self):
+        queue = TurnQueue()
+        queue.submit("typed later")
+        queue.requeue("interrupted")
+        turn = _pop(queue)
+        self.assertEqual(turn.text, f"interrupted{SEPARATOR}typed later")
+        self.assertEqual(turn.inputs, 2)
+
+    def test_requeue_into_an_empty_or_full_queue(self):
+        queue = TurnQueue(max_chars=5)
+        queue.requeue("abc")
+        queue.submit("defgh")
+        queue.requeue("xyz")
+        self.assertEqual([_pop(queue).text for _ in range(3)], ["xyz", "abc", "defgh"])
+
+    def test_clear(self):
+        queue = TurnQueue()
+        queue.submit("a")
+        queue.clear()
+        self.assertEqual(queue.depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Tests for usage module."""
+
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from literaplay.usage import MAX_SAVED_SESSIONS, PRICES, TokenUsage, UsageLedger, cost_usd, main, read_usage
+
+
+class TestReadUsage(unittest.TestCase):
+    def test_openai(self):
+        payload = {
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "prompt_tokens_details": {"cached_tokens": 4}}
+        }
+        self.assertEqual(read_usage("openai", payload), {"input_tokens": 10, "output_tokens": 5, "cached_tokens": 4})
+        self.assertEqual(read_usage("openai", {"choices": []}), {})
+
+    def test_anthropic_counts_cached_input(self):
+        usage = SimpleNamespace(
+            input_tokens=20, output_tokens=7, cache_read_input_tokens=100, cache_creation_input_tokens=0
+        )
+        counts = read_usage("anthropic", SimpleNamespace(usage=usage))
+        self.assertEqual(counts, {"input_tokens": 120, "output_tokens": 7, "cached_tokens": 100})
+
+    def test_anthropic_stream_events(self):
+        start = {"type": "message_start", "message": {"usage": {"input_tokens": 30, "output_tokens": 1}}}
+        self.assertEqual(read_usage("anthropic", start)["input_tokens"], 30)
+        self.assertEqual(
+            read_usage("anthropic", {"type": "message_delta", "usage": {"output_tokens": 9}}), {"output_tokens": 9}
+        )
+
+    def test_gemini_sdk_and_rest_names(self):
+        sdk = SimpleNamespace(
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=40,
+                candidates_token_count=10,
+                thoughts_token_count=6,
+                cached_content_token_count=None,
+            )
+        )
+        self.assertEqual(read_usage("gemini", sdk), {"input_tokens": 40, "output_tokens": 16, "reasoning_tokens": 6})
+        rest = {"usageMetadata": {"promptTokenCount": 40, "candidatesTokenCount": 12, "cachedContentTokenCount": 8}}
+        self.assertEqual(read_usage("gemini", rest), {"input_tokens": 40, "output_tokens": 12, "cached_tokens": 8})
+
+    def test_non_integer_values_are_ignored(self):
+        self.assertEqual(read_usage("openai", {"usage": {"prompt_tokens": "many"}}), {})
+        self.assertEqual(read_usage("other", {"usage": {"prompt_tokens": 1}}), {})
+
+    def test_update_keeps_the_latest_totals(self):
+        usage = TokenUsage()
+        usage.update({"input_tokens": 5, "output_tokens": 1})
+        usage.update({"output_tokens": 9})
+        self.assertEqual(usage, TokenUsage(5, 9, 0))
+
+
+class TestCost(unittest.TestCase):
+    def test_cached_input_is_cheaper(self):
+        usage = TokenUsage(input_tokens=1_000_000, output_tokens=1_000_000, cached_tokens=400_000)
+        input_price, cached_price, output_price = PRICES["gpt-4.1-mini"]
+        expected = 0.6 * input_price + 0.4 * cached_price + output_price
+        cost = cost_usd("gpt-4.1-mini", usage)
+        assert cost is not None
+        self.assertAlmostEqual(cost, expected)
+
+    def test_unknown_model(self):
+        self.assertIsNone(cost_usd("some-new-model", TokenUsage(10, 10)))
+
+    def test_every_selectable_model_has_a_price(self):
+        from literaplay.config import DEFAULT_FAST_MODELS, PROVIDER_MODELS
+
+        models = {m["value"] for info in PROVIDER_MODELS.values() for m in info["models"]}
+        self.assertLessEqual(models | set(DEFAULT_FAST_MODELS.values()), set(PRICES))
+
+
+class TestUsageLedger(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "usage.json"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _record(self, ledger, model="gpt-4.1-mini", tokens=(1000, 100), session="s1", chapter="ch1"):
+        return ledger.record("openai", model, TokenUsage(*tokens), session, "pod_igoto/sit1", chapter)
+
+    def test_totals_by_every_dimension(self):
+        ledger = UsageLedger(self.path)
+        self._record(ledger, tokens=(1000, 100))
+        self._record(ledger, tokens=(3000, 200), chapter="ch2")
+        self._record(ledger, model="unknown", session="s2")
+
+        session = ledger.get("session", "s1")
+        self.assertEqual((session.calls, session.input_tokens, session.output_tokens), (2, 4000, 300))
+        self.assertEqual(session.peak_input_tokens, 3000)
+        expected = cost_usd("gpt-4.1-mini", TokenUsage(4000, 300))
+        assert expected is not None
+        self.assertAlmostEqual(session.cost_usd, expected)
+        self.assertEqual(ledger.get("chapter", "pod_igoto/sit1#ch1").calls, 2)
+        self.assertEqual(ledger.get("situation", "pod_igoto/sit1").calls, 3)
+        self.assertEqual(ledger.get("provider", "openai").unpriced_calls, 1)
+        self.assertEqual(ledger.get("model", "missing").calls, 0)
+
+    def test_totals_persist(self):
+        self._record(UsageLedger(self.path))
+        self._record(UsageLedger(self.path))
+        self.assertEqual(UsageLedger(self.path).get("model", "gpt-4.1-mini").calls, 2)
+        self.assertEqual(list(self.path.parent.iterdir()), [self.path])  # no temporary files left
+
+    def test_oldest_sessions_are_dropped_in_memory_too(self):
+        ledger = UsageLedger()
+        for i in range(MAX_SAVED_SESSIONS + 5):
+            self._record(ledger, session=f"s{i}")
+        self.assertEqual(len(ledger.totals["session"]), MAX_SAVED_SESSIONS)
+        self.assertEqual(ledger.get("session", "s0").calls, 0)
+        self.assertEqual(ledger.get("model", "gpt-4.1-mini").calls, MAX_SAVED_SESSIONS + 5)
+
+    def test_unreadable_file_starts_over(self):
+        self.path.write_text("{not json", encoding="utf-8")
+        with self.assertLogs(level="ERROR"):
+            ledger = UsageLedger(self.path)
+        self.assertEqual(ledger.get("model", "gpt-4.1-mini").calls, 0)
+
+    def test_command_line(self):
+        self._record(UsageLedger(self.path))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(main(["--file", str(self.path), "--by", "chapter"]), 0)
+        self.assertIn("pod_igoto/sit1#ch1", out.getvalue())
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main(["--file", str(self.path), "--json"])
+        self.assertEqual(json.loads(out.getvalue())["session"]["s1"]["calls"], 1)
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main(["--file", str(self.path.with_name("missing.json"))]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()